@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter, Gauge, REGISTRY
+
+from app.config import config
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+class AccessLogWriter:
+    """Structured (JSON lines) access log written off the event loop.
+
+    ``log()`` only appends to a bounded deque, which is safe to share between
+    threads without a lock, so request handling never waits on disk I/O. A
+    background thread drains the deque in batches, writes each batch with a
+    single ``write`` call and rotates the file by size.
+
+    Under overload records are shed instead of queued: past half capacity
+    only every ``sample_every``-th record is kept, and at capacity every new
+    record is dropped. Both cases are counted in ``access_log_dropped_total``.
+    """
+
+    def __init__(self, path: str, max_queue: int = 10000, batch_size: int = 512,
+                 flush_interval: float = 1.0, max_bytes: int = 50 * 1024 * 1024,
+                 backup_count: int = 5, sample_every: int = 10, registry=REGISTRY):
+        self.path = path
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.sample_every = max(1, sample_every)
+
+        self._queue: deque = deque()
+        self._sample_counter = 0
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+
+        self.written_total = Counter(
+            'access_log_written_total',
+            'Access log records written to disk',
+            registry=registry
+        )
+        self.dropped_total = Counter(
+            'access_log_dropped_total',
+            'Access log records dropped instead of queued',
+            ['reason'],
+            registry=registry
+        )
+        for reason in ('queue_full', 'sampled', 'write_error'):
+            self.dropped_total.labels(reason=reason)
+        self.queue_depth = Gauge(
+            'access_log_queue_depth',
+            'Access log records waiting to be written',
+            registry=registry
+        )
+        self.queue_depth.set_function(lambda: len(self._queue))
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def log(self, record: Dict[str, Any]) -> bool:
+        """Queue ``record`` without blocking; return False if it was shed."""
+        if not self._running:
+            return False
+
+        depth = len(self._queue)
+        if depth >= self.max_queue:
+            self.dropped_total.labels(reason='queue_full').inc()
+            return False
+        if depth >= self.max_queue // 2:
+            self._sample_counter += 1
+            if self._sample_counter % self.sample_every:
+                self.dropped_total.labels(reason='sampled').inc()
+                return False
+
+        self._queue.append(record)
+        if depth + 1 >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def start(self):
+        """Open the log file and start the writer thread."""
+        if self._running:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'ab')
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='access-log-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop accepting records, flush what is queued and close the file."""
+        if not self._running:
+            return
+        self._running = False
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _run(self):
+        while self._running or self._queue:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            while self._queue:
+                self._write_batch()
+
+    def _write_batch(self):
+        lines = []
+        try:
+            for _ in range(self.batch_size):
+                lines.append(self._encode(self._queue.popleft()))
+        except IndexError:
+            pass
+        if not lines:
+            return
+
+        try:
+            self._file.write(b''.join(lines))
+            self._file.flush()
+        except (OSError, ValueError) as e:
+            self.dropped_total.labels(reason='write_error').inc(len(lines))
+            print(f"Error writing access log: {e}")
+            return
+        self.written_total.inc(len(lines))
+
+        # The batch is on disk; a failed rotation only means the file keeps growing
+        try:
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            print(f"Error rotating access log: {e}")
+
+    def _encode(self, record: Dict[str, Any]) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(record, default=str) + b'\n'
+        return (json.dumps(record, separators=(',', ':'), default=str) + '\n').encode('utf-8')
+
+    def _rotate(self):
+        """Shift ``path`` -> ``path.1`` -> ... -> ``path.<backup_count>``.
+
+        The file is reopened even when shifting fails (e.g. ``path`` was
+        already removed by logrotate), so later batches can still be written.
+        """
+        self._file.close()
+        try:
+            if self.backup_count > 0:
+                for i in range(self.backup_count - 1, 0, -1):
+                    source = f"{self.path}.{i}"
+                    if os.path.exists(source):
+                        os.replace(source, f"{self.path}.{i + 1}")
+                os.replace(self.path, f"{self.path}.1")
+            else:
+                os.remove(self.path)
+        finally:
+            self._file = open(self.path, 'ab')
+
+# Global instance
+access_log = AccessLogWriter(
+    path=config.ACCESS_LOG_PATH,
+    max_queue=config.ACCESS_LOG_QUEUE_SIZE,
+    batch_size=config.ACCESS_LOG_BATCH_SIZE,
+    flush_interval=config.ACCESS_LOG_FLUSH_INTERVAL,
+    max_bytes=config.ACCESS_LOG_MAX_BYTES,
+    backup_count=config.ACCESS_LOG_BACKUP_COUNT,
+    sample_every=config.ACCESS_LOG_SAMPLE_EVERY
+)
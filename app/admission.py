@@ -0,0 +1,166 @@
+import json
+import math
+from typing import Dict, Optional, Tuple
+
+from prometheus_client import Counter, Gauge, REGISTRY
+
+from app.config import config
+
+PRIORITY_CRITICAL = "critical"
+PRIORITY_NORMAL = "normal"
+PRIORITY_LOW = "low"
+PRIORITIES = (PRIORITY_CRITICAL, PRIORITY_NORMAL, PRIORITY_LOW)
+
+class GradientLimiter:
+    """Adaptive concurrency limit derived from observed latency.
+
+    Keeps a short-term and a long-term exponential moving average of
+    request latency. While the short-term average stays within
+    ``tolerance`` times the long-term one the limit grows by roughly
+    ``sqrt(limit)`` per update; when latency rises the gradient
+    ``tolerance * long / short`` drops below 1 and the limit shrinks
+    proportionally (never by more than half per update). Updates are
+    smoothed and clamped to ``[min_limit, max_limit]``.
+
+    The limit is not raised while fewer than half of the slots are in use,
+    so an idle service does not drift up to ``max_limit``.
+    """
+
+    def __init__(self, initial_limit: int = 100, min_limit: int = 10, max_limit: int = 1000,
+                 tolerance: float = 2.0, smoothing: float = 0.2,
+                 short_window: int = 10, long_window: int = 600):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self._short_alpha = 2.0 / (short_window + 1)
+        self._long_alpha = 2.0 / (long_window + 1)
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.short_rtt: Optional[float] = None
+        self.long_rtt: Optional[float] = None
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def update(self, rtt: float, in_flight: int) -> int:
+        """Feed one completed request's latency and return the new limit."""
+        if self.short_rtt is None:
+            self.short_rtt = self.long_rtt = rtt
+            return self.limit
+        self.short_rtt += self._short_alpha * (rtt - self.short_rtt)
+        self.long_rtt += self._long_alpha * (rtt - self.long_rtt)
+
+        # Let the long-term average recover quickly after a latency spike
+        # ends, otherwise the limit stays depressed for the whole long window
+        if self.long_rtt / max(self.short_rtt, 1e-9) > 2:
+            self.long_rtt *= 0.95
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / max(self.short_rtt, 1e-9)))
+        if gradient >= 1.0 and in_flight < self._limit / 2:
+            return self.limit
+
+        target = self._limit * gradient + math.sqrt(self._limit)
+        limit = self._limit * (1 - self.smoothing) + target * self.smoothing
+        self._limit = min(max(limit, self.min_limit), self.max_limit)
+        return self.limit
+
+class AdmissionController:
+    """Admits or sheds requests against a GradientLimiter.
+
+    Paths map to priority classes by longest matching prefix:
+
+    - ``critical`` (health checks, /metrics, /admin) is never shed and does
+      not count towards the limit
+    - ``normal`` is admitted while in-flight requests are below the limit
+    - ``low`` only gets ``low_priority_share`` of the limit, leaving the
+      rest as headroom for normal traffic
+
+    All calls happen on the event loop, so the in-flight count needs no lock.
+    """
+
+    def __init__(self, limiter: GradientLimiter, priorities: Optional[Dict[str, str]] = None,
+                 low_priority_share: float = 0.8, retry_after: int = 1, registry=REGISTRY):
+        self.limiter = limiter
+        self.low_priority_share = low_priority_share
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self._prefixes: Tuple[Tuple[str, str], ...] = ()
+        self._classes: Dict[str, str] = {}
+        self.set_priorities(priorities or {})
+
+        self.limit_gauge = Gauge(
+            'admission_concurrency_limit',
+            'Current adaptive concurrency limit',
+            registry=registry
+        )
+        self.limit_gauge.set_function(lambda: self.limiter.limit)
+        self.in_flight_gauge = Gauge(
+            'admission_requests_in_flight',
+            'Requests holding an admission slot',
+            registry=registry
+        )
+        self.in_flight_gauge.set_function(lambda: self.in_flight)
+        self.shed_total = Counter(
+            'admission_shed_total',
+            'Requests rejected with 503 by admission control',
+            ['priority'],
+            registry=registry
+        )
+        for priority in (PRIORITY_NORMAL, PRIORITY_LOW):
+            self.shed_total.labels(priority=priority)
+
+    def set_priorities(self, priorities: Dict[str, str]):
+        for prefix, priority in priorities.items():
+            if priority not in PRIORITIES:
+                raise ValueError(f"Unknown priority {priority!r} for {prefix}")
+        self._prefixes = tuple(sorted(priorities.items(), key=lambda item: -len(item[0])))
+        self._classes = {}
+
+    def priority(self, path: str) -> str:
+        """Priority class of ``path`` (cached per path)."""
+        priority = self._classes.get(path)
+        if priority is not None:
+            return priority
+        priority = PRIORITY_NORMAL
+        for prefix, value in self._prefixes:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                priority = value
+                break
+        if len(self._classes) < 10000:
+            self._classes[path] = priority
+        return priority
+
+    def try_acquire(self, priority: str) -> bool:
+        """Take a slot for a ``priority`` request, or count it as shed."""
+        if priority == PRIORITY_CRITICAL:
+            return True
+        limit = self.limiter.limit
+        if priority == PRIORITY_LOW:
+            limit = max(1, int(limit * self.low_priority_share))
+        if self.in_flight >= limit:
+            self.shed_total.labels(priority=priority).inc()
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, priority: str, duration: float):
+        """Return the slot and feed the request's latency to the limiter."""
+        if priority == PRIORITY_CRITICAL:
+            return
+        self.limiter.update(duration, self.in_flight)
+        self.in_flight -= 1
+
+# Global instance
+admission = AdmissionController(
+    GradientLimiter(
+        initial_limit=config.ADMISSION_INITIAL_LIMIT,
+        min_limit=config.ADMISSION_MIN_LIMIT,
+        max_limit=config.ADMISSION_MAX_LIMIT,
+        tolerance=config.ADMISSION_TOLERANCE,
+        smoothing=config.ADMISSION_SMOOTHING
+    ),
+    priorities=json.loads(config.ADMISSION_PRIORITIES),
+    low_priority_share=config.ADMISSION_LOW_PRIORITY_SHARE,
+    retry_after=config.ADMISSION_RETRY_AFTER
+)
@@ -12,11 +12,150 @@ class Config:
     METRICS_COLLECTION_INTERVAL: int = int(os.getenv("METRICS_COLLECTION_INTERVAL", "5"))
     ENABLE_SYSTEM_METRICS: bool = os.getenv("ENABLE_SYSTEM_METRICS", "true").lower() == "true"
 
+    # Worker threads for sync handlers/dependencies (AnyIO's default is 40)
+    THREADPOOL_SIZE: int = int(os.getenv("THREADPOOL_SIZE", "40"))
+    ENABLE_THREADPOOL_METRICS: bool = os.getenv("ENABLE_THREADPOOL_METRICS", "true").lower() == "true"
+
+    # Instrumentation level (minimal, standard, full) and sampling rate; both
+    # can be changed at runtime via /admin/instrumentation or SIGHUP, which
+    # re-reads INSTRUMENTATION_CONFIG_PATH
+    INSTRUMENTATION_LEVEL: str = os.getenv("INSTRUMENTATION_LEVEL", "full")
+    INSTRUMENTATION_SAMPLE_RATE: float = float(os.getenv("INSTRUMENTATION_SAMPLE_RATE", "1.0"))
+    INSTRUMENTATION_CONFIG_PATH: Optional[str] = os.getenv("INSTRUMENTATION_CONFIG_PATH")
+    ADMIN_TOKEN: Optional[str] = os.getenv("ADMIN_TOKEN")
+
     # Histogram buckets for request duration (in seconds)
     REQUEST_DURATION_BUCKETS: tuple = (
         0.001, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0
     )
 
+    # Histogram buckets for request and response sizes (in bytes)
+    SIZE_BUCKETS: tuple = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+    # Per-endpoint bucket layouts (loaded at startup if the file exists) and
+    # the calibration mode that writes them after a warm-up window
+    BUCKET_LAYOUTS_PATH: str = os.getenv("BUCKET_LAYOUTS_PATH", "bucket_layouts.json")
+    BUCKET_CALIBRATION: bool = os.getenv("BUCKET_CALIBRATION", "false").lower() == "true"
+    BUCKET_CALIBRATION_SECONDS: float = float(os.getenv("BUCKET_CALIBRATION_SECONDS", "300"))
+    BUCKET_CALIBRATION_MAX_BUCKETS: int = int(os.getenv("BUCKET_CALIBRATION_MAX_BUCKETS", "12"))
+    BUCKET_CALIBRATION_MIN_SAMPLES: int = int(os.getenv("BUCKET_CALIBRATION_MIN_SAMPLES", "100"))
+
+    # Exemplars (trace/request IDs) on request counters and duration buckets
+    ENABLE_EXEMPLARS: bool = os.getenv("ENABLE_EXEMPLARS", "true").lower() == "true"
+    EXEMPLAR_INTERVAL_SECONDS: float = float(os.getenv("EXEMPLAR_INTERVAL_SECONDS", "10"))
+
+    # In-memory request tracing served at /debug/traces
+    ENABLE_TRACING: bool = os.getenv("ENABLE_TRACING", "true").lower() == "true"
+    TRACE_BUFFER_SIZE: int = int(os.getenv("TRACE_BUFFER_SIZE", "512"))
+    TRACE_PRIORITY_BUFFER_SIZE: int = int(os.getenv("TRACE_PRIORITY_BUFFER_SIZE", "256"))
+    TRACE_SLOW_SECONDS: float = float(os.getenv("TRACE_SLOW_SECONDS", "0.5"))
+    TRACE_MAX_SPANS: int = int(os.getenv("TRACE_MAX_SPANS", "64"))
+
+    # Structured JSON-lines access log, written by a background thread
+    ENABLE_ACCESS_LOG: bool = os.getenv("ENABLE_ACCESS_LOG", "false").lower() == "true"
+    ACCESS_LOG_PATH: str = os.getenv("ACCESS_LOG_PATH", "logs/access.log")
+    ACCESS_LOG_QUEUE_SIZE: int = int(os.getenv("ACCESS_LOG_QUEUE_SIZE", "10000"))
+    ACCESS_LOG_BATCH_SIZE: int = int(os.getenv("ACCESS_LOG_BATCH_SIZE", "512"))
+    ACCESS_LOG_FLUSH_INTERVAL: float = float(os.getenv("ACCESS_LOG_FLUSH_INTERVAL", "1.0"))
+    ACCESS_LOG_MAX_BYTES: int = int(os.getenv("ACCESS_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+    ACCESS_LOG_BACKUP_COUNT: int = int(os.getenv("ACCESS_LOG_BACKUP_COUNT", "5"))
+    ACCESS_LOG_SAMPLE_EVERY: int = int(os.getenv("ACCESS_LOG_SAMPLE_EVERY", "10"))
+
+    # Rolling latency quantiles served at /metrics/summary
+    SUMMARY_SLICE_SECONDS: float = float(os.getenv("SUMMARY_SLICE_SECONDS", "15"))
+    SUMMARY_RELATIVE_ACCURACY: float = float(os.getenv("SUMMARY_RELATIVE_ACCURACY", "0.01"))
+    SUMMARY_MAX_BINS: int = int(os.getenv("SUMMARY_MAX_BINS", "1024"))
+
+    # Service level objectives: JSON list of {"name", "endpoint", "availability",
+    # "latency_threshold", "latency_target"}; endpoint may end in "*" as a prefix
+    SLO_TARGETS: str = os.getenv(
+        "SLO_TARGETS",
+        '[{"name": "all", "endpoint": "*", "availability": 0.999, '
+        '"latency_threshold": 0.5, "latency_target": 0.99}]'
+    )
+    SLO_BUCKET_SECONDS: float = float(os.getenv("SLO_BUCKET_SECONDS", "10"))
+
+    # Heavy-hitter tracking for raw paths, clients and user agents
+    HEAVY_HITTER_CAPACITY: int = int(os.getenv("HEAVY_HITTER_CAPACITY", "64"))
+    HEAVY_HITTER_TOP_K: int = int(os.getenv("HEAVY_HITTER_TOP_K", "5"))
+    HEAVY_HITTER_DECAY: float = float(os.getenv("HEAVY_HITTER_DECAY", "0.5"))
+    HEAVY_HITTER_DECAY_SECONDS: float = float(os.getenv("HEAVY_HITTER_DECAY_SECONDS", "60"))
+
+    # Adaptive admission control: gradient concurrency limit with priority
+    # classes mapped from path prefixes ("critical" is never shed)
+    ENABLE_ADMISSION_CONTROL: bool = os.getenv("ENABLE_ADMISSION_CONTROL", "true").lower() == "true"
+    ADMISSION_INITIAL_LIMIT: int = int(os.getenv("ADMISSION_INITIAL_LIMIT", "100"))
+    ADMISSION_MIN_LIMIT: int = int(os.getenv("ADMISSION_MIN_LIMIT", "10"))
+    ADMISSION_MAX_LIMIT: int = int(os.getenv("ADMISSION_MAX_LIMIT", "1000"))
+    ADMISSION_TOLERANCE: float = float(os.getenv("ADMISSION_TOLERANCE", "2.0"))
+    ADMISSION_SMOOTHING: float = float(os.getenv("ADMISSION_SMOOTHING", "0.2"))
+    ADMISSION_LOW_PRIORITY_SHARE: float = float(os.getenv("ADMISSION_LOW_PRIORITY_SHARE", "0.8"))
+    ADMISSION_RETRY_AFTER: int = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+    ADMISSION_PRIORITIES: str = os.getenv(
+        "ADMISSION_PRIORITIES",
+        '{"/health": "critical", "/metrics": "critical", "/admin": "critical", "/debug": "low"}'
+    )
+
+    # Per-client token-bucket rate limits: JSON object mapping path prefixes
+    # (or "*") to {"rate": requests per second, "burst": bucket size}, e.g.
+    # '{"/data": {"rate": 100, "burst": 200}}'; empty disables rate limiting
+    RATE_LIMITS: str = os.getenv("RATE_LIMITS", "{}")
+    RATE_LIMIT_MAX_CLIENTS: int = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+    RATE_LIMIT_KEY_HEADER: str = os.getenv("RATE_LIMIT_KEY_HEADER", "X-API-Key")
+    # Comma-separated API keys that get their own buckets; any other key is
+    # ignored and the client is limited by address
+    RATE_LIMIT_API_KEYS: str = os.getenv("RATE_LIMIT_API_KEYS", "")
+
+    # Crash-safe persistence of counters, histograms and SLO windows across
+    # restarts (empty path disables it)
+    STATE_SNAPSHOT_PATH: str = os.getenv("STATE_SNAPSHOT_PATH", "")
+    STATE_SNAPSHOT_INTERVAL: float = float(os.getenv("STATE_SNAPSHOT_INTERVAL", "15"))
+
+    # Live metrics stream (SSE at /metrics/stream, WebSocket at /metrics/ws);
+    # a full subscriber queue is resynced with a snapshot or disconnected
+    ENABLE_METRICS_STREAM: bool = os.getenv("ENABLE_METRICS_STREAM", "true").lower() == "true"
+    METRICS_STREAM_INTERVAL: float = float(os.getenv("METRICS_STREAM_INTERVAL", "1.0"))
+    METRICS_STREAM_QUEUE_SIZE: int = int(os.getenv("METRICS_STREAM_QUEUE_SIZE", "16"))
+    METRICS_STREAM_SLOW_CONSUMER: str = os.getenv("METRICS_STREAM_SLOW_CONSUMER", "resync")
+    METRICS_STREAM_MAX_SUBSCRIBERS: int = int(os.getenv("METRICS_STREAM_MAX_SUBSCRIBERS", "100"))
+
+    # Dedicated metrics listener: serve /metrics (and /health/live) from a
+    # separate thread and port, isolated from application traffic (0 disables)
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "")
+    METRICS_SERVER_HEALTH: bool = os.getenv("METRICS_SERVER_HEALTH", "true").lower() == "true"
+
+    # Cursor polling at /metrics/delta: pollers within METRICS_DELTA_MIN_INTERVAL
+    # share one registry collection; removals are remembered for
+    # METRICS_DELTA_HISTORY series before old cursors get a full snapshot
+    METRICS_DELTA_MIN_INTERVAL: float = float(os.getenv("METRICS_DELTA_MIN_INTERVAL", "0.1"))
+    METRICS_DELTA_HISTORY: int = int(os.getenv("METRICS_DELTA_HISTORY", "10000"))
+
+    # Prometheus remote-write push exporter (empty URL disables it); extra
+    # labels and request headers (e.g. Authorization) are JSON objects
+    REMOTE_WRITE_URL: str = os.getenv("REMOTE_WRITE_URL", "")
+    REMOTE_WRITE_INTERVAL: float = float(os.getenv("REMOTE_WRITE_INTERVAL", "15"))
+    REMOTE_WRITE_SHARDS: int = int(os.getenv("REMOTE_WRITE_SHARDS", "2"))
+    REMOTE_WRITE_BATCH_SIZE: int = int(os.getenv("REMOTE_WRITE_BATCH_SIZE", "500"))
+    REMOTE_WRITE_QUEUE_SIZE: int = int(os.getenv("REMOTE_WRITE_QUEUE_SIZE", "10"))
+    REMOTE_WRITE_MAX_RETRIES: int = int(os.getenv("REMOTE_WRITE_MAX_RETRIES", "3"))
+    REMOTE_WRITE_TIMEOUT: float = float(os.getenv("REMOTE_WRITE_TIMEOUT", "5"))
+    REMOTE_WRITE_EXTERNAL_LABELS: str = os.getenv("REMOTE_WRITE_EXTERNAL_LABELS", "{}")
+    REMOTE_WRITE_HEADERS: str = os.getenv("REMOTE_WRITE_HEADERS", "{}")
+
+    # Data store configuration
+    DATA_STORE_SHARDS: int = int(os.getenv("DATA_STORE_SHARDS", "16"))
+    DATA_SCAN_LIMIT: int = int(os.getenv("DATA_SCAN_LIMIT", "100"))
+    DATA_SCAN_MAX_LIMIT: int = int(os.getenv("DATA_SCAN_MAX_LIMIT", "1000"))
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+    RAW_MAX_BODY_BYTES: int = int(os.getenv("RAW_MAX_BODY_BYTES", str(64 * 1024 * 1024)))
+    RAW_CHUNK_SIZE: int = int(os.getenv("RAW_CHUNK_SIZE", str(64 * 1024)))
+
+    # Cardinality guard: series budget per labelled metric family, with
+    # optional per-family overrides as a JSON object
+    METRIC_SERIES_BUDGET: int = int(os.getenv("METRIC_SERIES_BUDGET", "1000"))
+    METRIC_SERIES_BUDGETS: str = os.getenv("METRIC_SERIES_BUDGETS", "{}")
+
     # Application metadata
     APP_NAME: str = os.getenv("APP_NAME", "fastapi-metrics-app")
     APP_VERSION: str = os.getenv("APP_VERSION", "1.0.0")
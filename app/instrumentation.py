@@ -0,0 +1,129 @@
+import json
+import os
+import random
+import threading
+from typing import Any, Dict, Optional
+
+from prometheus_client import Gauge, REGISTRY
+
+from app.config import config
+
+LEVEL_MINIMAL = "minimal"
+LEVEL_STANDARD = "standard"
+LEVEL_FULL = "full"
+LEVELS = (LEVEL_MINIMAL, LEVEL_STANDARD, LEVEL_FULL)
+
+class InstrumentationSettings:
+    """Immutable snapshot of what MetricsMiddleware records.
+
+    Levels are cumulative:
+
+    - ``minimal``: request counter, duration histogram, active requests, SLOs
+    - ``standard``: plus size histograms, exemplars, /metrics/summary quantiles
+      and heavy hitters
+    - ``full``: plus request traces and the access log
+
+    ``sample_rate`` is the fraction of requests that feed the per-request
+    extras (heavy hitters, traces, access log). Counters and histograms are
+    never sampled, so rates computed from them stay exact.
+    """
+
+    __slots__ = ("level", "sample_rate", "record_sizes", "exemplars", "latency_summary",
+                 "heavy_hitters", "tracing", "access_log")
+
+    def __init__(self, level: str = LEVEL_FULL, sample_rate: float = 1.0):
+        if level not in LEVELS:
+            raise ValueError(f"level must be one of {', '.join(LEVELS)}")
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+
+        rank = LEVELS.index(level)
+        object.__setattr__(self, "level", level)
+        object.__setattr__(self, "sample_rate", sample_rate)
+        object.__setattr__(self, "record_sizes", rank >= 1)
+        object.__setattr__(self, "exemplars", rank >= 1)
+        object.__setattr__(self, "latency_summary", rank >= 1)
+        object.__setattr__(self, "heavy_hitters", rank >= 1)
+        object.__setattr__(self, "tracing", rank >= 2)
+        object.__setattr__(self, "access_log", rank >= 2)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("InstrumentationSettings is immutable")
+
+    def sampled(self) -> bool:
+        """Decide whether the current request feeds the sampled extras."""
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class InstrumentationControl:
+    """Holds the current InstrumentationSettings and swaps it atomically.
+
+    Readers take ``control.current`` once per request; replacing the
+    reference is a single atomic assignment, so the hot path needs no lock.
+    Writers (admin endpoint, SIGHUP reload) serialise on ``_lock``.
+    """
+
+    def __init__(self, settings: InstrumentationSettings, config_path: Optional[str] = None,
+                 registry=REGISTRY):
+        self.current = settings
+        self.config_path = config_path
+        self._lock = threading.Lock()
+
+        self.level_gauge = Gauge(
+            'instrumentation_level',
+            'Active instrumentation level (0=minimal, 1=standard, 2=full)',
+            registry=registry
+        )
+        self.level_gauge.set_function(lambda: LEVELS.index(self.current.level))
+        self.sample_rate_gauge = Gauge(
+            'instrumentation_sample_rate',
+            'Fraction of requests feeding sampled instrumentation',
+            registry=registry
+        )
+        self.sample_rate_gauge.set_function(lambda: self.current.sample_rate)
+
+    def update(self, level: Optional[str] = None,
+               sample_rate: Optional[float] = None) -> InstrumentationSettings:
+        """Replace the current settings, keeping unspecified fields."""
+        with self._lock:
+            current = self.current
+            settings = InstrumentationSettings(
+                level=current.level if level is None else level,
+                sample_rate=current.sample_rate if sample_rate is None else sample_rate
+            )
+            self.current = settings
+            return settings
+
+    def reload(self) -> InstrumentationSettings:
+        """Re-read ``config_path`` (a JSON object with level/sample_rate).
+
+        Raises ValueError for malformed content, including values of the
+        wrong type; a numeric string ``sample_rate`` is accepted.
+        """
+        if not self.config_path or not os.path.exists(self.config_path):
+            return self.current
+        with open(self.config_path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("instrumentation config must be a JSON object")
+
+        level = data.get("level")
+        if level is not None and not isinstance(level, str):
+            raise ValueError("level must be a string")
+        sample_rate = data.get("sample_rate")
+        if sample_rate is not None:
+            if isinstance(sample_rate, bool) or not isinstance(sample_rate, (int, float, str)):
+                raise ValueError("sample_rate must be a number")
+            sample_rate = float(sample_rate)
+        return self.update(level=level, sample_rate=sample_rate)
+
+# Global instance
+instrumentation = InstrumentationControl(
+    InstrumentationSettings(
+        level=config.INSTRUMENTATION_LEVEL,
+        sample_rate=config.INSTRUMENTATION_SAMPLE_RATE
+    ),
+    config_path=config.INSTRUMENTATION_CONFIG_PATH
+)
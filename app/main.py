@@ -1,14 +1,33 @@
-from fastapi import FastAPI, Response
-from fastapi.responses import PlainTextResponse
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from prometheus_client import REGISTRY
+from prometheus_client.exposition import choose_encoder
+import anyio.to_thread
 import asyncio
+import json
+import signal
+import struct
+from typing import Optional
 import uvicorn
 from contextlib import asynccontextmanager
 
+from app.access_log import access_log
 from app.config import config
+from app.instrumentation import instrumentation
+from app.metrics_server import metrics_server
+from app.middleware.admission_middleware import AdmissionControlMiddleware
 from app.middleware.metrics_middleware import MetricsMiddleware
-from app.routers import api, health
+from app.middleware.rate_limit_middleware import RateLimitMiddleware
+from app.rate_limit import rate_limiter
+from app.remote_write import remote_writer
+from app.routers import admin, api, debug, health, raw
+from app.metrics.bucket_calibration import bucket_calibrator
+from app.metrics.state_snapshot import state_snapshotter
+from app.metrics.http_metrics import http_metrics
+from app.metrics.stream import metrics_stream
 from app.metrics.system_metrics import system_metrics
+from app.metrics.threadpool_metrics import threadpool_metrics
+from app.metrics.latency_summary import latency_summary
 
 # Background task for system metrics collection
 async def collect_system_metrics():
@@ -21,12 +40,100 @@ async def collect_system_metrics():
             print(f"Error in system metrics collection: {e}")
             await asyncio.sleep(config.METRICS_COLLECTION_INTERVAL)
 
+async def run_bucket_calibration():
+    """Write proposed bucket layouts once the calibration warm-up has elapsed."""
+    bucket_calibrator.start()
+    await asyncio.sleep(config.BUCKET_CALIBRATION_SECONDS)
+    bucket_calibrator.stop()
+    try:
+        layouts = await asyncio.to_thread(bucket_calibrator.write, config.BUCKET_LAYOUTS_PATH)
+        endpoints = sum(len(entries) for entries in layouts.values())
+        print(f"Bucket layouts for {endpoints} series written to {config.BUCKET_LAYOUTS_PATH}; restart to apply")
+    except OSError as e:
+        print(f"Error writing bucket layouts: {e}")
+
+async def write_state_snapshots():
+    """Background task to persist metric state periodically."""
+    while True:
+        await asyncio.sleep(config.STATE_SNAPSHOT_INTERVAL)
+        try:
+            await asyncio.to_thread(state_snapshotter.write)
+        except Exception as e:
+            print(f"Error in state snapshot task: {e}")
+
+def reload_instrumentation():
+    """SIGHUP handler: re-read the instrumentation config file."""
+    try:
+        settings = instrumentation.reload()
+        print(f"Instrumentation reloaded: level={settings.level} sample_rate={settings.sample_rate}")
+    except (OSError, ValueError) as e:
+        print(f"Error reloading instrumentation config: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     # Startup
     print("Starting FastAPI Metrics Monitoring System...")
 
+    # Restore counters and histograms from the last snapshot before any
+    # request is counted
+    snapshots = None
+    if config.STATE_SNAPSHOT_PATH:
+        try:
+            restored = state_snapshotter.restore()
+            state_snapshotter.open()
+            print(f"Restored {restored} series from {config.STATE_SNAPSHOT_PATH} "
+                  f"(generation {state_snapshotter.generation})")
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Error restoring metrics state snapshot: {e}")
+        snapshots = asyncio.create_task(write_state_snapshots())
+
+    # Serve scrapes from their own port and thread, outside the event loop;
+    # started after the restore so no scrape sees counters before it
+    if config.METRICS_PORT:
+        try:
+            metrics_server.start()
+            print(f"Metrics listener on {metrics_server.host}:{metrics_server.port}")
+        except OSError as e:
+            print(f"Error starting metrics listener on port {config.METRICS_PORT}: {e}")
+
+    # Size (and instrument) the thread pool that runs sync handlers
+    if config.ENABLE_THREADPOOL_METRICS:
+        threadpool_metrics.install(config.THREADPOOL_SIZE)
+    else:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = config.THREADPOOL_SIZE
+    print(f"Thread pool size: {config.THREADPOOL_SIZE}")
+
+    # Start the access log writer thread
+    if config.ENABLE_ACCESS_LOG:
+        access_log.start()
+        print(f"Access log writing to {config.ACCESS_LOG_PATH}")
+
+    # Reload instrumentation settings on SIGHUP (not available on Windows,
+    # nor when the loop is not running in the main thread)
+    sighup = False
+    if hasattr(signal, "SIGHUP"):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_instrumentation)
+            sighup = True
+        except (NotImplementedError, RuntimeError, ValueError):
+            pass
+
+    # Record per-endpoint sketches and write bucket layouts after warm-up
+    calibration = None
+    if config.BUCKET_CALIBRATION:
+        calibration = asyncio.create_task(run_bucket_calibration())
+        print(f"Bucket calibration running for {config.BUCKET_CALIBRATION_SECONDS}s")
+
+    # Start the producer behind /metrics/stream and /metrics/ws
+    if config.ENABLE_METRICS_STREAM:
+        metrics_stream.start()
+
+    # Push metrics to a remote-write receiver for deployments that cannot be scraped
+    if config.REMOTE_WRITE_URL:
+        remote_writer.start()
+        print(f"Remote write to {config.REMOTE_WRITE_URL} every {config.REMOTE_WRITE_INTERVAL}s")
+
     # Start background task for system metrics collection
     task = None
     if config.ENABLE_SYSTEM_METRICS:
@@ -45,6 +152,45 @@ async def lifespan(app: FastAPI):
             pass
         print("System metrics collection stopped")
 
+    if config.ENABLE_METRICS_STREAM:
+        await metrics_stream.stop()
+
+    if remote_writer.running:
+        await asyncio.to_thread(remote_writer.stop)
+        print("Remote write stopped")
+
+    if config.ENABLE_ACCESS_LOG:
+        access_log.stop()
+        print("Access log writer stopped")
+
+    if calibration is not None and not calibration.done():
+        calibration.cancel()
+        try:
+            await calibration
+        except asyncio.CancelledError:
+            pass
+        bucket_calibrator.stop()
+
+    if sighup:
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+
+    if config.ENABLE_THREADPOOL_METRICS:
+        threadpool_metrics.uninstall()
+
+    if snapshots is not None:
+        snapshots.cancel()
+        try:
+            await snapshots
+        except asyncio.CancelledError:
+            pass
+        state_snapshotter.write()
+        state_snapshotter.close()
+        print(f"Metrics state written to {config.STATE_SNAPSHOT_PATH}")
+
+    if metrics_server.running:
+        metrics_server.stop()
+        print("Metrics listener stopped")
+
 # Create FastAPI application
 app = FastAPI(
     title="FastAPI Metrics Monitoring System",
@@ -53,21 +199,106 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Add admission control inside the metrics middleware, so shed requests
+# still show up as 503s in http_requests_total and the SLOs
+if config.ENABLE_ADMISSION_CONTROL:
+    app.add_middleware(AdmissionControlMiddleware)
+
+# Rate limiting runs before admission so rejected clients never hold a slot
+if rate_limiter.enabled:
+    app.add_middleware(RateLimitMiddleware)
+
 # Add metrics middleware
 app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(api.router, tags=["api"])
+app.include_router(raw.router, tags=["api"])
 app.include_router(health.router, tags=["health"])
+app.include_router(debug.router, tags=["debug"])
+app.include_router(admin.router, tags=["admin"])
+
+# Label metrics with route templates rather than raw paths
+http_metrics.set_routes(app.routes)
 
 @app.get("/metrics", response_class=PlainTextResponse)
-async def metrics():
-    """Prometheus metrics endpoint."""
+async def metrics(request: Request):
+    """Prometheus metrics endpoint.
+
+    Scrapers that accept ``application/openmetrics-text`` get the OpenMetrics
+    format, which carries exemplars; everyone else gets the classic text format.
+    """
+    encoder, content_type = choose_encoder(request.headers.get("accept"))
     return Response(
-        content=generate_latest(),
-        media_type=CONTENT_TYPE_LATEST
+        content=encoder(REGISTRY),
+        media_type=content_type
     )
 
+@app.get("/metrics/summary")
+async def metrics_summary():
+    """Rolling 1m/5m/15m latency quantiles per method and endpoint."""
+    return latency_summary.summary()
+
+def _families(families: Optional[str]):
+    return frozenset(name.strip() for name in (families or "").split(",") if name.strip()) or None
+
+@app.get("/metrics/delta")
+async def metrics_delta(
+    cursor: int = Query(0, ge=0, description="Cursor returned by the previous poll (0 for a snapshot)"),
+    families: Optional[str] = Query(None, description="Comma-separated metric families (default all)")
+):
+    """Series changed since ``cursor``, plus the cursor for the next poll."""
+    await metrics_stream.refresh(config.METRICS_DELTA_MIN_INTERVAL)
+    return Response(
+        content=json.dumps(metrics_stream.changes_since(cursor, _families(families)), separators=(",", ":")),
+        media_type="application/json"
+    )
+
+def _stream_subscription(families: Optional[str]):
+    if not metrics_stream.running:
+        return None
+    return metrics_stream.subscribe(_families(families))
+
+@app.get("/metrics/stream")
+async def metrics_stream_events(
+    families: Optional[str] = Query(None, description="Comma-separated metric families (default all)")
+):
+    """Server-sent events: one snapshot, then deltas of changed series each tick."""
+    subscription = _stream_subscription(families)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Metrics stream unavailable")
+
+    async def events():
+        try:
+            async for message in subscription.messages():
+                yield f"data: {message}\n\n"
+        finally:
+            metrics_stream.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@app.websocket("/metrics/ws")
+async def metrics_stream_socket(websocket: WebSocket, families: Optional[str] = None):
+    """WebSocket variant of ``/metrics/stream``; one JSON message per frame."""
+    subscription = _stream_subscription(families)
+    if subscription is None:
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+    try:
+        async for message in subscription.messages():
+            await websocket.send_text(message)
+        # Dropped as a slow consumer (or shutting down)
+        await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        metrics_stream.unsubscribe(subscription)
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
@@ -0,0 +1,157 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.config import config
+from app.metrics.bucket_layouts import DEFAULT_LAYOUT_KEY, BucketLayouts, merge_bounds, save_bucket_layouts
+from app.metrics.http_metrics import http_metrics
+from app.metrics.latency_summary import DDSketch
+
+# Family -> default buckets every proposed layout keeps
+FAMILIES = {
+    'http_request_duration_seconds': config.REQUEST_DURATION_BUCKETS,
+    'http_request_size_bytes': config.SIZE_BUCKETS,
+    'http_response_size_bytes': config.SIZE_BUCKETS,
+}
+
+def _round_bound(value: float, integer: bool) -> float:
+    """Round to two significant figures so layouts stay readable."""
+    value = float(f"{value:.2g}")
+    return float(max(1, round(value))) if integer else value
+
+def propose_buckets(sketch: DDSketch, max_buckets: int = 12, integer: bool = False) -> Tuple[float, ...]:
+    """Bucket boundaries for the distribution in ``sketch``.
+
+    Boundaries sit at the 1st percentile, the median and then
+    geometrically closer to the tail (75th, 87.5th, 93.75th, ... up to
+    99.9th), which keeps the relative rank error of ``histogram_quantile``
+    roughly constant for high percentiles. Two headroom buckets at 2x and
+    4x the observed maximum catch later regressions.
+    """
+    quantiles: List[float] = [0.01, 0.5]
+    tail = 0.25
+    while len(quantiles) < max_buckets - 2 and 1 - tail <= 0.999:
+        quantiles.append(1 - tail)
+        tail /= 2
+    if quantiles[-1] < 0.999 and len(quantiles) < max_buckets - 2:
+        quantiles.append(0.999)
+
+    top = sketch.quantile(1.0) or 0.0
+    candidates = [sketch.quantile(q) or 0.0 for q in quantiles] + [top * 2, top * 4]
+
+    bounds: List[float] = []
+    for value in candidates:
+        if value <= 0:
+            continue
+        value = _round_bound(value, integer)
+        if not bounds or value > bounds[-1]:
+            bounds.append(value)
+    return tuple(bounds)
+
+class BucketCalibrator:
+    """Records per-endpoint latency and size sketches during a warm-up window.
+
+    While ``active``, every completed request is added to one DDSketch per
+    (family, normalised endpoint), plus a ``"*"`` sketch per family covering
+    all endpoints. ``propose()`` turns the sketches into bucket layouts that
+    ``HTTPMetricsCollector`` loads from ``BUCKET_LAYOUTS_PATH`` at startup.
+    Every layout is the family's default buckets plus the calibrated
+    boundaries, so series of different endpoints can still be summed on
+    the default ``le`` values.
+    """
+
+    def __init__(self, warmup_seconds: float = 300.0, max_buckets: int = 12,
+                 min_samples: int = 100, max_endpoints: int = 200,
+                 relative_accuracy: float = 0.01, max_bins: int = 1024):
+        self.warmup_seconds = warmup_seconds
+        self.max_buckets = max_buckets
+        self.min_samples = min_samples
+        self.max_endpoints = max_endpoints
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.active = False
+        self.started_at: Optional[float] = None
+        self._sketches: Dict[str, Dict[str, DDSketch]] = {family: {} for family in FAMILIES}
+        self._lock = threading.Lock()
+
+    def start(self, now: Optional[float] = None):
+        self.started_at = time.time() if now is None else now
+        self.active = True
+
+    def stop(self):
+        self.active = False
+
+    def done(self, now: Optional[float] = None) -> bool:
+        """True once the warm-up window has elapsed."""
+        if self.started_at is None:
+            return False
+        now = time.time() if now is None else now
+        return now - self.started_at >= self.warmup_seconds
+
+    def observe(self, endpoint: str, duration: float, request_size: int = 0, response_size: int = 0):
+        """Add one request to the sketches of its normalised endpoint."""
+        if not self.active:
+            return
+        endpoint = http_metrics._normalize_endpoint(endpoint)
+        with self._lock:
+            self._add('http_request_duration_seconds', endpoint, duration)
+            if request_size > 0:
+                self._add('http_request_size_bytes', endpoint, request_size)
+            if response_size > 0:
+                self._add('http_response_size_bytes', endpoint, response_size)
+
+    def _add(self, family: str, endpoint: str, value: float):
+        sketches = self._sketches[family]
+        for key in (endpoint, DEFAULT_LAYOUT_KEY):
+            sketch = sketches.get(key)
+            if sketch is None:
+                if len(sketches) >= self.max_endpoints + 1:
+                    continue
+                sketch = sketches[key] = DDSketch(self.relative_accuracy, self.max_bins)
+            sketch.add(value)
+
+    def propose(self) -> BucketLayouts:
+        """Default plus calibrated buckets for every sketch with ``min_samples``."""
+        layouts: BucketLayouts = {}
+        with self._lock:
+            for family, sketches in self._sketches.items():
+                integer = family.endswith('_bytes')
+                proposed = {
+                    endpoint: propose_buckets(sketch, self.max_buckets, integer)
+                    for endpoint, sketch in sketches.items()
+                    if sketch.count >= self.min_samples
+                }
+                proposed = {
+                    endpoint: merge_bounds(FAMILIES[family], bounds)
+                    for endpoint, bounds in proposed.items() if bounds
+                }
+                if proposed:
+                    layouts[family] = proposed
+        return layouts
+
+    def samples(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                family: {endpoint: sketch.count for endpoint, sketch in sketches.items()}
+                for family, sketches in self._sketches.items()
+            }
+
+    def write(self, path: str) -> BucketLayouts:
+        """Write the proposed layouts to ``path`` and return them."""
+        layouts = self.propose()
+        save_bucket_layouts(
+            path, layouts,
+            generated_at=time.time(),
+            warmup_seconds=self.warmup_seconds,
+            min_samples=self.min_samples
+        )
+        return layouts
+
+# Global instance
+bucket_calibrator = BucketCalibrator(
+    warmup_seconds=config.BUCKET_CALIBRATION_SECONDS,
+    max_buckets=config.BUCKET_CALIBRATION_MAX_BUCKETS,
+    min_samples=config.BUCKET_CALIBRATION_MIN_SAMPLES,
+    relative_accuracy=config.SUMMARY_RELATIVE_ACCURACY,
+    max_bins=config.SUMMARY_MAX_BINS
+)
@@ -0,0 +1,99 @@
+import json
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+from prometheus_client import Histogram
+
+# family -> endpoint -> bucket upper bounds; endpoint "*" is the family default
+BucketLayouts = Dict[str, Dict[str, Tuple[float, ...]]]
+
+DEFAULT_LAYOUT_KEY = "*"
+
+def merge_bounds(default: Sequence[float], extra: Sequence[float]) -> Tuple[float, ...]:
+    """``default`` plus calibrated ``extra`` boundaries, sorted and deduplicated."""
+    return tuple(sorted(set(float(b) for b in default) | set(float(b) for b in extra)))
+
+def shared_bounds(layouts: Optional[Dict[str, Sequence[float]]],
+                  default: Sequence[float]) -> Tuple[float, ...]:
+    """``le`` values (excluding +Inf) present on every series of a family.
+
+    Endpoints without a layout of their own use the ``"*"`` layout, so the
+    result is the intersection of every layout merged with ``default``,
+    which always contains ``default``.
+    """
+    layouts = layouts or {}
+    shared = set(merge_bounds(default, layouts.get(DEFAULT_LAYOUT_KEY, ())))
+    for bounds in layouts.values():
+        shared &= set(merge_bounds(default, bounds))
+    return tuple(sorted(b for b in shared if b != float("inf")))
+
+class LayoutHistogram(Histogram):
+    """Histogram whose children add extra buckets by one label's value.
+
+    prometheus_client gives every child of a histogram the same bucket
+    boundaries. Here each child looks up the value of ``layout_label``
+    (normally ``endpoint``) in ``layouts`` when it is created, falling back
+    to the ``"*"`` layout, and adds those boundaries to ``buckets``.
+
+    Every child keeps all of ``buckets``, so the family's default ``le``
+    values are present on every series. Queries that sum buckets across
+    endpoints must select only those shared values (see
+    ``shared_bounds``), because an extra ``le`` that exists on some series
+    only would make the summed cumulative counts non-monotonic.
+    Per-series quantiles can use every boundary.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS,
+                 layouts: Optional[Dict[str, Sequence[float]]] = None,
+                 layout_label: str = "endpoint",
+                 _labelvalues: Optional[Sequence[str]] = None, **kwargs):
+        layouts = dict(layouts or {})
+        extra = layouts.get(DEFAULT_LAYOUT_KEY, ())
+        if _labelvalues:
+            value = dict(zip(labelnames, _labelvalues)).get(layout_label)
+            extra = layouts.get(value, extra)
+
+        super().__init__(name, documentation, labelnames=labelnames, _labelvalues=_labelvalues,
+                         buckets=merge_bounds(buckets, extra), **kwargs)
+        self._kwargs['buckets'] = buckets
+        self._kwargs['layouts'] = layouts
+        self._kwargs['layout_label'] = layout_label
+
+def load_bucket_layouts(path: Optional[str]) -> BucketLayouts:
+    """Read the layouts file written by calibration; ``{}`` if there is none.
+
+    The file looks like ``{"families": {"http_request_duration_seconds":
+    {"/health/live": [0.0001, 0.0002, ...], "*": [...]}}}``. A malformed
+    file raises, so a bad layout fails at startup rather than silently.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+
+    layouts: BucketLayouts = {}
+    for family, endpoints in data.get("families", {}).items():
+        layouts[family] = {}
+        for endpoint, bounds in endpoints.items():
+            bounds = tuple(float(b) for b in bounds)
+            if not bounds or list(bounds) != sorted(set(bounds)):
+                raise ValueError(f"Buckets for {family} {endpoint} must be strictly increasing")
+            layouts[family][endpoint] = bounds
+    return layouts
+
+def save_bucket_layouts(path: str, layouts: BucketLayouts, **metadata):
+    """Write ``layouts`` atomically (temp file + rename) with ``metadata``."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    document = dict(metadata)
+    document["families"] = {
+        family: {endpoint: list(bounds) for endpoint, bounds in sorted(endpoints.items())}
+        for family, endpoints in layouts.items()
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(document, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
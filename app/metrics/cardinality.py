@@ -0,0 +1,71 @@
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+from prometheus_client import Counter, REGISTRY
+
+OVERFLOW_LABEL = "__overflow__"
+
+class CardinalityGuard:
+    """Caps the number of label sets each metric family may create.
+
+    Label sets seen before the family's budget is reached are admitted as
+    usual. Once the budget is spent, every new label set is folded into a
+    single series whose label values are all ``__overflow__``. Each distinct
+    rejected label set is counted once in ``metrics_series_overflow_total``;
+    rejected sets are remembered (as hashes) up to ``max_rejected`` per family,
+    past which every rejection of an unremembered set counts, so the counter
+    is an upper bound. Budgets never free up, so a label set maps to the same
+    series for the process lifetime.
+    """
+
+    def __init__(self, registry=REGISTRY, default_budget: int = 1000,
+                 budgets: Optional[Dict[str, int]] = None, max_rejected: int = 10000):
+        self.default_budget = default_budget
+        self.budgets = dict(budgets or {})
+        self.max_rejected = max_rejected
+        self._series: Dict[str, Set[Tuple[str, ...]]] = {}
+        self._rejected: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+
+        self.overflow_total = Counter(
+            'metrics_series_overflow_total',
+            'Distinct label sets folded into the __overflow__ series after a family exceeded its budget',
+            ['family'],
+            registry=registry
+        )
+
+    def budget(self, family: str) -> int:
+        return self.budgets.get(family, self.default_budget)
+
+    def admit(self, family: str, values: Tuple[str, ...]) -> bool:
+        """Return True if ``values`` may have its own series in ``family``."""
+        seen = self._series.get(family)
+        if seen is not None and values in seen:
+            return True
+
+        with self._lock:
+            seen = self._series.setdefault(family, set())
+            if values in seen:
+                return True
+            if len(seen) < self.budget(family):
+                seen.add(values)
+                return True
+
+            rejected = self._rejected.setdefault(family, set())
+            digest = hash(values)
+            if digest in rejected:
+                return False
+            if len(rejected) < self.max_rejected:
+                rejected.add(digest)
+
+        self.overflow_total.labels(family=family).inc()
+        return False
+
+    def labels(self, family: str, metric, **labels):
+        """``metric.labels(**labels)``, or the overflow child once over budget."""
+        if self.admit(family, tuple(labels.values())):
+            return metric.labels(**labels)
+        return metric.labels(**{name: OVERFLOW_LABEL for name in labels})
+
+    def series_count(self, family: str) -> int:
+        return len(self._series.get(family, ()))
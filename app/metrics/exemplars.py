@@ -0,0 +1,78 @@
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from typing import Dict, Mapping, Optional, Tuple
+
+_TRACEPARENT = re.compile(r'^[0-9a-f]{2}-([0-9a-f]{32})-[0-9a-f]{16}-[0-9a-f]{2}$')
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')
+
+def parse_traceparent(value: Optional[str]) -> Optional[str]:
+    """Return the trace ID from a W3C ``traceparent`` header, if valid."""
+    if not value:
+        return None
+    match = _TRACEPARENT.match(value.strip().lower())
+    if match and match.group(1) != '0' * 32:
+        return match.group(1)
+    return None
+
+def request_exemplar(headers: Mapping[str, str]) -> Dict[str, str]:
+    """Exemplar labels for a request.
+
+    Uses the trace ID from a W3C ``traceparent`` header when present, then an
+    ``X-Request-ID`` header, and otherwise generates a request ID so the
+    caller can return it to the client.
+    """
+    trace_id = parse_traceparent(headers.get('traceparent'))
+    if trace_id:
+        return {'trace_id': trace_id}
+
+    request_id = headers.get('x-request-id')
+    if request_id and _REQUEST_ID.match(request_id):
+        return {'request_id': request_id}
+    return {'request_id': uuid.uuid4().hex}
+
+class ExemplarSampler:
+    """Decides when an observation may replace a bucket's exemplar.
+
+    prometheus_client keeps one exemplar per bucket and overwrites it on every
+    observation that carries one. The sampler lets a bucket take a new
+    exemplar at most once per ``interval`` seconds, so exemplars stay stable
+    long enough to be scraped and the per-observation cost is a dict lookup.
+    """
+
+    def __init__(self, interval: float = 10.0):
+        self.interval = interval
+        self._last: Dict[Tuple[int, int], float] = {}
+        self._lock = threading.Lock()
+
+    def _allow(self, key: Tuple[int, int], now: float) -> bool:
+        last = self._last.get(key)
+        if last is not None and now - last < self.interval:
+            return False
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < self.interval:
+                return False
+            self._last[key] = now
+            return True
+
+    def for_counter(self, child, exemplar: Optional[Dict[str, str]],
+                    now: Optional[float] = None) -> Optional[Dict[str, str]]:
+        """Return ``exemplar`` if the counter child may take it now, else None."""
+        if exemplar is None:
+            return None
+        if now is None:
+            now = time.time()
+        return exemplar if self._allow((id(child), 0), now) else None
+
+    def for_histogram(self, child, value: float, exemplar: Optional[Dict[str, str]],
+                      now: Optional[float] = None) -> Optional[Dict[str, str]]:
+        """Return ``exemplar`` if the bucket ``value`` lands in may take it now."""
+        if exemplar is None:
+            return None
+        if now is None:
+            now = time.time()
+        bucket = bisect_left(child._upper_bounds, value)
+        return exemplar if self._allow((id(child), bucket), now) else None
@@ -0,0 +1,148 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+
+from app.config import config
+
+class SpaceSaving:
+    """Top-K frequent items in fixed memory (Space-Saving algorithm).
+
+    At most ``capacity`` counters are kept. An unseen item replaces the item
+    with the smallest count and inherits that count as its error, so every
+    estimate satisfies ``count - error <= true count <= count``. Counts are
+    multiplied by ``decay`` each ``decay_seconds`` so old bursts fade out.
+    """
+
+    def __init__(self, capacity: int = 64, decay: float = 0.5, decay_seconds: float = 60.0):
+        self.capacity = capacity
+        self.decay = decay
+        self.decay_seconds = decay_seconds
+        self._counts: Dict[str, List[float]] = {}  # item -> [count, error]
+        self.total = 0.0
+        self._last_decay: Optional[float] = None
+
+    def add(self, item: str, now: float):
+        self._maybe_decay(now)
+        self.total += 1
+        entry = self._counts.get(item)
+        if entry is not None:
+            entry[0] += 1
+            return
+        if len(self._counts) < self.capacity:
+            self._counts[item] = [1.0, 0.0]
+            return
+
+        victim = min(self._counts, key=lambda key: self._counts[key][0])
+        floor = self._counts.pop(victim)[0]
+        self._counts[item] = [floor + 1, floor]
+
+    def _maybe_decay(self, now: float):
+        if self._last_decay is None:
+            self._last_decay = now
+            return
+        periods = int((now - self._last_decay) // self.decay_seconds)
+        if periods <= 0:
+            return
+        factor = self.decay ** periods
+        self.total *= factor
+        for entry in self._counts.values():
+            entry[0] *= factor
+            entry[1] *= factor
+        self._last_decay += periods * self.decay_seconds
+
+    def top(self, k: int, now: Optional[float] = None) -> List[Tuple[str, float, float]]:
+        """Return up to ``k`` (item, count, error) tuples, largest first."""
+        if now is not None:
+            self._maybe_decay(now)
+        ranked = sorted(self._counts.items(), key=lambda kv: kv[1][0], reverse=True)
+        return [(item, count, error) for item, (count, error) in ranked[:k]]
+
+class HeavyHitterTracker:
+    """Space-Saving summaries for raw paths, client addresses and user agents."""
+
+    DIMENSIONS: Tuple[str, ...] = ("path", "client", "user_agent")
+
+    def __init__(self, capacity: int = 64, top_k: int = 5, decay: float = 0.5,
+                 decay_seconds: float = 60.0):
+        self.top_k = top_k
+        self._summaries = {
+            dimension: SpaceSaving(capacity, decay, decay_seconds) for dimension in self.DIMENSIONS
+        }
+        self._lock = threading.Lock()
+
+    def record(self, path: str, client: Optional[str], user_agent: Optional[str],
+               now: Optional[float] = None):
+        if now is None:
+            now = time.time()
+        with self._lock:
+            self._summaries["path"].add(path, now)
+            self._summaries["client"].add(client or "unknown", now)
+            self._summaries["user_agent"].add(user_agent or "unknown", now)
+
+    def top(self, k: Optional[int] = None, now: Optional[float] = None) -> Dict[str, Dict[str, object]]:
+        """Return the decayed top-k per dimension with Space-Saving error bounds."""
+        if k is None:
+            k = self.top_k
+        if now is None:
+            now = time.time()
+
+        result = {}
+        with self._lock:
+            for dimension, summary in self._summaries.items():
+                items = summary.top(k, now)
+                total = summary.total
+                result[dimension] = {
+                    "total": total,
+                    "capacity": summary.capacity,
+                    "items": [
+                        {
+                            "value": item,
+                            "count": count,
+                            "error": error,
+                            "lower_bound": count - error,
+                            "share": count / total if total else 0.0,
+                            # Guaranteed to be a true heavy hitter above total/capacity
+                            "guaranteed": count - error > total / summary.capacity
+                        }
+                        for item, count, error in items
+                    ]
+                }
+        return result
+
+class HeavyHitterCollector:
+    """Exports the top-K counts by rank, so the series set never grows."""
+
+    def __init__(self, tracker: HeavyHitterTracker):
+        self.tracker = tracker
+
+    def collect(self):
+        count = GaugeMetricFamily(
+            'heavy_hitter_count',
+            'Decayed request count of the Nth heaviest item per dimension',
+            labels=['dimension', 'rank']
+        )
+        share = GaugeMetricFamily(
+            'heavy_hitter_share',
+            'Share of decayed traffic taken by the Nth heaviest item per dimension',
+            labels=['dimension', 'rank']
+        )
+        for dimension, summary in self.tracker.top().items():
+            items = summary["items"]
+            for rank in range(1, self.tracker.top_k + 1):
+                item = items[rank - 1] if rank <= len(items) else None
+                count.add_metric([dimension, str(rank)], item["count"] if item else 0.0)
+                share.add_metric([dimension, str(rank)], item["share"] if item else 0.0)
+        yield count
+        yield share
+
+# Global instance
+heavy_hitters = HeavyHitterTracker(
+    capacity=config.HEAVY_HITTER_CAPACITY,
+    top_k=config.HEAVY_HITTER_TOP_K,
+    decay=config.HEAVY_HITTER_DECAY,
+    decay_seconds=config.HEAVY_HITTER_DECAY_SECONDS
+)
+REGISTRY.register(HeavyHitterCollector(heavy_hitters))
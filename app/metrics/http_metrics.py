@@ -1,39 +1,77 @@
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, REGISTRY
+import json
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
 from app.config import config
+from app.metrics.bucket_layouts import BucketLayouts, LayoutHistogram, load_bucket_layouts
+from app.metrics.cardinality import CardinalityGuard
+from app.metrics.exemplars import ExemplarSampler
+from app.metrics.slo import slo_tracker
 
 class HTTPMetricsCollector:
     """Collects HTTP request metrics for monitoring."""
 
-    def __init__(self):
+    def __init__(self, registry=REGISTRY, slo=None, cardinality=None,
+                 bucket_layouts: Optional[BucketLayouts] = None):
+        # Optional SLOTracker fed with every completed request
+        self.slo = slo
+
+        # Per-endpoint extra buckets from calibration (see bucket_calibration)
+        if bucket_layouts is None:
+            bucket_layouts = load_bucket_layouts(config.BUCKET_LAYOUTS_PATH)
+        self.bucket_layouts = bucket_layouts
+
+        # Per-family series budget for the labelled families below
+        if cardinality is None:
+            cardinality = CardinalityGuard(
+                registry=registry,
+                default_budget=config.METRIC_SERIES_BUDGET,
+                budgets=json.loads(config.METRIC_SERIES_BUDGETS)
+            )
+        self.cardinality = cardinality
+
+        # (path regex, template) of parameterised routes, see set_routes
+        self._route_templates: List[Tuple[Pattern, str]] = []
+
+        # Rate-limits exemplar replacement per bucket
+        self.exemplars = ExemplarSampler(interval=config.EXEMPLAR_INTERVAL_SECONDS)
+
         # Request volume metrics
         self.requests_total = Counter(
             'http_requests_total',
             'Total HTTP requests',
-            ['method', 'endpoint', 'status_code']
+            ['method', 'endpoint', 'status_code'],
+            registry=registry
         )
 
         # Request performance metrics
-        self.request_duration = Histogram(
+        self.request_duration = LayoutHistogram(
             'http_request_duration_seconds',
             'HTTP request duration in seconds',
             ['method', 'endpoint'],
-            buckets=config.REQUEST_DURATION_BUCKETS
+            buckets=config.REQUEST_DURATION_BUCKETS,
+            layouts=bucket_layouts.get('http_request_duration_seconds'),
+            registry=registry
         )
 
         # Request size metrics
-        self.request_size = Histogram(
+        self.request_size = LayoutHistogram(
             'http_request_size_bytes',
             'HTTP request size in bytes',
             ['method', 'endpoint'],
-            buckets=(100, 1000, 10000, 100000, 1000000, 10000000)
+            buckets=config.SIZE_BUCKETS,
+            layouts=bucket_layouts.get('http_request_size_bytes'),
+            registry=registry
         )
 
         # Response size metrics
-        self.response_size = Histogram(
+        self.response_size = LayoutHistogram(
             'http_response_size_bytes',
             'HTTP response size in bytes',
             ['method', 'endpoint', 'status_code'],
-            buckets=(100, 1000, 10000, 100000, 1000000, 10000000)
+            buckets=config.SIZE_BUCKETS,
+            layouts=bucket_layouts.get('http_response_size_bytes'),
+            registry=registry
         )
 
         # Active requests gauge
@@ -41,48 +79,101 @@ class HTTPMetricsCollector:
         self.active_requests = Gauge(
             'http_requests_active',
             'Number of active HTTP requests',
-            ['method', 'endpoint']
+            ['method', 'endpoint'],
+            registry=registry
+        )
+
+        # Response cache effectiveness for GET /data/{key}
+        self.response_cache_lookups = Counter(
+            'http_response_cache_lookups_total',
+            'Response cache lookups for data reads',
+            ['result'],
+            registry=registry
+        )
+        for result in ('hit', 'miss'):
+            self.response_cache_lookups.labels(result=result)
+
+        # Per-client rate limiting
+        self.rate_limited_total = Counter(
+            'http_requests_rate_limited_total',
+            'Requests rejected with 429 by the per-client rate limiter',
+            ['route'],
+            registry=registry
+        )
+        self.rate_limit_clients = Gauge(
+            'http_rate_limit_clients',
+            'Client buckets currently tracked by the rate limiter',
+            registry=registry
         )
 
     def record_request(self, method: str, endpoint: str, status_code: int,
-                      duration: float, request_size: int = 0, response_size: int = 0):
-        """Record metrics for a completed HTTP request."""
+                      duration: float, request_size: int = 0, response_size: int = 0,
+                      exemplar: Optional[Dict[str, str]] = None):
+        """Record metrics for a completed HTTP request.
+
+        ``exemplar`` (e.g. ``{"trace_id": ...}``) is attached to the request
+        counter and duration bucket when the sampler allows it.
+        """
 
         # Normalize endpoint to avoid high cardinality
         normalized_endpoint = self._normalize_endpoint(endpoint)
 
         # Record request count
-        self.requests_total.labels(
+        requests_child = self.cardinality.labels(
+            'http_requests_total', self.requests_total,
             method=method,
             endpoint=normalized_endpoint,
             status_code=str(status_code)
-        ).inc()
+        )
+        requests_child.inc(exemplar=self.exemplars.for_counter(requests_child, exemplar))
 
         # Record request duration
-        self.request_duration.labels(
+        duration_child = self.cardinality.labels(
+            'http_request_duration_seconds', self.request_duration,
             method=method,
             endpoint=normalized_endpoint
-        ).observe(duration)
+        )
+        duration_child.observe(
+            duration,
+            exemplar=self.exemplars.for_histogram(duration_child, duration, exemplar)
+        )
 
         # Record request size
         if request_size > 0:
-            self.request_size.labels(
+            self.cardinality.labels(
+                'http_request_size_bytes', self.request_size,
                 method=method,
                 endpoint=normalized_endpoint
             ).observe(request_size)
 
         # Record response size
         if response_size > 0:
-            self.response_size.labels(
+            self.cardinality.labels(
+                'http_response_size_bytes', self.response_size,
                 method=method,
                 endpoint=normalized_endpoint,
                 status_code=str(status_code)
             ).observe(response_size)
 
+        # Feed SLO good/bad event counts
+        if self.slo is not None:
+            self.slo.record(normalized_endpoint, status_code, duration)
+
+    def record_cache_lookup(self, hit: bool):
+        """Record a response cache hit or miss."""
+        self.response_cache_lookups.labels(result='hit' if hit else 'miss').inc()
+
+    def record_rate_limit(self, route: str, allowed: bool, tracked_clients: int):
+        """Record a rate limiter decision for a limited ``route``."""
+        if not allowed:
+            self.rate_limited_total.labels(route=route).inc()
+        self.rate_limit_clients.set(tracked_clients)
+
     def increment_active_requests(self, method: str, endpoint: str):
         """Increment active requests counter."""
         normalized_endpoint = self._normalize_endpoint(endpoint)
-        self.active_requests.labels(
+        self.cardinality.labels(
+            'http_requests_active', self.active_requests,
             method=method,
             endpoint=normalized_endpoint
         ).inc()
@@ -90,17 +181,35 @@ class HTTPMetricsCollector:
     def decrement_active_requests(self, method: str, endpoint: str):
         """Decrement active requests counter."""
         normalized_endpoint = self._normalize_endpoint(endpoint)
-        self.active_requests.labels(
+        self.cardinality.labels(
+            'http_requests_active', self.active_requests,
             method=method,
             endpoint=normalized_endpoint
         ).dec()
 
+    def set_routes(self, routes: Iterable):
+        """Label requests to parameterised routes with the route template.
+
+        ``/data/abc`` becomes ``/data/{key}`` whatever the key looks like;
+        paths matching no route fall back to the UUID/number rewriting.
+        """
+        self._route_templates = [
+            (route.path_regex, route.path)
+            for route in routes
+            if '{' in getattr(route, 'path', '') and getattr(route, 'path_regex', None) is not None
+        ]
+
     def _normalize_endpoint(self, endpoint: str) -> str:
         """Normalize endpoint to reduce cardinality."""
         # Remove query parameters
         if '?' in endpoint:
             endpoint = endpoint.split('?')[0]
 
+        # Route templates first, in routing order
+        for path_regex, template in self._route_templates:
+            if path_regex.match(endpoint):
+                return template
+
         # Replace path parameters with placeholders
         import re
         # Replace UUIDs with {uuid}
@@ -111,4 +220,4 @@ class HTTPMetricsCollector:
         return endpoint
 
 # Global instance
-http_metrics = HTTPMetricsCollector()
+http_metrics = HTTPMetricsCollector(slo=slo_tracker)
@@ -0,0 +1,174 @@
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.config import config
+from app.metrics.cardinality import OVERFLOW_LABEL
+from app.metrics.http_metrics import http_metrics
+
+class DDSketch:
+    """Streaming quantile sketch with bounded relative error (DDSketch).
+
+    Values map to logarithmic bins of ratio ``gamma``, so any quantile is
+    returned within ``relative_accuracy`` of the true value. Once more than
+    ``max_bins`` bins are in use the lowest bins are collapsed together,
+    which keeps memory bounded and only degrades the smallest quantiles.
+    """
+
+    MIN_VALUE = 1e-9
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 1024):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        if value <= self.MIN_VALUE:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self._bins[key] = self._bins.get(key, 0) + 1
+        if len(self._bins) > self.max_bins:
+            self._collapse()
+
+    def merge(self, other: "DDSketch"):
+        """Fold ``other`` (built with the same accuracy) into this sketch."""
+        self.count += other.count
+        self.sum += other.sum
+        self.zero_count += other.zero_count
+        for key, count in other._bins.items():
+            self._bins[key] = self._bins.get(key, 0) + count
+        if len(self._bins) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self):
+        keys = sorted(self._bins)
+        excess = len(keys) - self.max_bins
+        target = keys[excess]
+        for key in keys[:excess]:
+            self._bins[target] += self._bins.pop(key)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self._bins):
+            seen += self._bins[key]
+            if seen > rank:
+                return 2 * self._gamma ** key / (self._gamma + 1)
+        return 2 * self._gamma ** max(self._bins) / (self._gamma + 1)
+
+class RollingSketch:
+    """Ring of per-slice sketches covering the longest summary window.
+
+    Each slot holds the observations of one ``slice_seconds`` interval and is
+    reset when the ring wraps around to it, so memory per series is fixed at
+    ``slots * max_bins`` regardless of traffic.
+    """
+
+    def __init__(self, slice_seconds: float, slots: int, relative_accuracy: float, max_bins: int):
+        self.slice_seconds = slice_seconds
+        self._relative_accuracy = relative_accuracy
+        self._max_bins = max_bins
+        self._epochs: List[int] = [-1] * slots
+        self._sketches: List[DDSketch] = [
+            DDSketch(relative_accuracy, max_bins) for _ in range(slots)
+        ]
+
+    def add(self, value: float, now: float):
+        epoch = int(now // self.slice_seconds)
+        slot = epoch % len(self._sketches)
+        if self._epochs[slot] != epoch:
+            self._sketches[slot] = DDSketch(self._relative_accuracy, self._max_bins)
+            self._epochs[slot] = epoch
+        self._sketches[slot].add(value)
+
+    def window(self, seconds: float, now: float) -> DDSketch:
+        """Merge the slices that fall inside the last ``seconds``."""
+        current = int(now // self.slice_seconds)
+        oldest = current - max(1, math.ceil(seconds / self.slice_seconds)) + 1
+        merged = DDSketch(self._relative_accuracy, self._max_bins)
+        for epoch, sketch in zip(self._epochs, self._sketches):
+            if oldest <= epoch <= current:
+                merged.merge(sketch)
+        return merged
+
+class LatencySummary:
+    """Per-(method, endpoint) rolling latency quantiles for /metrics/summary."""
+
+    WINDOWS: Tuple[Tuple[str, int], ...] = (("1m", 60), ("5m", 300), ("15m", 900))
+    QUANTILES: Tuple[float, ...] = (0.5, 0.9, 0.99, 0.999)
+
+    def __init__(self, slice_seconds: float = 15.0, relative_accuracy: float = 0.01,
+                 max_bins: int = 1024, max_series: int = 1000):
+        self.slice_seconds = slice_seconds
+        self.max_series = max_series
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        longest = max(seconds for _, seconds in self.WINDOWS)
+        self._slots = math.ceil(longest / slice_seconds) + 1
+        self._series: Dict[Tuple[str, str], RollingSketch] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method: str, endpoint: str, duration: float, now: Optional[float] = None):
+        """Record one request duration (seconds)."""
+        if now is None:
+            now = time.time()
+        key = (method, http_metrics._normalize_endpoint(endpoint))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None and len(self._series) >= self.max_series:
+                # Same budget as the Prometheus families: fold into one series
+                key = (OVERFLOW_LABEL, OVERFLOW_LABEL)
+                series = self._series.get(key)
+            if series is None:
+                series = RollingSketch(self.slice_seconds, self._slots,
+                                       self.relative_accuracy, self.max_bins)
+                self._series[key] = series
+            series.add(duration, now)
+
+    def summary(self, now: Optional[float] = None) -> Dict[str, object]:
+        """Return count, mean and quantiles per series and window."""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            items = list(self._series.items())
+
+        series = []
+        for (method, endpoint), rolling in sorted(items):
+            windows = {}
+            for name, seconds in self.WINDOWS:
+                with self._lock:
+                    sketch = rolling.window(seconds, now)
+                windows[name] = {
+                    "count": sketch.count,
+                    "mean": sketch.sum / sketch.count if sketch.count else None,
+                    **{f"p{q * 100:g}": sketch.quantile(q) for q in self.QUANTILES}
+                }
+            series.append({"method": method, "endpoint": endpoint, "windows": windows})
+
+        return {
+            "generated_at": now,
+            "relative_accuracy": self.relative_accuracy,
+            "slice_seconds": self.slice_seconds,
+            "series": series
+        }
+
+# Global instance
+latency_summary = LatencySummary(
+    slice_seconds=config.SUMMARY_SLICE_SECONDS,
+    relative_accuracy=config.SUMMARY_RELATIVE_ACCURACY,
+    max_bins=config.SUMMARY_MAX_BINS,
+    max_series=config.METRIC_SERIES_BUDGET
+)
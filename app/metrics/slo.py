@@ -0,0 +1,183 @@
+import json
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from prometheus_client import REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+
+from app.config import config
+
+class EventRing:
+    """Good/bad event counts in fixed time buckets covering the longest window.
+
+    Counts live in preallocated arrays indexed by ``epoch % buckets``; a bucket
+    is zeroed lazily the first time it is reused, so memory never grows.
+    """
+
+    def __init__(self, bucket_seconds: float, buckets: int):
+        self.bucket_seconds = bucket_seconds
+        self._epochs = array('q', [-1] * buckets)
+        self._good = array('Q', [0] * buckets)
+        self._bad = array('Q', [0] * buckets)
+
+    def add(self, good: bool, now: float):
+        epoch = int(now // self.bucket_seconds)
+        slot = epoch % len(self._epochs)
+        if self._epochs[slot] != epoch:
+            self._epochs[slot] = epoch
+            self._good[slot] = 0
+            self._bad[slot] = 0
+        if good:
+            self._good[slot] += 1
+        else:
+            self._bad[slot] += 1
+
+    def totals(self, seconds: float, now: float) -> Tuple[int, int]:
+        """Return (good, bad) counts for the last ``seconds``."""
+        current = int(now // self.bucket_seconds)
+        oldest = current - max(1, int(seconds // self.bucket_seconds)) + 1
+        good = bad = 0
+        for slot, epoch in enumerate(self._epochs):
+            if oldest <= epoch <= current:
+                good += self._good[slot]
+                bad += self._bad[slot]
+        return good, bad
+
+class SLO:
+    """Availability and latency objectives for one endpoint pattern.
+
+    ``endpoint`` is a normalised endpoint, a prefix ending in ``*``, or ``*``
+    for every endpoint. A request is bad for availability when it returns a
+    5xx, and bad for latency when it takes longer than ``latency_threshold``.
+    """
+
+    def __init__(self, name: str, endpoint: str = "*", availability: float = 0.999,
+                 latency_threshold: float = 0.5, latency_target: float = 0.99):
+        self.name = name
+        self.endpoint = endpoint
+        self.availability = availability
+        self.latency_threshold = latency_threshold
+        self.latency_target = latency_target
+
+    def matches(self, endpoint: str) -> bool:
+        if self.endpoint.endswith("*"):
+            return endpoint.startswith(self.endpoint[:-1])
+        return endpoint == self.endpoint
+
+class SLOTracker:
+    """Multi-window good/bad event counts and error-budget burn rates."""
+
+    WINDOWS: Tuple[Tuple[str, int], ...] = (("5m", 300), ("1h", 3600), ("6h", 21600))
+
+    def __init__(self, slos: Iterable[SLO], bucket_seconds: float = 10.0):
+        self.slos: List[SLO] = list(slos)
+        longest = max(seconds for _, seconds in self.WINDOWS)
+        buckets = int(longest // bucket_seconds) + 1
+        self._rings: Dict[Tuple[str, str], EventRing] = {}
+        for slo in self.slos:
+            self._rings[(slo.name, "availability")] = EventRing(bucket_seconds, buckets)
+            self._rings[(slo.name, "latency")] = EventRing(bucket_seconds, buckets)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, status_code: int, duration: float, now: Optional[float] = None):
+        """Count one completed request against every matching SLO."""
+        if now is None:
+            now = time.time()
+        for slo in self.slos:
+            if not slo.matches(endpoint):
+                continue
+            with self._lock:
+                self._rings[(slo.name, "availability")].add(status_code < 500, now)
+                self._rings[(slo.name, "latency")].add(duration <= slo.latency_threshold, now)
+
+    def export_rings(self) -> List[Tuple[str, str, float, array, array, array]]:
+        """Copy every ring as (slo, objective, bucket_seconds, epochs, good, bad)."""
+        with self._lock:
+            return [
+                (name, objective, ring.bucket_seconds,
+                 array('q', ring._epochs), array('Q', ring._good), array('Q', ring._bad))
+                for (name, objective), ring in self._rings.items()
+            ]
+
+    def import_ring(self, name: str, objective: str, bucket_seconds: float,
+                    epochs: array, good: array, bad: array) -> bool:
+        """Merge a ring saved by ``export_rings``; False if it does not fit.
+
+        Buckets are keyed by wall-clock epoch, so counts from before a
+        restart land in the same windows they were recorded in.
+        """
+        ring = self._rings.get((name, objective))
+        if ring is None or ring.bucket_seconds != bucket_seconds or len(epochs) != len(ring._epochs):
+            return False
+        with self._lock:
+            for slot, epoch in enumerate(epochs):
+                if epoch < 0:
+                    continue
+                if ring._epochs[slot] != epoch:
+                    if ring._epochs[slot] > epoch:
+                        continue
+                    ring._epochs[slot] = epoch
+                    ring._good[slot] = 0
+                    ring._bad[slot] = 0
+                ring._good[slot] += good[slot]
+                ring._bad[slot] += bad[slot]
+        return True
+
+    def burn_rates(self, now: Optional[float] = None) -> List[Tuple[SLO, str, str, float]]:
+        """Return (slo, objective, window, burn rate) for every combination.
+
+        A burn rate of 1 spends the error budget exactly over the SLO period;
+        14.4 over 1h spends 2% of a 30-day budget.
+        """
+        if now is None:
+            now = time.time()
+        rates = []
+        for slo in self.slos:
+            for objective, target in (("availability", slo.availability),
+                                      ("latency", slo.latency_target)):
+                ring = self._rings[(slo.name, objective)]
+                for window, seconds in self.WINDOWS:
+                    with self._lock:
+                        good, bad = ring.totals(seconds, now)
+                    total = good + bad
+                    budget = 1.0 - target
+                    rate = (bad / total) / budget if total and budget > 0 else 0.0
+                    rates.append((slo, objective, window, rate))
+        return rates
+
+class SLOCollector:
+    """Exports SLO burn rates and targets, computed only when scraped."""
+
+    def __init__(self, tracker: SLOTracker):
+        self.tracker = tracker
+
+    def collect(self):
+        burn = GaugeMetricFamily(
+            'slo_burn_rate',
+            'Error budget burn rate per SLO, objective and window',
+            labels=['slo', 'objective', 'window']
+        )
+        for slo, objective, window, rate in self.tracker.burn_rates():
+            burn.add_metric([slo.name, objective, window], rate)
+
+        target = GaugeMetricFamily(
+            'slo_objective_target',
+            'Target fraction of good events per SLO and objective',
+            labels=['slo', 'objective']
+        )
+        for slo in self.tracker.slos:
+            target.add_metric([slo.name, 'availability'], slo.availability)
+            target.add_metric([slo.name, 'latency'], slo.latency_target)
+
+        yield burn
+        yield target
+
+def load_slos(spec: str) -> List[SLO]:
+    """Build SLOs from the JSON list in ``Config.SLO_TARGETS``."""
+    return [SLO(**entry) for entry in json.loads(spec)]
+
+# Global instance
+slo_tracker = SLOTracker(load_slos(config.SLO_TARGETS), bucket_seconds=config.SLO_BUCKET_SECONDS)
+REGISTRY.register(SLOCollector(slo_tracker))
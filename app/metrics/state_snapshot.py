@@ -0,0 +1,339 @@
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from typing import List, Optional, Tuple
+
+from prometheus_client import Counter, Info, REGISTRY
+from prometheus_client.metrics import MetricWrapperBase
+
+from app.config import config
+from app.metrics.cardinality import OVERFLOW_LABEL
+from app.metrics.http_metrics import http_metrics
+from app.metrics.slo import slo_tracker
+
+MAGIC = b"FMSTATE\0"
+VERSION = 1
+
+# File header: magic, format version, reserved, slot size
+FILE_HEADER = struct.Struct("<8sIIQ")
+# Slot header: sequence, process generation, timestamp, payload length, CRC32
+SLOT_HEADER = struct.Struct("<QQdQI4x")
+
+RECORD_COUNTER = 0
+RECORD_HISTOGRAM = 1
+RECORD_SLO_RING = 2
+
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_F64 = struct.Struct("<d")
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, fmt: struct.Struct):
+        values = fmt.unpack_from(self.data, self.offset)
+        self.offset += fmt.size
+        return values[0] if len(values) == 1 else values
+
+    def string(self) -> str:
+        length = self.unpack(_U16)
+        value = self.data[self.offset:self.offset + length].decode("utf-8")
+        self.offset += length
+        return value
+
+    def array(self, typecode: str, count: int) -> array:
+        values = array(typecode)
+        size = values.itemsize * count
+        values.frombytes(self.data[self.offset:self.offset + size])
+        self.offset += size
+        return values
+
+    def done(self) -> bool:
+        return self.offset >= len(self.data)
+
+def _string(value: str) -> bytes:
+    encoded = value.encode("utf-8")
+    return _U16.pack(len(encoded)) + encoded
+
+class StateSnapshotter:
+    """Persists counter, histogram and SLO state in a memory-mapped file.
+
+    The file holds a small header and two fixed-size slots. Each write
+    serialises the current state into the slot not holding the latest
+    snapshot, writing the payload first and the slot header (sequence
+    number and CRC32) last, then ``flush()``es the mapping. A crash
+    mid-write leaves a slot whose CRC does not match, so readers fall back
+    to the other slot and always see a complete snapshot. When the state
+    outgrows a slot the file is rebuilt with larger slots in a temp file
+    and renamed into place.
+
+    Every restore bumps the process generation, exported as
+    ``metrics_process_generation_info{generation="N"}``, so counter resets
+    stay detectable even though values continue across restarts.
+    Series under ``exclude_prefixes`` (process and GC stats, which are
+    absolute readings of the current process) are never persisted, nor
+    are series with a label value too long for the format (64 KiB).
+    """
+
+    def __init__(self, path: str, registry=REGISTRY, slo=None, cardinality=None,
+                 exclude_prefixes: Tuple[str, ...] = ("process_", "python_"),
+                 slot_size: int = 1 << 20):
+        self.path = path
+        self.registry = registry
+        self.slo = slo
+        self.cardinality = cardinality
+        self.exclude_prefixes = exclude_prefixes
+        self.slot_size = slot_size
+        self.generation = 1
+        self._seq = 0
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+
+        self.snapshots_total = Counter(
+            'metrics_state_snapshots_total',
+            'State snapshots written',
+            ['result'],
+            registry=registry
+        )
+        for result in ('ok', 'error'):
+            self.snapshots_total.labels(result=result)
+        self.generation_info = Info(
+            'metrics_process_generation',
+            'Process generation, incremented each time state is restored from a snapshot',
+            registry=registry
+        )
+        self.generation_info.info({'generation': str(self.generation)})
+
+    def _metrics(self) -> List[MetricWrapperBase]:
+        metrics = []
+        for collector in list(self.registry._collector_to_names):
+            if (isinstance(collector, MetricWrapperBase)
+                    and collector._type in ('counter', 'histogram')
+                    and not collector._name.startswith(self.exclude_prefixes)):
+                metrics.append(collector)
+        return metrics
+
+    @staticmethod
+    def _children(metric: MetricWrapperBase):
+        if not metric._labelnames:
+            return [((), metric)]
+        with metric._lock:
+            return list(metric._metrics.items())
+
+    def capture(self) -> bytes:
+        """Serialise every counter, histogram and SLO ring."""
+        parts: List[bytes] = []
+        for metric in self._metrics():
+            for values, child in self._children(metric):
+                try:
+                    header = _string(metric._name) + _U8.pack(len(values)) + b"".join(_string(v) for v in values)
+                except struct.error:
+                    # Label value over 64 KiB: skip the series, keep the rest
+                    continue
+                if metric._type == 'counter':
+                    parts.append(_U8.pack(RECORD_COUNTER) + header + _F64.pack(child._value.get()))
+                else:
+                    bounds = array('d', child._upper_bounds)
+                    counts = array('d', (bucket.get() for bucket in child._buckets))
+                    parts.append(
+                        _U8.pack(RECORD_HISTOGRAM) + header + _U16.pack(len(bounds))
+                        + bounds.tobytes() + counts.tobytes() + _F64.pack(child._sum.get())
+                    )
+        if self.slo is not None:
+            for name, objective, bucket_seconds, epochs, good, bad in self.slo.export_rings():
+                parts.append(
+                    _U8.pack(RECORD_SLO_RING) + _string(name) + _string(objective)
+                    + _F64.pack(bucket_seconds) + _U32.pack(len(epochs))
+                    + epochs.tobytes() + good.tobytes() + bad.tobytes()
+                )
+        return b"".join(parts)
+
+    def write(self) -> bool:
+        """Write a snapshot; returns False (and counts an error) on failure."""
+        try:
+            payload = self.capture()
+            with self._lock:
+                self._write(payload)
+            self.snapshots_total.labels(result='ok').inc()
+            return True
+        except (OSError, ValueError, struct.error) as e:
+            self.snapshots_total.labels(result='error').inc()
+            print(f"Error writing metrics state snapshot: {e}")
+            return False
+
+    def _write(self, payload: bytes):
+        capacity = self.slot_size - SLOT_HEADER.size
+        if self._map is None or len(payload) > capacity:
+            while len(payload) > self.slot_size - SLOT_HEADER.size:
+                self.slot_size *= 2
+            self._rebuild(payload)
+            return
+
+        self._seq += 1
+        offset = FILE_HEADER.size + (self._seq % 2) * self.slot_size
+        start = offset + SLOT_HEADER.size
+        self._map[start:start + len(payload)] = payload
+        self._map[offset:start] = self._slot_header(payload)
+        self._map.flush()
+
+    def _slot_header(self, payload: bytes) -> bytes:
+        return SLOT_HEADER.pack(self._seq, self.generation, time.time(), len(payload), zlib.crc32(payload))
+
+    def _rebuild(self, payload: bytes):
+        """Create the file with the current slot size, holding ``payload``."""
+        self.close()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._seq += 1
+        slot = bytearray(self.slot_size)
+        slot[:SLOT_HEADER.size] = self._slot_header(payload)
+        slot[SLOT_HEADER.size:SLOT_HEADER.size + len(payload)] = payload
+        empty = bytes(self.slot_size)
+        slots = (bytes(slot), empty) if self._seq % 2 == 0 else (empty, bytes(slot))
+
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(FILE_HEADER.pack(MAGIC, VERSION, 0, self.slot_size))
+            f.write(slots[0])
+            f.write(slots[1])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def close(self):
+        mapped, self._map = self._map, None
+        if mapped is not None:
+            mapped.close()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def read(self) -> Optional[Tuple[int, int, float, bytes]]:
+        """Latest complete snapshot as (sequence, generation, timestamp, payload)."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if len(data) < FILE_HEADER.size:
+            return None
+        magic, version, _, slot_size = FILE_HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            print(f"Ignoring metrics state snapshot {self.path}: unknown format")
+            return None
+
+        latest = None
+        for index in range(2):
+            offset = FILE_HEADER.size + index * slot_size
+            if offset + SLOT_HEADER.size > len(data):
+                continue
+            seq, generation, timestamp, length, crc = SLOT_HEADER.unpack_from(data, offset)
+            start = offset + SLOT_HEADER.size
+            payload = data[start:start + length]
+            if seq == 0 or len(payload) != length or zlib.crc32(payload) != crc:
+                continue
+            if latest is None or seq > latest[0]:
+                latest = (seq, generation, timestamp, payload)
+        return latest
+
+    def restore(self) -> int:
+        """Load the latest snapshot into the registry; returns series restored.
+
+        Call once at startup, before traffic. Counter and histogram values
+        are added to the (normally zero) live values; histograms whose
+        bucket layout changed are skipped.
+        """
+        snapshot = self.read()
+        self.slot_size = self._existing_slot_size() or self.slot_size
+        if snapshot is None:
+            self.generation_info.info({'generation': str(self.generation)})
+            return 0
+
+        seq, generation, _, payload = snapshot
+        self._seq = seq
+        self.generation = generation + 1
+        self.generation_info.info({'generation': str(self.generation)})
+
+        metrics = {metric._name: metric for metric in self._metrics()}
+        restored = 0
+        reader = _Reader(payload)
+        while not reader.done():
+            kind = reader.unpack(_U8)
+            if kind == RECORD_SLO_RING:
+                name, objective = reader.string(), reader.string()
+                bucket_seconds = reader.unpack(_F64)
+                count = reader.unpack(_U32)
+                epochs, good, bad = reader.array('q', count), reader.array('Q', count), reader.array('Q', count)
+                if self.slo is not None and self.slo.import_ring(name, objective, bucket_seconds, epochs, good, bad):
+                    restored += 1
+                continue
+
+            name = reader.string()
+            values = tuple(reader.string() for _ in range(reader.unpack(_U8)))
+            if kind == RECORD_COUNTER:
+                value = reader.unpack(_F64)
+                child = self._child(metrics.get(name), name + '_total', values)
+                if child is not None:
+                    child.inc(value)
+                    restored += 1
+            elif kind == RECORD_HISTOGRAM:
+                count = reader.unpack(_U16)
+                bounds, counts = reader.array('d', count), reader.array('d', count)
+                total = reader.unpack(_F64)
+                child = self._child(metrics.get(name), name, values)
+                if child is not None and list(bounds) == child._upper_bounds:
+                    for bucket, value in zip(child._buckets, counts):
+                        bucket.inc(value)
+                    child._sum.inc(total)
+                    restored += 1
+            else:
+                raise ValueError(f"Unknown record type {kind} in {self.path}")
+        return restored
+
+    def _child(self, metric: Optional[MetricWrapperBase], family: str, values: Tuple[str, ...]):
+        if metric is None or len(values) != len(metric._labelnames):
+            return None
+        if not values:
+            return metric
+        # Re-admit through the cardinality guard so budgets hold across restarts
+        overflow = all(value == OVERFLOW_LABEL for value in values)
+        if self.cardinality is not None and not overflow and not self.cardinality.admit(family, values):
+            return metric.labels(*(OVERFLOW_LABEL for _ in values))
+        return metric.labels(*values)
+
+    def _existing_slot_size(self) -> Optional[int]:
+        try:
+            with open(self.path, "rb") as f:
+                magic, version, _, slot_size = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+        except (OSError, struct.error):
+            return None
+        if magic != MAGIC or version != VERSION:
+            return None
+        return slot_size
+
+    def open(self):
+        """Map an existing file for writing (else the first write creates it)."""
+        with self._lock:
+            if self._map is None and self._existing_slot_size() == self.slot_size:
+                self._open()
+
+# Global instance
+state_snapshotter = StateSnapshotter(
+    path=config.STATE_SNAPSHOT_PATH,
+    slo=slo_tracker,
+    cardinality=http_metrics.cardinality
+)
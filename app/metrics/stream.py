@@ -0,0 +1,341 @@
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+from prometheus_client import Counter, Gauge, REGISTRY
+
+from app.config import config
+
+SLOW_CONSUMER_POLICIES = ("resync", "disconnect")
+
+SeriesKey = Tuple[str, str, Tuple[Tuple[str, str], ...]]
+
+def family_name(metric) -> str:
+    """Family name as shown on the text exposition's ``# TYPE`` line."""
+    if metric.type == 'counter':
+        return metric.name + '_total'
+    if metric.type == 'info':
+        return metric.name + '_info'
+    return metric.name
+
+def json_value(value: float):
+    """JSON-safe sample value; non-finite values use Prometheus spellings."""
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return value
+
+def _encode(message: dict) -> str:
+    return json.dumps(message, separators=(",", ":"))
+
+class Subscription:
+    """One streaming client: a family filter and a bounded message queue."""
+
+    def __init__(self, families: Optional[FrozenSet[str]], queue_size: int):
+        self.families = families
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # Set until the subscriber has been sent a full snapshot
+        self.resync = True
+
+    async def messages(self):
+        """Yield encoded messages until the stream drops this subscriber."""
+        while True:
+            message = await self.queue.get()
+            if message is None:
+                return
+            yield message
+
+class MetricsStream:
+    """Fans registry changes out to streaming subscribers.
+
+    A single producer task collects the registry every ``interval``
+    seconds, diffs it against the previous tick and encodes each distinct
+    message once: subscribers with the same family filter share one string.
+    Each series gets a small integer id; subscribers first receive a
+    ``snapshot`` (``[id, name, labels, value]`` per series) and then
+    ``delta`` messages with only the changed values (``[id, value]``),
+    definitions of series that appeared and ids of series that went away.
+
+    Subscriber queues are bounded. When one is full the subscriber is
+    either resynchronised (queued deltas are discarded and replaced by a
+    fresh snapshot) or disconnected, depending on ``slow_consumer``; the
+    producer never waits for a client.
+
+    The same diff backs cursor polling (``changes_since``): each series
+    remembers the tick it last changed at, kept in change order, so a
+    poll walks back only over the series changed since its cursor.
+    Removals are kept for the last ``history`` ticks' worth of
+    tombstones. Ticks start at the process start time in milliseconds,
+    so a cursor from an earlier process is always older than this
+    process's history and gets a full snapshot instead of a wrong delta.
+    """
+
+    def __init__(self, registry=REGISTRY, interval: float = 1.0, queue_size: int = 16,
+                 slow_consumer: str = "resync", max_subscribers: int = 100,
+                 history: int = 10000):
+        if slow_consumer not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy {slow_consumer!r}")
+        self.registry = registry
+        self.interval = interval
+        self.queue_size = queue_size
+        self.slow_consumer = slow_consumer
+        self.max_subscribers = max_subscribers
+        self.history = history
+        self.tick = int(time.time() * 1000)
+        self._history_floor = self.tick
+        self._updated_at = 0.0
+        self._ids: Dict[SeriesKey, int] = {}
+        self._keys: Dict[int, SeriesKey] = {}
+        self._values: Dict[int, float] = {}
+        self._next_id = 0
+        self._born: Dict[int, int] = {}
+        self._changed: "OrderedDict[int, int]" = OrderedDict()
+        self._removed: Deque[Tuple[int, int, str]] = deque()
+        self._update_lock = asyncio.Lock()
+        self._subscribers: Set[Subscription] = set()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.subscribers_gauge = Gauge(
+            'metrics_stream_subscribers',
+            'Connected live metrics stream subscribers',
+            registry=registry
+        )
+        self.subscribers_gauge.set_function(lambda: len(self._subscribers))
+        self.slow_consumers_total = Counter(
+            'metrics_stream_slow_consumers_total',
+            'Stream subscribers whose queue overflowed, by action taken',
+            ['action'],
+            registry=registry
+        )
+        for action in SLOW_CONSUMER_POLICIES:
+            self.slow_consumers_total.labels(action=action)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the producer task; call from the event loop."""
+        if not self.running:
+            self._wake = asyncio.Event()
+            self._update_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the producer and end every subscriber's stream."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscription in list(self._subscribers):
+            self._close(subscription)
+
+    def subscribe(self, families: Optional[Iterable[str]] = None) -> Optional[Subscription]:
+        """Register a subscriber, or return None when at ``max_subscribers``."""
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        subscription = Subscription(frozenset(families) if families else None, self.queue_size)
+        self._subscribers.add(subscription)
+        # Tick now so the new subscriber gets its snapshot without waiting
+        self._wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not self._subscribers:
+                continue
+            try:
+                await self.update()
+            except Exception as e:
+                print(f"Error in metrics stream producer: {e}")
+
+    async def update(self):
+        """Collect the registry (off the event loop), diff it and publish."""
+        async with self._update_lock:
+            current = await asyncio.to_thread(self.collect)
+            self.publish(self.advance(current))
+            self._updated_at = time.monotonic()
+
+    async def refresh(self, max_age: float):
+        """Update unless the last tick is younger than ``max_age`` seconds.
+
+        Concurrent pollers wait for one shared update instead of each
+        collecting the registry.
+        """
+        if time.monotonic() - self._updated_at < max_age:
+            return
+        async with self._update_lock:
+            if time.monotonic() - self._updated_at < max_age:
+                return
+        await self.update()
+
+    def collect(self) -> Dict[SeriesKey, float]:
+        """Current value of every sample, keyed by (family, name, labels)."""
+        current = {}
+        for metric in self.registry.collect():
+            family = family_name(metric)
+            for sample in metric.samples:
+                current[(family, sample.name, tuple(sorted(sample.labels.items())))] = sample.value
+        return current
+
+    def advance(self, current: Dict[SeriesKey, float]) -> Dict[str, Tuple[list, list, list]]:
+        """Diff ``current`` against the last tick.
+
+        Returns ``{family: (new series definitions, changed values, removed ids)}``.
+        """
+        self.tick += 1
+        changes: Dict[str, Tuple[list, list, list]] = {}
+        for key, value in current.items():
+            series_id = self._ids.get(key)
+            if series_id is None:
+                series_id = self._next_id
+                self._next_id += 1
+                self._ids[key] = series_id
+                self._keys[series_id] = key
+                self._born[series_id] = self.tick
+                added, changed, _ = changes.setdefault(key[0], ([], [], []))
+                added.append([series_id, key[1], dict(key[2])])
+            else:
+                previous = self._values[series_id]
+                if previous == value or (math.isnan(previous) and math.isnan(value)):
+                    continue
+                changed = changes.setdefault(key[0], ([], [], []))[1]
+            self._values[series_id] = value
+            self._changed[series_id] = self.tick
+            self._changed.move_to_end(series_id)
+            changed.append([series_id, json_value(value)])
+
+        if len(self._ids) > len(current):
+            for key in [key for key in self._ids if key not in current]:
+                series_id = self._ids.pop(key)
+                del self._keys[series_id]
+                del self._values[series_id]
+                del self._born[series_id]
+                del self._changed[series_id]
+                self._removed.append((self.tick, series_id, key[0]))
+                changes.setdefault(key[0], ([], [], []))[2].append(series_id)
+        while len(self._removed) > self.history:
+            self._history_floor = self._removed.popleft()[0]
+        return changes
+
+    def _series(self, families: Optional[FrozenSet[str]]) -> list:
+        return [
+            [series_id, key[1], dict(key[2]), json_value(self._values[series_id])]
+            for series_id, key in self._keys.items()
+            if families is None or key[0] in families
+        ]
+
+    def snapshot(self, families: Optional[FrozenSet[str]] = None) -> str:
+        """Encoded full snapshot of the selected families."""
+        return _encode({"type": "snapshot", "tick": self.tick, "series": self._series(families)})
+
+    def delta(self, changes: Dict[str, Tuple[list, list, list]],
+              families: Optional[FrozenSet[str]] = None) -> Optional[str]:
+        """Encoded delta of the selected families, or None if none changed."""
+        added: list = []
+        values: list = []
+        removed: list = []
+        for family, (family_added, family_values, family_removed) in changes.items():
+            if families is None or family in families:
+                added.extend(family_added)
+                values.extend(family_values)
+                removed.extend(family_removed)
+        if not (added or values or removed):
+            return None
+        return _encode({"type": "delta", "tick": self.tick, "series": added,
+                        "values": values, "removed": removed})
+
+    def changes_since(self, cursor: int, families: Optional[FrozenSet[str]] = None) -> dict:
+        """Series changed after tick ``cursor``, with the cursor for the next poll.
+
+        Same shape as a stream ``delta`` (names and labels only for series
+        the caller cannot know yet); a cursor outside the retained history
+        gets a ``snapshot`` instead.
+        """
+        if cursor < self._history_floor or cursor > self.tick:
+            return {"type": "snapshot", "cursor": self.tick, "series": self._series(families)}
+
+        added = []
+        values = []
+        for series_id in reversed(self._changed):
+            if self._changed[series_id] <= cursor:
+                break
+            key = self._keys[series_id]
+            if families is not None and key[0] not in families:
+                continue
+            if self._born[series_id] > cursor:
+                added.append([series_id, key[1], dict(key[2])])
+            values.append([series_id, json_value(self._values[series_id])])
+
+        removed = []
+        for tick, series_id, family in reversed(self._removed):
+            if tick <= cursor:
+                break
+            if families is None or family in families:
+                removed.append(series_id)
+        return {"type": "delta", "cursor": self.tick, "series": added, "values": values, "removed": removed}
+
+    def publish(self, changes: Dict[str, Tuple[list, list, list]]):
+        """Queue this tick's message for every subscriber without blocking."""
+        snapshots: Dict[Optional[FrozenSet[str]], str] = {}
+        deltas: Dict[Optional[FrozenSet[str]], Optional[str]] = {}
+        for subscription in list(self._subscribers):
+            if subscription.resync:
+                if subscription.families not in snapshots:
+                    snapshots[subscription.families] = self.snapshot(subscription.families)
+                message = snapshots[subscription.families]
+            else:
+                if subscription.families not in deltas:
+                    deltas[subscription.families] = self.delta(changes, subscription.families)
+                message = deltas[subscription.families]
+                if message is None:
+                    continue
+            try:
+                subscription.queue.put_nowait(message)
+                subscription.resync = False
+            except asyncio.QueueFull:
+                self._slow(subscription)
+
+    def _slow(self, subscription: Subscription):
+        self.slow_consumers_total.labels(action=self.slow_consumer).inc()
+        if self.slow_consumer == "disconnect":
+            self._close(subscription)
+            return
+        self._drain(subscription)
+        subscription.queue.put_nowait(self.snapshot(subscription.families))
+        subscription.resync = False
+
+    def _close(self, subscription: Subscription):
+        self.unsubscribe(subscription)
+        self._drain(subscription)
+        subscription.queue.put_nowait(None)
+
+    @staticmethod
+    def _drain(subscription: Subscription):
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+
+# Global instance
+metrics_stream = MetricsStream(
+    interval=config.METRICS_STREAM_INTERVAL,
+    queue_size=config.METRICS_STREAM_QUEUE_SIZE,
+    slow_consumer=config.METRICS_STREAM_SLOW_CONSUMER,
+    max_subscribers=config.METRICS_STREAM_MAX_SUBSCRIBERS,
+    history=config.METRICS_DELTA_HISTORY
+)
@@ -55,7 +55,7 @@ class SystemMetricsCollector:
 
         # GC and additional stats
         self.gc_collections_total = Counter(
-            'python_gc_collections_total',
+            'python_gc_collections_custom',  # Default GC collector already owns python_gc_collections
             'Number of garbage collections',
             ['generation']
         )
@@ -0,0 +1,115 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+import anyio.to_thread
+from prometheus_client import Gauge, Histogram, REGISTRY
+
+from app.metrics.http_metrics import http_metrics
+
+# Raw path of the request being handled, set by MetricsMiddleware
+_current_endpoint: ContextVar[Optional[str]] = ContextVar("threadpool_endpoint", default=None)
+
+THREADPOOL_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def set_endpoint(endpoint: str):
+    """Remember the current request's path for threadpool labels."""
+    _current_endpoint.set(endpoint)
+
+class ThreadpoolMetrics:
+    """Instruments AnyIO's default thread limiter used for sync handlers.
+
+    FastAPI runs sync endpoints and dependencies through
+    ``anyio.to_thread.run_sync`` on a limiter with 40 tokens by default.
+    ``install()`` resizes that limiter, exports its token counts, and wraps
+    ``run_sync`` so every call records how long it waited for a worker
+    thread (limiter queueing plus hand-off) and how long it ran there,
+    labelled by normalised endpoint.
+    """
+
+    def __init__(self, registry=REGISTRY):
+        self._limiter = None
+        self._original_run_sync = None
+
+        self.tokens_total = Gauge(
+            'threadpool_tokens_total',
+            'Worker threads allowed by the default thread limiter',
+            registry=registry
+        )
+        self.tokens_total.set_function(lambda: self._limiter.total_tokens if self._limiter else 0)
+        self.tokens_borrowed = Gauge(
+            'threadpool_tokens_borrowed',
+            'Thread limiter tokens currently in use',
+            registry=registry
+        )
+        self.tokens_borrowed.set_function(lambda: self._limiter.borrowed_tokens if self._limiter else 0)
+        self.tokens_available = Gauge(
+            'threadpool_tokens_available',
+            'Thread limiter tokens currently free',
+            registry=registry
+        )
+        self.tokens_available.set_function(lambda: self._limiter.available_tokens if self._limiter else 0)
+        self.wait_seconds = Histogram(
+            'threadpool_wait_seconds',
+            'Time sync work waited for a worker thread',
+            ['endpoint'],
+            buckets=THREADPOOL_BUCKETS,
+            registry=registry
+        )
+        self.run_seconds = Histogram(
+            'threadpool_run_seconds',
+            'Time sync work spent executing in a worker thread',
+            ['endpoint'],
+            buckets=THREADPOOL_BUCKETS,
+            registry=registry
+        )
+
+    @property
+    def installed(self) -> bool:
+        return self._original_run_sync is not None
+
+    def install(self, size: Optional[int] = None):
+        """Resize and instrument the default limiter; call from the event loop."""
+        self._limiter = anyio.to_thread.current_default_thread_limiter()
+        if size:
+            self._limiter.total_tokens = size
+        if self.installed:
+            return
+
+        original = anyio.to_thread.run_sync
+        metrics = self
+
+        async def run_sync(func, *args, cancellable: bool = False, limiter=None):
+            submitted = time.perf_counter()
+            endpoint = _current_endpoint.get()
+
+            def timed(*call_args):
+                started = time.perf_counter()
+                try:
+                    return func(*call_args)
+                finally:
+                    metrics.observe(endpoint, started - submitted, time.perf_counter() - started)
+
+            return await original(timed, *args, cancellable=cancellable, limiter=limiter)
+
+        self._original_run_sync = original
+        anyio.to_thread.run_sync = run_sync
+
+    def uninstall(self):
+        """Restore the original ``anyio.to_thread.run_sync``."""
+        if self._original_run_sync is not None:
+            anyio.to_thread.run_sync = self._original_run_sync
+            self._original_run_sync = None
+        self._limiter = None
+
+    def observe(self, endpoint: Optional[str], wait: float, run: float):
+        label = http_metrics._normalize_endpoint(endpoint) if endpoint else "unknown"
+        http_metrics.cardinality.labels(
+            'threadpool_wait_seconds', self.wait_seconds, endpoint=label
+        ).observe(wait)
+        http_metrics.cardinality.labels(
+            'threadpool_run_seconds', self.run_seconds, endpoint=label
+        ).observe(run)
+
+# Global instance
+threadpool_metrics = ThreadpoolMetrics()
@@ -0,0 +1,78 @@
+import json
+import threading
+import time
+from typing import Optional
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from prometheus_client import REGISTRY, make_wsgi_app
+from prometheus_client.exposition import ThreadingWSGIServer
+
+from app.config import config
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+class MetricsServer:
+    """Serves ``/metrics`` (and ``/health/live``) on its own port and thread.
+
+    Scrapes never pass through uvicorn's event loop, connection backlog or
+    middleware, so they are answered even while the application is
+    saturated, and a slow scrape never holds up a request. The server is
+    prometheus_client's WSGI exposition (content negotiation, gzip,
+    ``name[]`` filtering) on a threading WSGI server over the same registry.
+    Handler threads still share the GIL with the application, so a scrape's
+    CPU time is not free, only isolated from the request queue.
+    """
+
+    def __init__(self, host: str, port: int, registry=REGISTRY, health: bool = True):
+        self.host = host
+        self.port = port
+        self.health = health
+        self._metrics_app = make_wsgi_app(registry)
+        self._server: Optional[ThreadingWSGIServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._server is not None
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "/")
+        if path == "/metrics":
+            return self._metrics_app(environ, start_response)
+        if self.health and path == "/health/live":
+            body = json.dumps({"status": "alive", "timestamp": time.time()}).encode()
+            start_response("200 OK", [("Content-Type", "application/json"),
+                                      ("Content-Length", str(len(body)))])
+            return [body]
+        start_response("404 Not Found", [("Content-Type", "text/plain")])
+        return [b"Not Found"]
+
+    def start(self):
+        """Bind and serve in a daemon thread; ``port`` 0 picks a free port."""
+        if self.running:
+            return
+        self._server = make_server(self.host, self.port, self, ThreadingWSGIServer,
+                                   handler_class=_QuietHandler)
+        self.port = self._server.server_port
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="metrics-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving and close the listening socket."""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=5)
+        self._server = None
+        self._thread = None
+
+# Global instance
+metrics_server = MetricsServer(
+    host=config.METRICS_HOST or config.HOST,
+    port=config.METRICS_PORT,
+    health=config.METRICS_SERVER_HEALTH
+)
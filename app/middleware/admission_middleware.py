@@ -0,0 +1,23 @@
+import time
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.admission import admission
+
+class AdmissionControlMiddleware(BaseHTTPMiddleware):
+    """Sheds requests with a fast 503 once the adaptive concurrency limit is hit."""
+
+    async def dispatch(self, request: Request, call_next):
+        priority = admission.priority(request.url.path)
+        if not admission.try_acquire(priority):
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Server overloaded, retry later"},
+                headers={"Retry-After": str(admission.retry_after)}
+            )
+
+        start_time = time.perf_counter()
+        try:
+            return await call_next(request)
+        finally:
+            admission.release(priority, time.perf_counter() - start_time)
@@ -1,7 +1,16 @@
 import time
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
+from app.access_log import access_log
+from app.config import config
+from app.instrumentation import instrumentation
+from app.metrics.bucket_calibration import bucket_calibrator
+from app.metrics.exemplars import parse_traceparent, request_exemplar
+from app.metrics.heavy_hitters import heavy_hitters
 from app.metrics.http_metrics import http_metrics
+from app.metrics.latency_summary import latency_summary
+from app.metrics.threadpool_metrics import set_endpoint
+from app.tracing import tracer
 
 class MetricsMiddleware(BaseHTTPMiddleware):
     """Middleware to collect HTTP request metrics."""
@@ -11,13 +20,17 @@ class MetricsMiddleware(BaseHTTPMiddleware):
         if request.url.path == "/metrics":
             return await call_next(request)
 
+        # One snapshot of the instrumentation settings for the whole request
+        settings = instrumentation.current
+        sampled = settings.sampled()
+
         # Extract request information
         method = request.method
         endpoint = request.url.path
 
         # Get request size
         request_size = 0
-        if hasattr(request, 'headers'):
+        if settings.record_sizes and hasattr(request, 'headers'):
             content_length = request.headers.get('content-length')
             if content_length:
                 try:
@@ -25,22 +38,51 @@ class MetricsMiddleware(BaseHTTPMiddleware):
                 except ValueError:
                     pass
 
+        # Track heavy hitters on raw, unnormalised values (kept out of labels)
+        if settings.heavy_hitters and sampled:
+            heavy_hitters.record(
+                endpoint,
+                request.client.host if request.client else None,
+                request.headers.get('user-agent')
+            )
+
+        # Trace or request ID to attach as an exemplar
+        exemplar = None
+        if config.ENABLE_EXEMPLARS and settings.exemplars:
+            exemplar = request_exemplar(request.headers)
+
+        # Label threadpool work done for this request
+        set_endpoint(endpoint)
+
         # Increment active requests
         http_metrics.increment_active_requests(method, endpoint)
 
+        # Root span for the request; route handlers add child spans
+        root_span = None
+        if settings.tracing and sampled:
+            root_span = tracer.start_trace(
+                f"{method} {endpoint}",
+                endpoint,
+                trace_id=parse_traceparent(request.headers.get('traceparent')),
+                **{"http.method": method, "http.target": endpoint}
+            )
+        if root_span is not None and exemplar and 'request_id' in exemplar:
+            root_span.set_attribute("request_id", exemplar['request_id'])
+
         # Record start time
         start_time = time.time()
 
         try:
             # Process the request
-            response = await call_next(request)
+            with tracer.span("handler"):
+                response = await call_next(request)
 
             # Calculate duration
             duration = time.time() - start_time
 
             # Get response size
             response_size = 0
-            if hasattr(response, 'headers'):
+            if settings.record_sizes and hasattr(response, 'headers'):
                 content_length = response.headers.get('content-length')
                 if content_length:
                     try:
@@ -55,8 +97,27 @@ class MetricsMiddleware(BaseHTTPMiddleware):
                 status_code=response.status_code,
                 duration=duration,
                 request_size=request_size,
-                response_size=response_size
+                response_size=response_size,
+                exemplar=exemplar
             )
+            if settings.latency_summary:
+                latency_summary.observe(method, endpoint, duration)
+            if bucket_calibrator.active:
+                bucket_calibrator.observe(endpoint, duration, request_size, response_size)
+
+            if root_span is not None:
+                root_span.set_attribute("http.status_code", response.status_code)
+                tracer.finish_trace(root_span, error=response.status_code >= 500)
+
+            if settings.access_log and sampled and access_log.running:
+                access_log.log(self._access_record(
+                    request, response.status_code, duration,
+                    request_size, response_size, exemplar
+                ))
+
+            # Echo the request ID the exemplar refers to
+            if exemplar and 'request_id' in exemplar and 'x-request-id' not in response.headers:
+                response.headers['X-Request-ID'] = exemplar['request_id']
 
             return response
 
@@ -71,8 +132,17 @@ class MetricsMiddleware(BaseHTTPMiddleware):
                 status_code=500,
                 duration=duration,
                 request_size=request_size,
-                response_size=0
+                response_size=0,
+                exemplar=exemplar
             )
+            if settings.latency_summary:
+                latency_summary.observe(method, endpoint, duration)
+            tracer.finish_trace(root_span, error=True)
+
+            if settings.access_log and sampled and access_log.running:
+                access_log.log(self._access_record(
+                    request, 500, duration, request_size, 0, exemplar
+                ))
 
             # Re-raise the exception
             raise e
@@ -80,3 +150,23 @@ class MetricsMiddleware(BaseHTTPMiddleware):
         finally:
             # Decrement active requests
             http_metrics.decrement_active_requests(method, endpoint)
+
+    @staticmethod
+    def _access_record(request: Request, status_code: int, duration: float,
+                       request_size: int, response_size: int, exemplar) -> dict:
+        """Build one structured access log record."""
+        record = {
+            "ts": time.time(),
+            "method": request.method,
+            "path": request.url.path,
+            "query": request.url.query or None,
+            "status": status_code,
+            "duration_ms": round(duration * 1000, 3),
+            "request_size": request_size,
+            "response_size": response_size,
+            "client": request.client.host if request.client else None,
+            "user_agent": request.headers.get('user-agent')
+        }
+        if exemplar:
+            record.update(exemplar)
+        return record
@@ -0,0 +1,27 @@
+import math
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.metrics.http_metrics import http_metrics
+from app.rate_limit import rate_limiter
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    """Rejects requests with 429 once a client's token bucket for the route is empty."""
+
+    async def dispatch(self, request: Request, call_next):
+        rule, allowed, retry_after = rate_limiter.check(
+            request.url.path,
+            request.headers,
+            request.client.host if request.client else None
+        )
+        if rule is None:
+            return await call_next(request)
+
+        http_metrics.record_rate_limit(rule.route, allowed, len(rate_limiter.table))
+        if not allowed:
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Rate limit exceeded"},
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+        return await call_next(request)
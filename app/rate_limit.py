@@ -0,0 +1,176 @@
+import hashlib
+import json
+import math
+import random
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.config import config
+
+class TokenBucketTable:
+    """Token buckets for at most ``capacity`` keys, kept in flat parallel lists.
+
+    Each key owns one slot (tokens, last update). A bucket that has been
+    idle long enough to refill completely is indistinguishable from a new
+    one, so it counts as expired and may be dropped at any time:
+
+    - every ``take`` checks one random slot and frees it if expired, so
+      idle clients are reclaimed lazily without a sweeper
+    - when the table is full, ``sample_size`` random slots are inspected
+      and the first expired one (else the least recently used of the
+      sample) is evicted, which approximates LRU in O(1)
+
+    Slots are removed by swapping with the last one, so lookups, inserts
+    and evictions are all O(1) and memory never exceeds ``capacity`` slots.
+    Only the event loop calls into the table, so it takes no lock.
+    """
+
+    def __init__(self, capacity: int = 10000, sample_size: int = 5):
+        self.capacity = max(1, capacity)
+        self.sample_size = sample_size
+        self._index: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._tokens: List[float] = []
+        self._updated: List[float] = []
+        self._refill: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def take(self, key: str, rate: float, burst: float,
+             now: Optional[float] = None) -> Tuple[bool, float]:
+        """Take one token for ``key``; return ``(allowed, retry_after_seconds)``."""
+        if now is None:
+            now = time.monotonic()
+        self._expire_random(now)
+
+        slot = self._index.get(key)
+        if slot is None:
+            if len(self._keys) >= self.capacity:
+                self._evict(now)
+            slot = len(self._keys)
+            self._index[key] = slot
+            self._keys.append(key)
+            self._tokens.append(burst)
+            self._updated.append(now)
+            self._refill.append(burst / rate if rate > 0 else math.inf)
+            tokens = burst
+        else:
+            tokens = min(burst, self._tokens[slot] + (now - self._updated[slot]) * rate)
+
+        self._updated[slot] = now
+        if tokens >= 1.0:
+            self._tokens[slot] = tokens - 1.0
+            return True, 0.0
+        self._tokens[slot] = tokens
+        return False, (1.0 - tokens) / rate if rate > 0 else math.inf
+
+    def _expired(self, slot: int, now: float) -> bool:
+        return now - self._updated[slot] >= self._refill[slot]
+
+    def _expire_random(self, now: float):
+        if self._keys:
+            slot = random.randrange(len(self._keys))
+            if self._expired(slot, now):
+                self._remove(slot)
+
+    def _evict(self, now: float):
+        victim = None
+        for _ in range(min(self.sample_size, len(self._keys))):
+            slot = random.randrange(len(self._keys))
+            if self._expired(slot, now):
+                victim = slot
+                break
+            if victim is None or self._updated[slot] < self._updated[victim]:
+                victim = slot
+        self._remove(victim)
+
+    def _remove(self, slot: int):
+        last = len(self._keys) - 1
+        key = self._keys[slot]
+        if slot != last:
+            moved = self._keys[last]
+            self._keys[slot] = moved
+            self._tokens[slot] = self._tokens[last]
+            self._updated[slot] = self._updated[last]
+            self._refill[slot] = self._refill[last]
+            self._index[moved] = slot
+        self._keys.pop()
+        self._tokens.pop()
+        self._updated.pop()
+        self._refill.pop()
+        del self._index[key]
+
+class RateLimit:
+    """One route rule: ``rate`` requests per second with bursts up to ``burst``."""
+
+    def __init__(self, route: str, rate: float, burst: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError(f"Rate limit for {route} must be positive")
+        self.route = route
+        self.rate = rate
+        self.burst = max(1.0, burst if burst is not None else rate)
+
+class RateLimiter:
+    """Per-client token-bucket rate limiting with per-route limits.
+
+    Routes are matched by longest path prefix (``"*"`` matches anything
+    else); unmatched paths are not limited. Clients are identified by their
+    address, or by the ``key_header`` (stored hashed) when it carries one of
+    ``api_keys``; each (route, client) pair gets its own bucket in one
+    shared table. An unknown key is ignored, so rotating made-up keys
+    neither escapes the address's bucket nor fills the table.
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, float]], capacity: int = 10000,
+                 key_header: Optional[str] = "x-api-key", api_keys: Iterable[str] = ()):
+        self.table = TokenBucketTable(capacity=capacity)
+        self.key_header = key_header.lower() if key_header else None
+        self._api_keys = {self._hash(api_key) for api_key in api_keys if api_key}
+        rules = [RateLimit(route, **spec) for route, spec in limits.items()]
+        self._default = next((rule for rule in rules if rule.route == "*"), None)
+        self._rules = sorted((rule for rule in rules if rule.route != "*"), key=lambda rule: -len(rule.route))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._rules) or self._default is not None
+
+    def rule(self, path: str) -> Optional[RateLimit]:
+        for rule in self._rules:
+            if path == rule.route or path.startswith(rule.route.rstrip("/") + "/"):
+                return rule
+        return self._default
+
+    @staticmethod
+    def _hash(api_key: str) -> str:
+        return hashlib.blake2b(api_key.encode(), digest_size=8).hexdigest()
+
+    def client_key(self, headers, client_host: Optional[str]) -> str:
+        if self.key_header and self._api_keys:
+            api_key = headers.get(self.key_header)
+            if api_key:
+                digest = self._hash(api_key)
+                if digest in self._api_keys:
+                    return "key:" + digest
+        return "ip:" + (client_host or "unknown")
+
+    def check(self, path: str, headers, client_host: Optional[str],
+              now: Optional[float] = None) -> Tuple[Optional[RateLimit], bool, float]:
+        """Return ``(rule, allowed, retry_after)``; ``rule`` is None when unlimited."""
+        rule = self.rule(path)
+        if rule is None:
+            return None, True, 0.0
+        key = f"{rule.route}|{self.client_key(headers, client_host)}"
+        allowed, retry_after = self.table.take(key, rule.rate, rule.burst, now)
+        return rule, allowed, retry_after
+
+# Global instance
+rate_limiter = RateLimiter(
+    json.loads(config.RATE_LIMITS),
+    capacity=config.RATE_LIMIT_MAX_CLIENTS,
+    key_header=config.RATE_LIMIT_KEY_HEADER,
+    api_keys=config.RATE_LIMIT_API_KEYS.split(",")
+)
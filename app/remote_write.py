@@ -0,0 +1,417 @@
+import json
+import queue
+import socket
+import struct
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+
+from app.config import config
+
+try:
+    import snappy
+except ImportError:  # pragma: no cover - optional dependency
+    snappy = None
+
+_DOUBLE = struct.Struct("<d")
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def _field(number: int, payload: bytes) -> bytes:
+    """Length-delimited protobuf field."""
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+def encode_labels(labels: List[Tuple[str, str]]) -> bytes:
+    """``TimeSeries.labels`` fields for labels already sorted by name."""
+    return b"".join(_field(1, _field(1, name.encode()) + _field(2, value.encode())) for name, value in labels)
+
+def encode_series(labels: bytes, value: float, timestamp_ms: int) -> bytes:
+    """One ``WriteRequest.timeseries`` field holding a single sample.
+
+    Requests are plain concatenations of these, so batches are joined
+    without re-encoding.
+    """
+    sample = b"\x09" + _DOUBLE.pack(value) + b"\x10" + _varint(timestamp_ms & 0xFFFFFFFFFFFFFFFF)
+    return _field(1, labels + _field(2, sample))
+
+def _fields(data: bytes):
+    pos = 0
+    while pos < len(data):
+        key, pos = _read_varint(data, pos)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = _read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+        yield number, value
+
+def decode_write_request(data: bytes) -> List[Tuple[Dict[str, str], List[Tuple[float, int]]]]:
+    """Decode a remote-write ``WriteRequest`` into (labels, [(value, timestamp_ms)])."""
+    series = []
+    for number, timeseries in _fields(data):
+        if number != 1:
+            continue
+        labels: Dict[str, str] = {}
+        samples: List[Tuple[float, int]] = []
+        for field_number, value in _fields(timeseries):
+            if field_number == 1:
+                label = dict(_fields(value))
+                labels[label.get(1, b"").decode()] = label.get(2, b"").decode()
+            elif field_number == 2:
+                sample = dict(_fields(value))
+                samples.append((_DOUBLE.unpack(sample.get(1, bytes(8)))[0], sample.get(2, 0)))
+        series.append((labels, samples))
+    return series
+
+def _emit_literal(literal: bytes, out: bytearray):
+    if not literal:
+        return
+    n = len(literal) - 1
+    if n < 60:
+        out.append(n << 2)
+    elif n < 0x100:
+        out += bytes((60 << 2, n))
+    elif n < 0x10000:
+        out.append(61 << 2)
+        out += n.to_bytes(2, "little")
+    else:
+        out.append(62 << 2)
+        out += n.to_bytes(3, "little")
+    out += literal
+
+def _emit_copy(offset: int, length: int, out: bytearray):
+    while length >= 68:
+        out.append(2 | (63 << 2))
+        out += offset.to_bytes(2, "little")
+        length -= 64
+    if length > 64:
+        out.append(2 | (59 << 2))
+        out += offset.to_bytes(2, "little")
+        length -= 60
+    if length < 12 and offset < 2048:
+        out.append(1 | ((length - 4) << 2) | ((offset >> 8) << 5))
+        out.append(offset & 0xff)
+    else:
+        out.append(2 | ((length - 1) << 2))
+        out += offset.to_bytes(2, "little")
+
+def _compress_block(block: bytes, out: bytearray):
+    table: Dict[bytes, int] = {}
+    size = len(block)
+    pos = literal_start = 0
+    misses = 0
+    while pos + 4 <= size:
+        key = block[pos:pos + 4]
+        candidate = table.get(key)
+        table[key] = pos
+        if candidate is None:
+            # Step faster through incompressible data, like the reference encoder
+            misses += 1
+            pos += 1 + (misses >> 5)
+            continue
+        misses = 0
+        length = 4
+        while pos + length < size and block[candidate + length] == block[pos + length]:
+            length += 1
+        _emit_literal(block[literal_start:pos], out)
+        _emit_copy(pos - candidate, length, out)
+        pos += length
+        literal_start = pos
+    _emit_literal(block[literal_start:], out)
+
+def snappy_compress(data: bytes) -> bytes:
+    """Snappy block format, as remote write requires.
+
+    Uses python-snappy when installed; otherwise a pure-Python encoder
+    with the reference format (64 KiB blocks, 4-byte hash matches), which
+    is slower but compresses the repetitive label data of a write request
+    well.
+    """
+    if snappy is not None:
+        return snappy.compress(data)
+    out = bytearray(_varint(len(data)))
+    for start in range(0, len(data), 0x10000):
+        _compress_block(data[start:start + 0x10000], out)
+    return bytes(out)
+
+def snappy_decompress(data: bytes) -> bytes:
+    """Inverse of ``snappy_compress`` (for receivers and tests)."""
+    if snappy is not None:
+        return snappy.uncompress(data)
+    length, pos = _read_varint(data, 0)
+    out = bytearray()
+    while pos < len(data):
+        tag = data[pos]
+        pos += 1
+        kind = tag & 3
+        if kind == 0:
+            n = tag >> 2
+            if n >= 60:
+                extra = n - 59
+                n = int.from_bytes(data[pos:pos + extra], "little")
+                pos += extra
+            out += data[pos:pos + n + 1]
+            pos += n + 1
+            continue
+        if kind == 1:
+            n = ((tag >> 2) & 7) + 4
+            offset = ((tag >> 5) << 8) | data[pos]
+            pos += 1
+        elif kind == 2:
+            n = (tag >> 2) + 1
+            offset = int.from_bytes(data[pos:pos + 2], "little")
+            pos += 2
+        else:
+            n = (tag >> 2) + 1
+            offset = int.from_bytes(data[pos:pos + 4], "little")
+            pos += 4
+        if offset == 0 or offset > len(out):
+            raise ValueError("Invalid snappy copy offset")
+        start = len(out) - offset
+        if offset >= n:
+            out += out[start:start + n]
+        else:
+            for i in range(n):
+                out.append(out[start + i])
+    if len(out) != length:
+        raise ValueError("Snappy length mismatch")
+    return bytes(out)
+
+class RemoteWriter:
+    """Pushes registry snapshots to a Prometheus remote-write endpoint.
+
+    Every ``interval`` seconds a pusher thread collects the registry into
+    single-sample series (``_created`` samples are skipped), adds
+    ``external_labels`` (never overriding a metric's own labels) and
+    assigns each series to a shard by a hash of its labels, so one series
+    always travels through the same queue in order. Encoded label sets are
+    cached between pushes, so steady-state snapshots only encode values.
+
+    Each shard has a worker thread and a queue of at most ``queue_size``
+    batches of ``batch_size`` series. A full queue drops its oldest batch
+    (newer samples supersede it), so a slow or unreachable receiver costs
+    bounded memory. Batches are retried with exponential backoff on
+    connection errors, 5xx and 429, up to ``max_retries`` times; other 4xx
+    responses are dropped at once, as the receiver will never accept them.
+    """
+
+    def __init__(self, url: str, registry=REGISTRY, interval: float = 15.0, shards: int = 2,
+                 batch_size: int = 500, queue_size: int = 10, max_retries: int = 3,
+                 backoff: float = 0.5, max_backoff: float = 5.0, timeout: float = 5.0,
+                 external_labels: Optional[Dict[str, str]] = None,
+                 headers: Optional[Dict[str, str]] = None):
+        self.url = url
+        self.registry = registry
+        self.interval = interval
+        self.shards = max(1, shards)
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.external_labels = dict(external_labels or {})
+        self.headers = {
+            "Content-Encoding": "snappy",
+            "Content-Type": "application/x-protobuf",
+            "User-Agent": f"{config.APP_NAME}/{config.APP_VERSION}",
+            "X-Prometheus-Remote-Write-Version": "0.1.0",
+            **(headers or {})
+        }
+        self._queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in range(self.shards)]
+        self._labels: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Tuple[int, bytes]] = {}
+        self._stop = threading.Event()
+        self._abort = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        self.samples_total = Counter(
+            'remote_write_samples_total',
+            'Samples handed to remote write, by outcome',
+            ['result'],
+            registry=registry
+        )
+        for result in ('sent', 'failed', 'dropped'):
+            self.samples_total.labels(result=result)
+        self.retries_total = Counter(
+            'remote_write_retries_total',
+            'Remote write requests retried',
+            registry=registry
+        )
+        self.queue_batches = Gauge(
+            'remote_write_queue_batches',
+            'Batches waiting in each remote write shard queue',
+            ['shard'],
+            registry=registry
+        )
+        for shard in range(self.shards):
+            self.queue_batches.labels(shard=str(shard)).set_function(self._queues[shard].qsize)
+        self.request_duration = Histogram(
+            'remote_write_request_duration_seconds',
+            'Remote write request latency, including failed attempts',
+            registry=registry
+        )
+        self.last_success = Gauge(
+            'remote_write_last_success_timestamp_seconds',
+            'Unix time of the last accepted remote write request',
+            registry=registry
+        )
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    def start(self):
+        """Start the pusher and one sender thread per shard."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._abort.clear()
+        self._threads = [threading.Thread(target=self._push_loop, name="remote-write-push", daemon=True)]
+        self._threads += [
+            threading.Thread(target=self._send_loop, args=(shard,), name=f"remote-write-{shard}", daemon=True)
+            for shard in range(self.shards)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Push a final snapshot, then let the shards drain for up to ``timeout``."""
+        if not self.running:
+            return
+        self._stop.set()
+        pusher, senders = self._threads[0], self._threads[1:]
+        pusher.join()
+        self.push()
+        for shard_queue in self._queues:
+            self._enqueue(shard_queue, None)
+        deadline = time.monotonic() + timeout
+        for thread in senders:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        # Senders still retrying past the deadline give up
+        self._abort.set()
+        self._threads = []
+
+    def _push_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.push()
+            except Exception as e:
+                print(f"Error in remote write push: {e}")
+
+    def push(self) -> int:
+        """Snapshot the registry into the shard queues; returns samples queued."""
+        timestamp_ms = int(time.time() * 1000)
+        shards: List[List[bytes]] = [[] for _ in range(self.shards)]
+        labels: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Tuple[int, bytes]] = {}
+        for metric in self.registry.collect():
+            for sample in metric.samples:
+                if sample.name.endswith('_created'):
+                    continue
+                key = (sample.name, tuple(sorted(sample.labels.items())))
+                cached = self._labels.get(key)
+                if cached is None:
+                    merged = {**self.external_labels, **sample.labels, "__name__": sample.name}
+                    encoded = encode_labels(sorted(merged.items()))
+                    cached = (zlib.crc32(encoded) % self.shards, encoded)
+                labels[key] = cached
+                shard, encoded = cached
+                shards[shard].append(encode_series(encoded, sample.value, timestamp_ms))
+        # Only keep series still present, so the cache cannot grow without bound
+        self._labels = labels
+
+        queued = 0
+        for shard, series in enumerate(shards):
+            for start in range(0, len(series), self.batch_size):
+                batch = series[start:start + self.batch_size]
+                self._enqueue(self._queues[shard], batch)
+                queued += len(batch)
+        return queued
+
+    def _enqueue(self, shard_queue: queue.Queue, batch: Optional[List[bytes]]):
+        while True:
+            try:
+                shard_queue.put_nowait(batch)
+                return
+            except queue.Full:
+                try:
+                    dropped = shard_queue.get_nowait()
+                except queue.Empty:
+                    continue
+                if dropped:
+                    self.samples_total.labels(result='dropped').inc(len(dropped))
+
+    def _send_loop(self, shard: int):
+        shard_queue = self._queues[shard]
+        while True:
+            batch = shard_queue.get()
+            if batch is None:
+                return
+            self.send(batch)
+
+    def send(self, batch: List[bytes]) -> bool:
+        """POST one batch, retrying transient failures; True once accepted."""
+        body = snappy_compress(b"".join(batch))
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries_total.inc()
+                if self._abort.wait(delay):
+                    break
+                delay = min(delay * 2, self.max_backoff)
+            request = urllib.request.Request(self.url, data=body, headers=self.headers, method="POST")
+            start_time = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    response.read()
+                self.request_duration.observe(time.perf_counter() - start_time)
+                self.samples_total.labels(result='sent').inc(len(batch))
+                self.last_success.set(time.time())
+                return True
+            except urllib.error.HTTPError as e:
+                self.request_duration.observe(time.perf_counter() - start_time)
+                if e.code != 429 and e.code < 500:
+                    print(f"Remote write rejected with {e.code}; dropping {len(batch)} samples")
+                    break
+            except (urllib.error.URLError, OSError):
+                self.request_duration.observe(time.perf_counter() - start_time)
+        self.samples_total.labels(result='failed').inc(len(batch))
+        return False
+
+# Global instance
+remote_writer = RemoteWriter(
+    config.REMOTE_WRITE_URL,
+    interval=config.REMOTE_WRITE_INTERVAL,
+    shards=config.REMOTE_WRITE_SHARDS,
+    batch_size=config.REMOTE_WRITE_BATCH_SIZE,
+    queue_size=config.REMOTE_WRITE_QUEUE_SIZE,
+    max_retries=config.REMOTE_WRITE_MAX_RETRIES,
+    timeout=config.REMOTE_WRITE_TIMEOUT,
+    external_labels={"job": config.APP_NAME, "instance": socket.gethostname(),
+                     **json.loads(config.REMOTE_WRITE_EXTERNAL_LABELS)},
+    headers=json.loads(config.REMOTE_WRITE_HEADERS)
+)
@@ -0,0 +1,55 @@
+import json
+import math
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+def _finite(value: Any) -> Any:
+    """Replace NaN and infinities with None, as orjson does."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_finite(item) for item in value]
+    return value
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered in a single pass.
+
+    Uses orjson when it is installed and falls back to the standard library
+    encoder otherwise. Route handlers return it directly so FastAPI skips the
+    ``response_model`` validation and ``jsonable_encoder`` walk for payloads
+    the application built itself.
+
+    Content neither fast encoder accepts (integers beyond 64 bits for
+    orjson, NaN and infinities or non-JSON types for ``json.dumps``) goes
+    through ``jsonable_encoder`` as before, with non-finite floats encoded
+    as null.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            try:
+                return orjson.dumps(content)
+            except orjson.JSONEncodeError:
+                pass
+        try:
+            return self._dumps(content)
+        except (TypeError, ValueError):
+            return self._dumps(_finite(jsonable_encoder(content)))
+
+    @staticmethod
+    def _dumps(content: Any) -> bytes:
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
@@ -0,0 +1,55 @@
+import hmac
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+from typing import Optional
+
+from app.config import config
+from app.instrumentation import LEVELS, instrumentation
+
+router = APIRouter(prefix="/admin")
+
+class InstrumentationUpdate(BaseModel):
+    level: Optional[str] = None
+    sample_rate: Optional[float] = None
+
+def require_admin(
+    authorization: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """Accept ``Authorization: Bearer <ADMIN_TOKEN>`` or ``X-Admin-Token``.
+
+    The admin API is disabled (404) when ADMIN_TOKEN is not configured.
+    """
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    token = x_admin_token
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:].strip()
+    if not token or not hmac.compare_digest(token.encode(), config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@router.get("/instrumentation", dependencies=[Depends(require_admin)])
+async def get_instrumentation():
+    """Current instrumentation level and sampling rate."""
+    return instrumentation.current.to_dict()
+
+@router.put("/instrumentation", dependencies=[Depends(require_admin)])
+async def update_instrumentation(update: InstrumentationUpdate):
+    """Change the instrumentation level and/or sampling rate without a restart."""
+    if update.level is not None and update.level not in LEVELS:
+        raise HTTPException(status_code=400, detail=f"level must be one of {', '.join(LEVELS)}")
+    if update.sample_rate is not None and not 0.0 <= update.sample_rate <= 1.0:
+        raise HTTPException(status_code=400, detail="sample_rate must be between 0 and 1")
+
+    settings = instrumentation.update(level=update.level, sample_rate=update.sample_rate)
+    return settings.to_dict()
+
+@router.post("/instrumentation/reload", dependencies=[Depends(require_admin)])
+async def reload_instrumentation():
+    """Re-read INSTRUMENTATION_CONFIG_PATH, as SIGHUP does."""
+    try:
+        settings = instrumentation.reload()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Error reloading instrumentation config: {str(e)}")
+    return settings.to_dict()
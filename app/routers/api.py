@@ -1,14 +1,29 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 from pydantic import BaseModel
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import json
 import time
 import asyncio
 
+from app.config import config
+from app.metrics.http_metrics import http_metrics
+from app.responses import FastJSONResponse
+from app.storage.key_index import SortedKeyIndex
+from app.storage.response_cache import ResponseCache
+from app.storage.sharded_store import ShardedStore
+from app.tracing import tracer
+
 router = APIRouter()
 
-# In-memory data store for demonstration
-data_store: Dict[str, Any] = {}
+# In-memory data store for demonstration. Lock-striped so handlers are safe to
+# run on the threadpool as well as on the event loop.
+data_store = ShardedStore(shards=config.DATA_STORE_SHARDS)
+
+# Ordered view of data_store keys for prefix and range scans
+key_index = SortedKeyIndex()
+
+# Per-key versions (ETags) and serialised GET /data/{key} bodies
+response_cache = ResponseCache(max_entries=config.RESPONSE_CACHE_SIZE)
 
 class DataItem(BaseModel):
     key: str
@@ -25,6 +40,15 @@ class DataResponse(BaseModel):
     message: str
     data: Any = None
 
+def data_response(success: bool, message: str, data: Any = None) -> FastJSONResponse:
+    """Build a response shaped like DataResponse, serialised once.
+
+    The payload is assembled from trusted internal values, so the routes keep
+    ``response_model=DataResponse`` for the OpenAPI schema only and return this
+    directly to skip a second validation pass.
+    """
+    return FastJSONResponse({"success": success, "message": message, "data": data})
+
 @router.get("/")
 async def root():
     """Root endpoint with basic response."""
@@ -40,16 +64,20 @@ async def create_data(item: DataItem):
     """Sample data processing endpoint."""
     try:
         # Simulate some processing time
-        await asyncio.sleep(0.01)
+        with tracer.span("simulate_processing"):
+            await asyncio.sleep(0.01)
 
         # Store the data
-        data_store[item.key] = {
-            "value": item.value,
-            "timestamp": item.timestamp,
-            "created_at": time.time()
-        }
+        with tracer.span("data_store.set", key=item.key):
+            data_store[item.key] = {
+                "value": item.value,
+                "timestamp": item.timestamp,
+                "created_at": time.time()
+            }
+            key_index.add(item.key)
+            response_cache.bump(item.key)
 
-        return DataResponse(
+        return data_response(
             success=True,
             message=f"Data stored successfully for key: {item.key}",
             data={"key": item.key, "stored_at": time.time()}
@@ -58,14 +86,58 @@ async def create_data(item: DataItem):
         raise HTTPException(status_code=500, detail=f"Error processing data: {str(e)}")
 
 @router.get("/data", response_model=DataResponse)
-async def get_all_data():
-    """Sample data retrieval endpoint - get all data."""
+async def get_all_data(
+    prefix: Optional[str] = Query(None, description="Only return keys starting with this prefix"),
+    start: Optional[str] = Query(None, description="Inclusive lower key bound"),
+    end: Optional[str] = Query(None, description="Exclusive upper key bound"),
+    limit: int = Query(config.DATA_SCAN_LIMIT, ge=1, le=config.DATA_SCAN_MAX_LIMIT)
+):
+    """Sample data retrieval endpoint - get all data.
+
+    With ``prefix`` or ``start``/``end`` the ordered key index is scanned
+    instead, returning at most ``limit`` items in key order plus a
+    ``next_start`` cursor when more keys remain. A prefix scan continues
+    from its cursor when it is passed back as ``start``.
+    """
+    if prefix is not None and end is not None:
+        raise HTTPException(status_code=400, detail="Use either prefix or end, not both")
+
     try:
-        return DataResponse(
+        if prefix is not None or start is not None or end is not None:
+            # Fetch one extra key to know whether another page exists
+            with tracer.span("key_index.scan", limit=limit):
+                if prefix is not None:
+                    keys = key_index.prefix(prefix, limit=limit + 1, start=start)
+                else:
+                    keys = key_index.range(start, end, limit=limit + 1)
+
+            next_start = keys.pop() if len(keys) > limit else None
+            items = {}
+            with tracer.span("data_store.get_many", keys=len(keys)):
+                for key in keys:
+                    value = data_store.get(key)
+                    if value is not None:
+                        items[key] = value
+
+            return data_response(
+                success=True,
+                message="Data retrieved successfully",
+                data={
+                    "items": items,
+                    "count": len(items),
+                    "next_start": next_start,
+                    "retrieved_at": time.time()
+                }
+            )
+
+        with tracer.span("data_store.snapshot"):
+            items = data_store.snapshot()
+
+        return data_response(
             success=True,
             message="Data retrieved successfully",
             data={
-                "items": data_store,
+                "items": items,
                 "count": len(data_store),
                 "retrieved_at": time.time()
             }
@@ -74,17 +146,42 @@ async def get_all_data():
         raise HTTPException(status_code=500, detail=f"Error retrieving data: {str(e)}")
 
 @router.get("/data/{key}", response_model=DataResponse)
-async def get_data(key: str):
-    """Sample data retrieval endpoint - get specific data by key."""
+async def get_data(key: str, if_none_match: Optional[str] = Header(None)):
+    """Sample data retrieval endpoint - get specific data by key.
+
+    Responses carry an ETag derived from the key's version; a matching
+    If-None-Match is answered with 304 and unchanged bodies are served from
+    the response cache.
+    """
     try:
-        if key not in data_store:
+        version = response_cache.version(key)
+        if version is None:
             raise HTTPException(status_code=404, detail=f"Data not found for key: {key}")
 
-        return DataResponse(
-            success=True,
-            message=f"Data retrieved successfully for key: {key}",
-            data=data_store[key]
-        )
+        etag = response_cache.etag(version)
+        headers = {"ETag": etag}
+        if response_cache.matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        with tracer.span("response_cache.get", key=key) as span:
+            body = response_cache.get(key, version)
+            if span is not None:
+                span.set_attribute("hit", body is not None)
+        http_metrics.record_cache_lookup(hit=body is not None)
+        if body is None:
+            with tracer.span("data_store.get", key=key):
+                item = data_store.get(key)
+            if item is None:
+                raise HTTPException(status_code=404, detail=f"Data not found for key: {key}")
+
+            body = data_response(
+                success=True,
+                message=f"Data retrieved successfully for key: {key}",
+                data=item
+            ).body
+            response_cache.put(key, version, body)
+
+        return Response(content=body, media_type="application/json", headers=headers)
     except HTTPException:
         raise
     except Exception as e:
@@ -94,12 +191,14 @@ async def get_data(key: str):
 async def delete_data(key: str):
     """Delete data by key."""
     try:
-        if key not in data_store:
+        with tracer.span("data_store.pop", key=key):
+            deleted_item = data_store.pop(key, None)
+        if deleted_item is None:
             raise HTTPException(status_code=404, detail=f"Data not found for key: {key}")
+        key_index.discard(key)
+        response_cache.remove(key)
 
-        deleted_item = data_store.pop(key)
-
-        return DataResponse(
+        return data_response(
             success=True,
             message=f"Data deleted successfully for key: {key}",
             data={"deleted_item": deleted_item, "deleted_at": time.time()}
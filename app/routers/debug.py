@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Query
+from typing import Optional
+
+from app.metrics.bucket_calibration import bucket_calibrator
+from app.metrics.heavy_hitters import heavy_hitters
+from app.tracing import to_otlp, tracer
+
+router = APIRouter(prefix="/debug")
+
+@router.get("/heavy-hitters")
+async def get_heavy_hitters(k: Optional[int] = Query(None, ge=1, description="Items per dimension (default HEAVY_HITTER_TOP_K)")):
+    """Top raw paths, client addresses and user agents with error bounds."""
+    return heavy_hitters.top(k)
+
+@router.get("/traces")
+async def get_traces(
+    endpoint: Optional[str] = Query(None, description="Exact path, or a prefix ending in *"),
+    min_duration_ms: float = Query(0.0, ge=0, description="Only traces at least this slow"),
+    errors_only: bool = Query(False, description="Only traces that ended in an error"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Recent request traces, newest first, as OTLP/JSON."""
+    traces = tracer.buffer.query(
+        endpoint=endpoint,
+        min_duration=min_duration_ms / 1000.0,
+        errors_only=errors_only,
+        limit=limit
+    )
+    return to_otlp(traces)
+
+@router.get("/bucket-calibration")
+async def get_bucket_calibration():
+    """Sample counts and the bucket layouts calibration would write now."""
+    return {
+        "active": bucket_calibrator.active,
+        "warmup_seconds": bucket_calibrator.warmup_seconds,
+        "samples": bucket_calibrator.samples(),
+        "proposed": bucket_calibrator.propose()
+    }
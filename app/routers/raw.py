@@ -0,0 +1,159 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional, Tuple
+import time
+
+from app.config import config
+from app.storage.sharded_store import ShardedStore
+
+router = APIRouter()
+
+# Raw binary values, kept apart from the JSON values in api.data_store. Each
+# entry holds the upload buffer itself; it is replaced, never mutated, on a
+# new PUT so readers can slice it without copying it first.
+blob_store = ShardedStore(shards=config.DATA_STORE_SHARDS)
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Body exceeds limit of {config.RAW_MAX_BODY_BYTES} bytes"
+    )
+
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into an inclusive (start, end) pair.
+
+    Returns None when the header is absent, malformed or asks for several
+    ranges, in which case the whole body is served. Raises 416 when the range
+    cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise ValueError
+            start, end = max(0, size - length), size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else None
+            if end is not None and end < start:
+                return None
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    if end is None or end >= size:
+        end = size - 1
+    return start, end
+
+async def _iter_view(buffer: bytearray, start: int, end: int):
+    """Yield ``buffer[start:end + 1]`` in chunks without copying it up front."""
+    view = memoryview(buffer)
+    chunk_size = config.RAW_CHUNK_SIZE
+    try:
+        for offset in range(start, end + 1, chunk_size):
+            # ASGI bodies must be bytes, so only the current chunk is copied
+            yield bytes(view[offset:min(offset + chunk_size, end + 1)])
+    finally:
+        view.release()
+
+@router.put("/data/{key}/raw")
+async def put_raw_data(key: str, request: Request):
+    """Store a raw binary value, streaming the request body.
+
+    With a Content-Length the buffer is preallocated and filled in place;
+    otherwise it grows as chunks arrive. Either way the size limit is checked
+    per chunk, so an oversized upload is rejected before it is buffered.
+    """
+    max_size = config.RAW_MAX_BODY_BYTES
+    declared = request.headers.get("content-length")
+
+    if declared is not None:
+        try:
+            length = int(declared)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length")
+        if length > max_size:
+            raise _too_large()
+
+        buffer = bytearray(length)
+        with memoryview(buffer) as view:
+            offset = 0
+            async for chunk in request.stream():
+                end = offset + len(chunk)
+                if end > length:
+                    raise HTTPException(status_code=400, detail="Body longer than Content-Length")
+                view[offset:end] = chunk
+                offset = end
+        if offset != length:
+            raise HTTPException(status_code=400, detail="Body shorter than Content-Length")
+    else:
+        buffer = bytearray()
+        async for chunk in request.stream():
+            if len(buffer) + len(chunk) > max_size:
+                raise _too_large()
+            buffer += chunk
+
+    blob_store[key] = {
+        "data": buffer,
+        "content_type": request.headers.get("content-type", "application/octet-stream"),
+        "created_at": time.time()
+    }
+
+    return {
+        "success": True,
+        "message": f"Raw data stored successfully for key: {key}",
+        "data": {"key": key, "size": len(buffer), "stored_at": time.time()}
+    }
+
+@router.get("/data/{key}/raw")
+async def get_raw_data(key: str, request: Request):
+    """Stream a raw binary value back, honouring a single ``Range``."""
+    blob = blob_store.get(key)
+    if blob is None:
+        raise HTTPException(status_code=404, detail=f"Raw data not found for key: {key}")
+
+    buffer = blob["data"]
+    size = len(buffer)
+    headers = {"Accept-Ranges": "bytes"}
+
+    if size == 0:
+        return Response(content=b"", media_type=blob["content_type"], headers=headers)
+
+    byte_range = _parse_range(request.headers.get("range"), size)
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _iter_view(buffer, start, end),
+        status_code=status_code,
+        media_type=blob["content_type"],
+        headers=headers
+    )
+
+@router.delete("/data/{key}/raw")
+async def delete_raw_data(key: str):
+    """Delete a raw binary value."""
+    blob = blob_store.pop(key, None)
+    if blob is None:
+        raise HTTPException(status_code=404, detail=f"Raw data not found for key: {key}")
+
+    return {
+        "success": True,
+        "message": f"Raw data deleted successfully for key: {key}",
+        "data": {"key": key, "size": len(blob["data"]), "deleted_at": time.time()}
+    }
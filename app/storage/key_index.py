@@ -0,0 +1,127 @@
+import threading
+from bisect import bisect_left
+from typing import Iterator, List, Optional
+
+
+class SortedKeyIndex:
+    """Ordered set of keys supporting prefix and range scans.
+
+    Keys live in a list of sorted chunks (each at most ``2 * load`` long) plus
+    a parallel list of chunk maxima, so a scan bisects to its starting point
+    in O(log n) and then walks forward for O(k). Inserts and deletes only
+    shift elements inside one chunk instead of the whole key list.
+    """
+
+    def __init__(self, load: int = 512):
+        self._load = load
+        self._chunks: List[List[str]] = []
+        self._maxes: List[str] = []
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            pos = bisect_left(self._maxes, key)
+            if pos == len(self._maxes):
+                return False
+            chunk = self._chunks[pos]
+            i = bisect_left(chunk, key)
+            return chunk[i] == key
+
+    def add(self, key: str):
+        """Insert ``key``; a no-op if it is already present."""
+        with self._lock:
+            if not self._maxes:
+                self._chunks.append([key])
+                self._maxes.append(key)
+                self._size = 1
+                return
+
+            pos = bisect_left(self._maxes, key)
+            if pos == len(self._maxes):
+                # Larger than every key: append to the last chunk
+                pos -= 1
+                self._chunks[pos].append(key)
+                self._maxes[pos] = key
+            else:
+                chunk = self._chunks[pos]
+                i = bisect_left(chunk, key)
+                if chunk[i] == key:
+                    return
+                chunk.insert(i, key)
+
+            self._size += 1
+            self._split(pos)
+
+    def discard(self, key: str):
+        """Remove ``key`` if present."""
+        with self._lock:
+            pos = bisect_left(self._maxes, key)
+            if pos == len(self._maxes):
+                return
+            chunk = self._chunks[pos]
+            i = bisect_left(chunk, key)
+            if chunk[i] != key:
+                return
+
+            del chunk[i]
+            self._size -= 1
+            if not chunk:
+                del self._chunks[pos]
+                del self._maxes[pos]
+            else:
+                self._maxes[pos] = chunk[-1]
+
+    def clear(self):
+        with self._lock:
+            self._chunks.clear()
+            self._maxes.clear()
+            self._size = 0
+
+    def _split(self, pos: int):
+        chunk = self._chunks[pos]
+        if len(chunk) <= 2 * self._load:
+            return
+        head, tail = chunk[:self._load], chunk[self._load:]
+        self._chunks[pos:pos + 1] = [head, tail]
+        self._maxes[pos:pos + 1] = [head[-1], tail[-1]]
+
+    def range(self, start: Optional[str] = None, end: Optional[str] = None,
+              limit: Optional[int] = None) -> List[str]:
+        """Return keys with ``start <= key < end`` in order, at most ``limit``."""
+        with self._lock:
+            return list(self._scan(start, lambda key: end is not None and key >= end, limit))
+
+    def prefix(self, prefix: str, limit: Optional[int] = None,
+               start: Optional[str] = None) -> List[str]:
+        """Return keys starting with ``prefix`` (and ``>= start``) in order, at most ``limit``."""
+        begin = prefix if start is None else max(start, prefix)
+        with self._lock:
+            return list(self._scan(begin, lambda key: not key.startswith(prefix), limit))
+
+    def _scan(self, start: Optional[str], stop, limit: Optional[int]) -> Iterator[str]:
+        if limit is not None and limit <= 0:
+            return
+        if start is None:
+            pos, i = 0, 0
+        else:
+            pos = bisect_left(self._maxes, start)
+            if pos == len(self._maxes):
+                return
+            i = bisect_left(self._chunks[pos], start)
+
+        count = 0
+        for p in range(pos, len(self._chunks)):
+            chunk = self._chunks[p]
+            for j in range(i, len(chunk)):
+                key = chunk[j]
+                if stop(key):
+                    return
+                yield key
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+            i = 0
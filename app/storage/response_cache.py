@@ -0,0 +1,88 @@
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class ResponseCache:
+    """Per-key version stamps plus a bounded LRU of serialised response bodies.
+
+    Versions come from one process-wide counter, so a key that is deleted and
+    recreated never reuses an old ETag. ETags also carry a random per-instance
+    nonce: the counter restarts in every process, and without it an ETag from
+    before a restart (or from another worker) could match a different value. A cached body is only served while its
+    version matches the key's current version; writes bump the version and
+    drop the cached body.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._counter = itertools.count(1)
+        self._nonce = os.urandom(6).hex()
+        self._versions: Dict[str, int] = {}
+        self._bodies: "OrderedDict[str, Tuple[int, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bump(self, key: str) -> int:
+        """Assign a new version to ``key`` and invalidate its cached body."""
+        with self._lock:
+            version = next(self._counter)
+            self._versions[key] = version
+            self._bodies.pop(key, None)
+            return version
+
+    def remove(self, key: str):
+        """Forget ``key`` entirely (used when it is deleted from the store)."""
+        with self._lock:
+            self._versions.pop(key, None)
+            self._bodies.pop(key, None)
+
+    def version(self, key: str) -> Optional[int]:
+        return self._versions.get(key)
+
+    def etag(self, version: int) -> str:
+        return f'"{self._nonce}-{version}"'
+
+    def matches(self, if_none_match: Optional[str], etag: str) -> bool:
+        """Check an If-None-Match header value against ``etag``."""
+        if not if_none_match:
+            return False
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            if candidate == "*":
+                return True
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+            if candidate == etag:
+                return True
+        return False
+
+    def get(self, key: str, version: int) -> Optional[bytes]:
+        """Return the cached body for ``key`` if it was built at ``version``."""
+        with self._lock:
+            entry = self._bodies.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._bodies.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, version: int, body: bytes):
+        """Cache ``body`` unless ``key`` has been written since ``version``."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if self._versions.get(key) != version:
+                return
+            self._bodies[key] = (version, body)
+            self._bodies.move_to_end(key)
+            while len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._versions.clear()
+            self._bodies.clear()
+
+    def __len__(self) -> int:
+        return len(self._bodies)
@@ -0,0 +1,100 @@
+import threading
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List
+
+_MISSING = object()
+
+
+class ShardedStore(MutableMapping):
+    """Dict-like key/value store split into lock-striped shards.
+
+    Each key hashes to one shard guarded by its own lock, so handlers running
+    on the threadpool only contend when they touch the same shard. Whole-store
+    operations (iteration, ``len``, ``snapshot``) visit the shards one at a
+    time and are therefore consistent per shard, not globally.
+    """
+
+    def __init__(self, shards: int = 16):
+        if shards < 1:
+            raise ValueError("shards must be >= 1")
+
+        # Round up to a power of two so the shard index is a cheap mask
+        size = 1
+        while size < shards:
+            size <<= 1
+
+        self._mask = size - 1
+        self._shards: List[Dict[str, Any]] = [{} for _ in range(size)]
+        self._locks: List[threading.Lock] = [threading.Lock() for _ in range(size)]
+
+    @property
+    def shard_count(self) -> int:
+        """Number of shards (always a power of two)."""
+        return len(self._shards)
+
+    def _index(self, key: str) -> int:
+        return hash(key) & self._mask
+
+    def __getitem__(self, key: str) -> Any:
+        i = self._index(key)
+        with self._locks[i]:
+            return self._shards[i][key]
+
+    def __setitem__(self, key: str, value: Any):
+        i = self._index(key)
+        with self._locks[i]:
+            self._shards[i][key] = value
+
+    def __delitem__(self, key: str):
+        i = self._index(key)
+        with self._locks[i]:
+            del self._shards[i][key]
+
+    def __contains__(self, key: object) -> bool:
+        i = self._index(key)
+        with self._locks[i]:
+            return key in self._shards[i]
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def __iter__(self) -> Iterator[str]:
+        # Iterate over a copy of each shard's keys so writers are never blocked
+        # for the duration of the caller's loop
+        for i, shard in enumerate(self._shards):
+            with self._locks[i]:
+                keys = list(shard)
+            yield from keys
+
+    def get(self, key: str, default: Any = None) -> Any:
+        i = self._index(key)
+        with self._locks[i]:
+            return self._shards[i].get(key, default)
+
+    def pop(self, key: str, default: Any = _MISSING) -> Any:
+        i = self._index(key)
+        with self._locks[i]:
+            if default is _MISSING:
+                return self._shards[i].pop(key)
+            return self._shards[i].pop(key, default)
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        i = self._index(key)
+        with self._locks[i]:
+            return self._shards[i].setdefault(key, default)
+
+    def clear(self):
+        for i, shard in enumerate(self._shards):
+            with self._locks[i]:
+                shard.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a plain dict copy of the store."""
+        result: Dict[str, Any] = {}
+        for i, shard in enumerate(self._shards):
+            with self._locks[i]:
+                result.update(shard)
+        return result
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(shards={self.shard_count}, items={len(self)})"
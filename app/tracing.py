@@ -0,0 +1,229 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from app.config import config
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+class Span:
+    """One timed operation inside a trace."""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind",
+                 "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: int,
+                 attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.status = STATUS_UNSET
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+class Trace:
+    """All spans recorded for one request, capped at ``max_spans``."""
+
+    __slots__ = ("trace_id", "endpoint", "spans", "max_spans", "dropped_spans")
+
+    def __init__(self, trace_id: str, endpoint: str, max_spans: int):
+        self.trace_id = trace_id
+        self.endpoint = endpoint
+        self.spans: List[Span] = []
+        self.max_spans = max_spans
+        self.dropped_spans = 0
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    @property
+    def duration(self) -> float:
+        root = self.root
+        end = root.end_ns if root.end_ns is not None else time.time_ns()
+        return (end - root.start_ns) / 1e9
+
+    @property
+    def is_error(self) -> bool:
+        return self.root.status == STATUS_ERROR
+
+class TraceBuffer:
+    """Fixed-size rings of finished traces with tail-based retention.
+
+    Decisions are made once a trace has finished: errors and traces slower
+    than ``slow_seconds`` go to the priority ring, everything else to the
+    normal ring. Both rings are preallocated and overwrite their oldest slot,
+    so ordinary traffic can never push out the interesting traces.
+    """
+
+    def __init__(self, capacity: int = 512, priority_capacity: int = 256,
+                 slow_seconds: float = 0.5):
+        self.slow_seconds = slow_seconds
+        self._normal: List[Optional[Trace]] = [None] * capacity
+        self._priority: List[Optional[Trace]] = [None] * priority_capacity
+        self._normal_pos = 0
+        self._priority_pos = 0
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace):
+        with self._lock:
+            if (trace.is_error or trace.duration >= self.slow_seconds) and self._priority:
+                self._priority[self._priority_pos] = trace
+                self._priority_pos = (self._priority_pos + 1) % len(self._priority)
+            elif self._normal:
+                self._normal[self._normal_pos] = trace
+                self._normal_pos = (self._normal_pos + 1) % len(self._normal)
+
+    def query(self, endpoint: Optional[str] = None, min_duration: float = 0.0,
+              errors_only: bool = False, limit: int = 100) -> List[Trace]:
+        """Return matching traces, newest first."""
+        with self._lock:
+            traces = [t for t in self._priority + self._normal if t is not None]
+
+        matches = [
+            t for t in traces
+            if (endpoint is None or t.endpoint == endpoint or
+                (endpoint.endswith("*") and t.endpoint.startswith(endpoint[:-1])))
+            and t.duration >= min_duration
+            and (not errors_only or t.is_error)
+        ]
+        matches.sort(key=lambda t: t.root.start_ns, reverse=True)
+        return matches[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._normal = [None] * len(self._normal)
+            self._priority = [None] * len(self._priority)
+            self._normal_pos = self._priority_pos = 0
+
+class Tracer:
+    """Creates span trees for requests and records them into a TraceBuffer."""
+
+    def __init__(self, buffer: TraceBuffer, max_spans: int = 64, enabled: bool = True):
+        self.buffer = buffer
+        self.max_spans = max_spans
+        self.enabled = enabled
+
+    def start_trace(self, name: str, endpoint: str, trace_id: Optional[str] = None,
+                    **attributes) -> Optional[Span]:
+        """Start a root server span and make it current."""
+        if not self.enabled:
+            return None
+        trace = Trace(trace_id or os.urandom(16).hex(), endpoint, self.max_spans)
+        root = Span(trace, name, None, SPAN_KIND_SERVER, attributes)
+        trace.spans.append(root)
+        _current_span.set(root)
+        return root
+
+    def finish_trace(self, root: Optional[Span], error: bool = False):
+        """End the root span and hand the trace to the buffer."""
+        if root is None:
+            return
+        root.end()
+        if error:
+            root.status = STATUS_ERROR
+        self.buffer.add(root.trace)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Record a child span of the current span; a no-op outside a trace."""
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+
+        trace = parent.trace
+        if len(trace.spans) >= trace.max_spans:
+            trace.dropped_spans += 1
+            yield None
+            return
+
+        span = Span(trace, name, parent.span_id, SPAN_KIND_INTERNAL, attributes)
+        trace.spans.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException:
+            span.status = STATUS_ERROR
+            raise
+        finally:
+            span.end()
+            _current_span.reset(token)
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def to_otlp(traces: List[Trace]) -> Dict[str, Any]:
+    """Render traces as an OTLP/JSON ``ExportTraceServiceRequest``."""
+    spans = []
+    for trace in traces:
+        for span in trace.spans:
+            entry = {
+                "traceId": trace.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": span.kind,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns if span.end_ns is not None else span.start_ns),
+                "attributes": [
+                    {"key": key, "value": _otlp_value(value)}
+                    for key, value in span.attributes.items()
+                ],
+                "status": {"code": span.status}
+            }
+            if span.parent_id:
+                entry["parentSpanId"] = span.parent_id
+            spans.append(entry)
+
+    return {
+        "resourceSpans": [{
+            "resource": {
+                "attributes": [
+                    {"key": "service.name", "value": {"stringValue": config.APP_NAME}},
+                    {"key": "service.version", "value": {"stringValue": config.APP_VERSION}}
+                ]
+            },
+            "scopeSpans": [{
+                "scope": {"name": "app.tracing"},
+                "spans": spans
+            }]
+        }]
+    }
+
+# Global instance
+tracer = Tracer(
+    TraceBuffer(
+        capacity=config.TRACE_BUFFER_SIZE,
+        priority_capacity=config.TRACE_PRIORITY_BUFFER_SIZE,
+        slow_seconds=config.TRACE_SLOW_SECONDS
+    ),
+    max_spans=config.TRACE_MAX_SPANS,
+    enabled=config.ENABLE_TRACING
+)
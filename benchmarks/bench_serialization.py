@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for the data routes.
+
+Compares the previous path (build a DataResponse model, then let FastAPI
+validate it against response_model and render a JSONResponse) with the
+single-pass data_response() helper, for a small and a large store.
+
+Usage:
+    python -m benchmarks.bench_serialization [--iterations N]
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+from app.config import config
+from app.responses import orjson
+from app.routers import api
+
+PAYLOAD_SIZES = (10, 10000)
+
+
+def _populate(count: int):
+    api.data_store.clear()
+    for i in range(count):
+        api.data_store[f"key:{i}"] = {
+            "value": {"id": i, "name": f"item-{i}", "tags": ["a", "b", "c"]},
+            "timestamp": 1700000000.0 + i,
+            "created_at": 1700000000.0 + i,
+        }
+
+
+def _get_all_route():
+    for route in api.router.routes:
+        if route.path == "/data" and "GET" in route.methods:
+            return route
+    raise RuntimeError("GET /data route not found")
+
+
+async def _model_path(field) -> bytes:
+    """The pre-fast-path behaviour: model built, then validated and encoded again."""
+    result = api.DataResponse(
+        success=True,
+        message="Data retrieved successfully",
+        data={
+            "items": api.data_store.snapshot(),
+            "count": len(api.data_store),
+            "retrieved_at": time.time(),
+        },
+    )
+    content = await serialize_response(field=field, response_content=result)
+    return JSONResponse(content).body
+
+
+async def _fast_path(field) -> bytes:
+    return (await api.get_all_data(prefix=None, start=None, end=None, limit=config.DATA_SCAN_LIMIT)).body
+
+
+async def _measure(func, field, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await func(field)
+    return (time.perf_counter() - start) / iterations
+
+
+async def run(iterations: int):
+    field = _get_all_route().secure_cloned_response_field
+    encoder = "orjson" if orjson is not None else "json"
+    print(f"encoder: {encoder}")
+    print(f"{'items':>8} {'model path':>14} {'fast path':>14} {'speedup':>9}")
+
+    for count in PAYLOAD_SIZES:
+        _populate(count)
+        loops = max(1, iterations // max(1, count // 100))
+        model = await _measure(_model_path, field, loops)
+        fast = await _measure(_fast_path, field, loops)
+        print(f"{count:>8} {model * 1e6:>11.1f} us {fast * 1e6:>11.1f} us {model / fast:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Data route serialization benchmark")
+    parser.add_argument("--iterations", type=int, default=2000, help="iterations for the small payload")
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
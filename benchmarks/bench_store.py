@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Contention benchmark for the data store.
+
+Compares a plain dict guarded by a single lock against ShardedStore with
+1 to 32 threads doing a mixed read/write workload.
+
+Usage:
+    python -m benchmarks.bench_store [--ops N] [--shards N] [--write-ratio R]
+"""
+import argparse
+import random
+import threading
+import time
+
+from app.storage.sharded_store import ShardedStore
+
+THREAD_COUNTS = (1, 2, 4, 8, 16, 32)
+KEY_SPACE = 10000
+
+
+class SingleLockStore:
+    """Baseline: a dict behind one global lock."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._data.get(key, default)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+
+
+def _worker(store, ops: int, write_ratio: float, seed: int, barrier: threading.Barrier):
+    rng = random.Random(seed)
+    keys = [f"key:{rng.randrange(KEY_SPACE)}" for _ in range(1024)]
+    writes = [rng.random() < write_ratio for _ in range(1024)]
+    barrier.wait()
+    for i in range(ops):
+        key = keys[i & 1023]
+        if writes[i & 1023]:
+            store[key] = i
+        else:
+            store.get(key)
+
+
+def run(store_factory, threads: int, ops: int, write_ratio: float) -> float:
+    """Run the workload and return total operations per second."""
+    store = store_factory()
+    for i in range(KEY_SPACE):
+        store[f"key:{i}"] = i
+
+    per_thread = ops // threads
+    barrier = threading.Barrier(threads + 1)
+    workers = [
+        threading.Thread(target=_worker, args=(store, per_thread, write_ratio, n, barrier))
+        for n in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    return (per_thread * threads) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Data store contention benchmark")
+    parser.add_argument("--ops", type=int, default=200000, help="total operations per run")
+    parser.add_argument("--shards", type=int, default=16, help="ShardedStore shard count")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="fraction of writes")
+    args = parser.parse_args()
+
+    stores = {
+        "single-lock": SingleLockStore,
+        f"sharded({args.shards})": lambda: ShardedStore(shards=args.shards),
+    }
+
+    print(f"{'threads':>8} " + " ".join(f"{name:>16}" for name in stores))
+    for threads in THREAD_COUNTS:
+        results = [run(factory, threads, args.ops, args.write_ratio) for factory in stores.values()]
+        print(f"{threads:>8} " + " ".join(f"{ops_per_sec:>12,.0f} op/s" for ops_per_sec in results))
+
+
+if __name__ == "__main__":
+    main()
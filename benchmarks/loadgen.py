@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Asyncio load generator for a running FastAPI Metrics instance.
+
+Sends a weighted mix of requests either closed-loop (each worker fires as
+soon as its previous request finishes) or open-loop at a target rate. In
+open-loop mode latency is measured from each request's scheduled send time,
+so a stalled server is charged for the requests it delayed (coordinated
+omission correction); the raw service time is reported alongside.
+
+/metrics is scraped before and after the run and the server-side
+http_request_duration_seconds deltas are compared with the client timings.
+
+Usage:
+    python -m benchmarks.loadgen --url http://127.0.0.1:8000 --duration 30 \\
+        --concurrency 32 --rps 500 --mix "/=1,/data=1,/data/{key}=6,/health=1"
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+DEFAULT_MIX = "/=1,/data=1,/data/{key}=6,/health=1"
+PERCENTILES = (50, 90, 99, 99.9)
+DURATION_METRIC = "http_request_duration_seconds"
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram with bounded relative error (HDR-style).
+
+    Values are stored in microseconds in buckets of width ``precision`` on a
+    log scale, so memory depends on the dynamic range and not on the number
+    of samples.
+    """
+
+    def __init__(self, precision: float = 0.01):
+        self._log_base = math.log1p(precision)
+        self._counts: Dict[int, int] = defaultdict(int)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        micros = max(seconds * 1e6, 1.0)
+        self._counts[int(math.log(micros) / self._log_base)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(self.count * p / 100.0))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= target:
+                # Upper edge of the bucket, capped at the largest sample
+                return min(math.exp((index + 1) * self._log_base) / 1e6, self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class EndpointStats:
+    """Client-side measurements for one entry of the endpoint mix."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()   # from scheduled send time
+        self.service = LatencyHistogram()   # from actual send time
+        self.errors = 0
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    """Parse ``"/=1,/data/{key}=4"`` into ``[(path, weight), ...]``."""
+    mix = []
+    for part in spec.split(","):
+        path, _, weight = part.strip().partition("=")
+        mix.append((path, float(weight) if weight else 1.0))
+    if not mix or sum(weight for _, weight in mix) <= 0:
+        raise ValueError(f"Invalid endpoint mix: {spec!r}")
+    return mix
+
+
+def endpoint_category(endpoint: str) -> str:
+    """Map a server-side endpoint label onto the mix entry it belongs to.
+
+    Series folded into ``__overflow__`` by the cardinality guard come from
+    the per-key paths, the only unbounded ones in the mix.
+    """
+    if endpoint == "__overflow__":
+        return "/data/{key}"
+    if endpoint.startswith("/data/") and not endpoint.endswith("/raw"):
+        return "/data/{key}"
+    return endpoint
+
+
+async def scrape_durations(client: httpx.AsyncClient) -> Dict[str, Dict[str, object]]:
+    """Return http_request_duration_seconds sum/count/buckets per category."""
+    response = await client.get("/metrics")
+    response.raise_for_status()
+
+    result: Dict[str, Dict[str, object]] = defaultdict(
+        lambda: {"sum": 0.0, "count": 0.0, "buckets": defaultdict(float)}
+    )
+    for family in text_string_to_metric_families(response.text):
+        if family.name != DURATION_METRIC:
+            continue
+        for sample in family.samples:
+            entry = result[endpoint_category(sample.labels.get("endpoint", ""))]
+            if sample.name.endswith("_sum"):
+                entry["sum"] += sample.value
+            elif sample.name.endswith("_count"):
+                entry["count"] += sample.value
+            elif sample.name.endswith("_bucket"):
+                entry["buckets"][float(sample.labels["le"])] += sample.value
+    return result
+
+
+def bucket_quantile(q: float, buckets: Dict[float, float]) -> Optional[float]:
+    """Estimate a quantile from cumulative buckets like histogram_quantile()."""
+    bounds = sorted(buckets)
+    if not bounds or buckets[bounds[-1]] <= 0:
+        return None
+    rank = q * buckets[bounds[-1]]
+    lower_bound, lower_count = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if math.isinf(bound):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = bound, count
+    return None
+
+
+async def seed_keys(client: httpx.AsyncClient, count: int) -> List[str]:
+    keys = [f"loadgen-{i}" for i in range(count)]
+    for key in keys:
+        response = await client.post("/data", json={"key": key, "value": {"payload": "x" * 64}})
+        # A rejected seed (e.g. 429) would turn the key reads into 404s
+        response.raise_for_status()
+    return keys
+
+
+async def run_load(client: httpx.AsyncClient, mix: List[Tuple[str, float]], keys: List[str],
+                   concurrency: int, rps: Optional[float], duration: float,
+                   seed: int) -> Dict[str, EndpointStats]:
+    """Drive the mix for ``duration`` seconds and return per-entry stats."""
+    rng = random.Random(seed)
+    paths = [path for path, _ in mix]
+    weights = [weight for _, weight in mix]
+    stats: Dict[str, EndpointStats] = {path: EndpointStats() for path in paths}
+
+    interval = 1.0 / rps if rps else 0.0
+    start = time.perf_counter()
+    deadline = start + duration
+    next_slot = 0
+
+    async def worker():
+        nonlocal next_slot
+        while True:
+            if rps:
+                # Open loop: claim the next slot on the fixed schedule
+                intended = start + next_slot * interval
+                next_slot += 1
+                if intended >= deadline:
+                    return
+                delay = intended - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                intended = time.perf_counter()
+                if intended >= deadline:
+                    return
+
+            path = rng.choices(paths, weights)[0]
+            url = path.replace("{key}", rng.choice(keys)) if "{key}" in path else path
+            sent = time.perf_counter()
+            try:
+                response = await client.get(url)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            done = time.perf_counter()
+
+            entry = stats[path]
+            entry.latency.record(done - intended)
+            entry.service.record(done - sent)
+            if failed:
+                entry.errors += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return stats
+
+
+def build_report(stats: Dict[str, EndpointStats], elapsed: float, before: dict, after: dict) -> dict:
+    report = {"elapsed_seconds": elapsed, "endpoints": {}}
+    total = LatencyHistogram()
+    total_errors = 0
+
+    for path, entry in stats.items():
+        server = None
+        delta_count = after[path]["count"] - before[path]["count"]
+        if delta_count > 0:
+            buckets = {
+                bound: value - before[path]["buckets"].get(bound, 0.0)
+                for bound, value in after[path]["buckets"].items()
+            }
+            server = {
+                "count": delta_count,
+                "mean": (after[path]["sum"] - before[path]["sum"]) / delta_count,
+                "p99_from_buckets": bucket_quantile(0.99, buckets),
+            }
+
+        report["endpoints"][path] = {
+            "requests": entry.latency.count,
+            "errors": entry.errors,
+            "throughput": entry.latency.count / elapsed if elapsed else 0.0,
+            "latency": {f"p{p}": entry.latency.percentile(p) for p in PERCENTILES},
+            "service": {f"p{p}": entry.service.percentile(p) for p in PERCENTILES},
+            "service_mean": entry.service.mean(),
+            "server": server,
+        }
+        total_errors += entry.errors
+        for index, count in entry.latency._counts.items():
+            total._counts[index] += count
+        total.count += entry.latency.count
+        total.total += entry.latency.total
+        total.max = max(total.max, entry.latency.max)
+
+    report["total"] = {
+        "requests": total.count,
+        "errors": total_errors,
+        "throughput": total.count / elapsed if elapsed else 0.0,
+        "latency": {f"p{p}": total.percentile(p) for p in PERCENTILES},
+    }
+    return report
+
+
+def print_report(report: dict):
+    header = f"{'endpoint':<14} {'reqs':>8} {'err':>5} {'rps':>8} " + \
+        " ".join(f"{'p' + str(p):>10}" for p in PERCENTILES) + f" {'server mean':>12} {'client mean':>12}"
+    print(header)
+    print("-" * len(header))
+    for path, entry in report["endpoints"].items():
+        server = entry["server"]
+        server_mean = f"{server['mean'] * 1000:>9.2f} ms" if server else f"{'n/a':>12}"
+        print(f"{path:<14} {entry['requests']:>8} {entry['errors']:>5} {entry['throughput']:>8.1f} " +
+              " ".join(f"{entry['latency']['p' + str(p)] * 1000:>7.2f} ms" for p in PERCENTILES) +
+              f" {server_mean} {entry['service_mean'] * 1000:>9.2f} ms")
+
+    total = report["total"]
+    print("-" * len(header))
+    print(f"{'total':<14} {total['requests']:>8} {total['errors']:>5} {total['throughput']:>8.1f} " +
+          " ".join(f"{total['latency']['p' + str(p)] * 1000:>7.2f} ms" for p in PERCENTILES))
+
+    # Server time excludes transport and client overhead, so it should never
+    # exceed the client's view; anything else points at broken instrumentation
+    for path, entry in report["endpoints"].items():
+        server = entry["server"]
+        if not server:
+            continue
+        if server["count"] < entry["requests"]:
+            print(f"! {path}: server counted {server['count']:.0f} requests, client sent {entry['requests']}")
+        if server["mean"] > entry["service_mean"] * 1.05:
+            print(f"! {path}: server mean {server['mean'] * 1000:.2f} ms exceeds client mean "
+                  f"{entry['service_mean'] * 1000:.2f} ms")
+
+
+async def main_async(args):
+    mix = parse_mix(args.mix)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        keys = await seed_keys(client, args.keys) if any("{key}" in path for path, _ in mix) else []
+        before = await scrape_durations(client)
+
+        start = time.perf_counter()
+        stats = await run_load(client, mix, keys, args.concurrency, args.rps, args.duration, args.seed)
+        elapsed = time.perf_counter() - start
+
+        after = await scrape_durations(client)
+
+    report = build_report(stats, elapsed, before, after)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for FastAPI Metrics")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="base URL of the app")
+    parser.add_argument("--duration", type=float, default=10.0, help="run length in seconds")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent workers")
+    parser.add_argument("--rps", type=float, default=None,
+                        help="target request rate (open loop); omit for closed loop")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted endpoint mix")
+    parser.add_argument("--keys", type=int, default=100, help="keys seeded for /data/{key}")
+    parser.add_argument("--timeout", type=float, default=10.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the mix")
+    parser.add_argument("--json", help="also write the report to this JSON file")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
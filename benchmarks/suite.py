@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+In-process benchmark suite for instrumentation overhead.
+
+Drives app.main:app over an ASGI transport (no sockets) and measures:
+  - per-request latency with and without MetricsMiddleware
+  - /metrics exposition time against the number of series
+  - SystemMetricsCollector.collect_metrics() cost
+
+Results are written as JSON. With --compare, each result is checked against a
+saved baseline and the run exits non-zero when one regresses by more than the
+threshold.
+
+Usage:
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --output new.json --compare bench.json --threshold 0.15
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+from prometheus_client import CollectorRegistry, generate_latest
+
+from app.main import app
+from app.metrics.http_metrics import HTTPMetricsCollector
+from app.metrics.system_metrics import system_metrics
+from app.routers import api, health, raw
+
+SERIES_COUNTS = (10, 100, 1000)
+REQUEST_PATHS = ("/health/live", "/data/bench")
+
+
+def _bare_app() -> FastAPI:
+    """The same routers as app.main, without MetricsMiddleware."""
+    bare = FastAPI()
+    bare.include_router(api.router)
+    bare.include_router(raw.router)
+    bare.include_router(health.router)
+    return bare
+
+
+async def _request_latency(target: FastAPI, path: str, requests: int, rounds: int) -> float:
+    """Median over ``rounds`` of the mean per-request time for ``path``."""
+    transport = httpx.ASGITransport(app=target)
+    samples = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(max(1, requests // 10)):
+            await client.get(path)
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(requests):
+                await client.get(path)
+            samples.append((time.perf_counter() - start) / requests)
+    return statistics.median(samples)
+
+
+def _exposition_time(series: int, rounds: int) -> float:
+    """Median render time of a registry holding ``series`` endpoint series."""
+    registry = CollectorRegistry()
+    collector = HTTPMetricsCollector(registry=registry)
+    for i in range(series):
+        collector.record_request("GET", f"/bench/endpoint-{i}", 200, 0.01, 100, 1000)
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        generate_latest(registry)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def _collect_metrics_time(iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        system_metrics.collect_metrics()
+    return (time.perf_counter() - start) / iterations
+
+
+async def run(requests: int, rounds: int) -> dict:
+    """Run every benchmark and return ``{name: seconds}``."""
+    api.data_store["bench"] = {"value": "x" * 64, "timestamp": 0.0, "created_at": 0.0}
+    api.response_cache.bump("bench")
+
+    results = {}
+    bare = _bare_app()
+    for path in REQUEST_PATHS:
+        with_mw = await _request_latency(app, path, requests, rounds)
+        without_mw = await _request_latency(bare, path, requests, rounds)
+        results[f"request{path}.with_middleware"] = with_mw
+        results[f"request{path}.without_middleware"] = without_mw
+        results[f"request{path}.middleware_overhead"] = max(0.0, with_mw - without_mw)
+
+    for series in SERIES_COUNTS:
+        results[f"exposition.series_{series}"] = _exposition_time(series, rounds)
+
+    results["collect_metrics"] = _collect_metrics_time(max(1, requests // 10))
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Return (name, baseline, current, change) for each regressed result."""
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        change = (current - previous) / previous
+        marker = "REGRESSION" if change > threshold else ""
+        print(f"{name:<48} {previous * 1e6:>10.1f} us -> {current * 1e6:>10.1f} us {change:>+8.1%} {marker}")
+        if change > threshold:
+            regressions.append((name, previous, current, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process instrumentation benchmark suite")
+    parser.add_argument("--output", default="bench_results.json", help="where to write results")
+    parser.add_argument("--compare", help="baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown that counts as a regression")
+    parser.add_argument("--requests", type=int, default=500, help="requests per timing round")
+    parser.add_argument("--rounds", type=int, default=5, help="timing rounds per benchmark")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests, args.rounds))
+    document = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "rounds": args.rounds,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+        print("\nNo regressions")
+    else:
+        for name, value in sorted(results.items()):
+            print(f"{name:<48} {value * 1e6:>10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
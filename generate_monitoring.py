@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Generate Prometheus recording/alerting rules and Grafana dashboards.
+
+The metric catalog is read from the collectors registered by app.main, so
+the generated files only reference series the application really exports.
+Recording rules precompute rates, error ratios and latency quantiles at the
+job and endpoint levels; the dashboards and alerts query those recorded
+series instead of running histogram_quantile over raw buckets on every
+refresh.
+
+Usage:
+    python generate_monitoring.py           # rewrite the files
+    python generate_monitoring.py --check   # exit 1 if any file is stale
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+from prometheus_client import REGISTRY
+from prometheus_client.gc_collector import GCCollector
+from prometheus_client.metrics import MetricWrapperBase
+from prometheus_client.platform_collector import PlatformCollector
+from prometheus_client.process_collector import ProcessCollector
+from prometheus_client.utils import floatToGoString
+
+from app.config import config
+
+RULES_PATH = "prometheus-rules.yml"
+DASHBOARD_PATH = os.path.join("grafana", "dashboards", "fastapi-metrics.json")
+SIMPLE_DASHBOARD_PATH = "simple-dashboard.json"
+
+JOB = "fastapi"
+WINDOW = "5m"
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+LATENCY_HISTOGRAM = "http_request_duration_seconds"
+REQUESTS_COUNTER = "http_requests"
+
+# Series exported by the default prometheus_client collectors or by
+# Prometheus itself; they may be absent from the in-process registry on
+# some platforms but can still be referenced
+EXTERNAL_SERIES = {
+    "up": ("gauge", ("job", "instance")),
+    "process_cpu_seconds_total": ("counter", ()),
+    "process_resident_memory_bytes": ("gauge", ()),
+    "process_open_fds": ("gauge", ()),
+}
+
+# Families explicitly aggregated below; every other counter from the app's
+# collectors gets a job-level rate with its own labels kept
+AGGREGATIONS: Dict[str, Tuple[Tuple[str, ...], ...]] = {
+    REQUESTS_COUNTER: (("job",), ("job", "method", "endpoint"), ("job", "status_code")),
+}
+
+PROMQL_KEYWORDS = {
+    "by", "without", "and", "or", "unless", "on", "ignoring",
+    "group_left", "group_right", "bool", "offset", "inf", "nan",
+}
+
+Catalog = Dict[str, Tuple[str, Tuple[str, ...]]]
+
+def build_catalog(registry=REGISTRY) -> Tuple[Catalog, Catalog]:
+    """Return ``(app, builtin)`` families as ``{name: (type, labelnames)}``.
+
+    Counter names are stored without ``_total`` like prometheus_client does.
+    ``builtin`` holds families from the default process/platform/GC
+    collectors, which are referenced but never get generated rules.
+    """
+    app: Catalog = {}
+    builtin: Catalog = {}
+    for collector in list(registry._collector_to_names):
+        target = builtin if isinstance(collector, (ProcessCollector, PlatformCollector, GCCollector)) else app
+        if isinstance(collector, MetricWrapperBase):
+            target[collector._name] = (collector._type, tuple(collector._labelnames))
+            continue
+        for family in collector.collect():
+            labels: List[str] = []
+            for sample in family.samples:
+                for name in sample.labels:
+                    if name not in labels and name != "le":
+                        labels.append(name)
+            target[family.name] = (family.type, tuple(labels))
+    return app, builtin
+
+def le_selector(buckets: Tuple[float, ...]) -> str:
+    """Label matcher restricting a histogram's buckets to its default ``le`` set.
+
+    Calibrated layouts (``BUCKET_LAYOUTS_PATH``) add extra boundaries per
+    endpoint but always keep the defaults, so only the default ``le``
+    values are safe to sum across endpoints. Using the static defaults
+    keeps the generated rules independent of any runtime layouts file.
+    """
+    values = [floatToGoString(b) for b in sorted(buckets) if b != float("inf")] + ["+Inf"]
+    # Regex-escaped, then backslashes doubled for the PromQL string literal
+    pattern = "|".join(re.escape(value) for value in values).replace("\\", "\\\\")
+    return '{le=~"' + pattern + '"}'
+
+def series_names(catalog: Catalog) -> Set[str]:
+    """All sample names a catalog can produce."""
+    names = set(EXTERNAL_SERIES)
+    for name, (kind, _) in catalog.items():
+        if kind == "counter":
+            names.add(f"{name}_total")
+        elif kind == "histogram":
+            names.update({name, f"{name}_bucket", f"{name}_sum", f"{name}_count"})
+        elif kind == "info":
+            names.add(f"{name}_info")
+        else:
+            names.add(name)
+    return names
+
+def referenced_series(expr: str) -> Set[str]:
+    """Metric names used in a PromQL expression (label names excluded)."""
+    stripped = re.sub(r'"[^"]*"', "", expr)
+    stripped = re.sub(r"\{[^}]*\}", "", stripped)
+    stripped = re.sub(r"\b(by|without|on|ignoring|group_left|group_right)\s*\([^)]*\)", "", stripped)
+    stripped = re.sub(r"\[[^\]]*\]", "", stripped)
+    names = set()
+    for match in re.finditer(r"[a-zA-Z_:][a-zA-Z0-9_:]*", stripped):
+        token = match.group(0)
+        following = stripped[match.end():].lstrip()
+        if following.startswith("(") or token.lower() in PROMQL_KEYWORDS:
+            continue
+        names.add(token)
+    return names
+
+def _level(labels: Tuple[str, ...]) -> str:
+    return "_".join(labels)
+
+def _quantile_suffix(q: float) -> str:
+    return "p" + f"{q * 100:g}".replace(".", "")
+
+def recording_rules(app: Catalog) -> List[Dict[str, str]]:
+    """Recording rules for the app's counters and histograms.
+
+    Bucket sums across endpoints only use the default ``le`` values (see
+    ``le_selector``), so the quantiles recorded from them stay correct when
+    calibrated layouts are loaded.
+    """
+    rules: List[Dict[str, str]] = []
+    window = WINDOW
+
+    for name in sorted(app):
+        kind, labels = app[name]
+        if kind == "counter":
+            levels = AGGREGATIONS.get(name, (("job",) + labels,))
+            for level in levels:
+                rules.append({
+                    "record": f"{_level(level)}:{name}:rate{window}",
+                    "expr": f"sum by ({', '.join(level)}) (rate({name}_total[{window}]))",
+                })
+            if name == REQUESTS_COUNTER:
+                rules.append({
+                    "record": f"job:{name}_errors:ratio_rate{window}",
+                    "expr": (f"sum by (job) (job_status_code:{name}:rate{window}{{status_code=~\"5..\"}})"
+                             f" / job:{name}:rate{window}"),
+                })
+        elif kind == "histogram":
+            levels: Tuple[Tuple[str, ...], ...] = (("job",),)
+            if "endpoint" in labels:
+                levels += (("job", "endpoint"),)
+            for level in levels:
+                by = ", ".join(level)
+                rules.append({
+                    "record": f"{_level(level)}:{name}:mean{window}",
+                    "expr": (f"sum by ({by}) (rate({name}_sum[{window}]))"
+                             f" / sum by ({by}) (rate({name}_count[{window}]))"),
+                })
+            if name != LATENCY_HISTOGRAM:
+                continue
+            for level in levels:
+                bucket_level = level + ("le",)
+                bucket_record = f"{_level(bucket_level)}:{name}_bucket:rate{window}"
+                # One endpoint always has one layout; across endpoints use the default le set
+                selector = "" if "endpoint" in level else le_selector(config.REQUEST_DURATION_BUCKETS)
+                rules.append({
+                    "record": bucket_record,
+                    "expr": f"sum by ({', '.join(bucket_level)}) (rate({name}_bucket{selector}[{window}]))",
+                })
+                for q in QUANTILES:
+                    rules.append({
+                        "record": f"{_level(level)}:{name}:{_quantile_suffix(q)}_{window}",
+                        "expr": f"histogram_quantile({q}, {bucket_record})",
+                    })
+
+    for series in sorted(EXTERNAL_SERIES):
+        kind, _ = EXTERNAL_SERIES[series]
+        if kind == "counter":
+            name = series[:-len("_total")]
+            rules.append({
+                "record": f"job:{name}:rate{window}",
+                "expr": f"sum by (job) (rate({series}[{window}]))",
+            })
+    return rules
+
+def alerting_rules() -> List[Dict[str, object]]:
+    """Alerts, written against exported gauges and recorded series."""
+    rules: List[Dict[str, object]] = []
+    for objective in ("availability", "latency"):
+        title = objective.capitalize()
+        for speed, long_window, short_window, factor, duration, severity in (
+            ("Fast", "1h", "5m", 14.4, "2m", "critical"),
+            ("Slow", "6h", "1h", 6, "15m", "warning"),
+        ):
+            rules.append({
+                "alert": f"SLO{title}{speed}Burn",
+                "expr": (f'slo_burn_rate{{objective="{objective}",window="{long_window}"}} > {factor:g}'
+                         f' and slo_burn_rate{{objective="{objective}",window="{short_window}"}} > {factor:g}'),
+                "for": duration,
+                "labels": {"severity": severity},
+                "annotations": {
+                    "summary": (f"{title} error budget burning fast ({{{{ $labels.slo }}}})" if speed == "Fast"
+                                else f"{title} error budget burning ({{{{ $labels.slo }}}})"),
+                    "description": f"{long_window} burn rate is {{{{ $value }}}}x the sustainable rate",
+                },
+            })
+    rules.append({
+        "alert": "LoadShedding",
+        "expr": f"sum by (job) (job_priority:admission_shed:rate{WINDOW}) > 1",
+        "for": "5m",
+        "labels": {"severity": "warning"},
+        "annotations": {
+            "summary": "Admission control is shedding requests",
+            "description": "{{ $value }} requests/s rejected with 503 at the concurrency limit",
+        },
+    })
+    rules.append({
+        "alert": "ThreadpoolSaturated",
+        "expr": "threadpool_tokens_available == 0",
+        "for": "2m",
+        "labels": {"severity": "warning"},
+        "annotations": {
+            "summary": "Sync handler thread pool exhausted",
+            "description": "All worker threads are busy; sync handlers are queueing (see threadpool_wait_seconds)",
+        },
+    })
+    rules.append({
+        "alert": "RemoteWriteFailing",
+        "expr": f'sum by (job) (job_result:remote_write_samples:rate{WINDOW}{{result=~"failed|dropped"}}) > 0',
+        "for": "10m",
+        "labels": {"severity": "warning"},
+        "annotations": {
+            "summary": "Remote write is losing samples",
+            "description": "{{ $value }} samples/s failed or were dropped from full queues",
+        },
+    })
+    rules.append({
+        "alert": "HighMemoryUsage",
+        "expr": "process_resident_memory_bytes / 1024 / 1024 > 500",
+        "for": "3m",
+        "labels": {"severity": "warning"},
+        "annotations": {
+            "summary": "High memory usage",
+            "description": "Memory usage is {{ $value }} MB",
+        },
+    })
+    rules.append({
+        "alert": "HighCPUUsage",
+        "expr": f"job:process_cpu_seconds:rate{WINDOW} > 0.8",
+        "for": "3m",
+        "labels": {"severity": "warning"},
+        "annotations": {
+            "summary": "High CPU usage",
+            "description": "CPU usage is {{ $value }} (80% of available CPU time)",
+        },
+    })
+    rules.append({
+        "alert": "ApplicationDown",
+        "expr": f'up{{job="{JOB}"}} == 0',
+        "for": "30s",
+        "labels": {"severity": "critical"},
+        "annotations": {
+            "summary": "FastAPI application is down",
+            "description": "FastAPI metrics application has been down for more than 30 seconds",
+        },
+    })
+    return rules
+
+def _yaml_scalar(value: str) -> str:
+    """A plain YAML scalar when unambiguous, else a double-quoted one."""
+    if value and value[0] not in "[]{},#&*!|>'\"%@`-?: " and ": " not in value and " #" not in value:
+        return value
+    return json.dumps(value)
+
+def render_rules(recording: List[Dict[str, str]], alerting: List[Dict[str, object]]) -> str:
+    lines = [
+        "# Generated by generate_monitoring.py from the registered collectors.",
+        "# Do not edit by hand; run `python generate_monitoring.py` to regenerate.",
+        "groups:",
+        "  - name: fastapi-metrics-recording",
+        "    rules:",
+    ]
+    for rule in recording:
+        lines.append(f"      - record: {rule['record']}")
+        lines.append(f"        expr: {_yaml_scalar(rule['expr'])}")
+    lines += [
+        "",
+        "  - name: fastapi-metrics-alerts",
+        "    rules:",
+    ]
+    for i, rule in enumerate(alerting):
+        if i:
+            lines.append("")
+        lines.append(f"      - alert: {rule['alert']}")
+        lines.append(f"        expr: {_yaml_scalar(rule['expr'])}")
+        lines.append(f"        for: {rule['for']}")
+        lines.append("        labels:")
+        for key, value in rule["labels"].items():
+            lines.append(f"          {key}: {value}")
+        lines.append("        annotations:")
+        for key, value in rule["annotations"].items():
+            lines.append(f"          {key}: {json.dumps(value)}")
+    return "\n".join(lines) + "\n"
+
+def _target(expr: str, legend: str) -> Dict[str, str]:
+    return {"expr": expr, "legendFormat": legend}
+
+def _panel(panel_id: int, title: str, kind: str, grid: Tuple[int, int, int, int],
+           targets: List[Dict[str, str]], unit: Optional[str] = None,
+           thresholds: Optional[List[Tuple[str, Optional[float]]]] = None) -> Dict[str, object]:
+    h, w, x, y = grid
+    panel: Dict[str, object] = {
+        "id": panel_id,
+        "title": title,
+        "type": kind,
+        "gridPos": {"h": h, "w": w, "x": x, "y": y},
+        "targets": targets,
+    }
+    defaults: Dict[str, object] = {}
+    if unit:
+        defaults["unit"] = unit
+    if thresholds:
+        defaults["thresholds"] = {
+            "steps": [{"color": color, "value": value} for color, value in thresholds]
+        }
+    if defaults:
+        panel["fieldConfig"] = {"defaults": defaults}
+    return panel
+
+def dashboard_panels(full: bool) -> List[Dict[str, object]]:
+    """Dashboard panels; ``full`` adds per-endpoint, SLO and size panels."""
+    w = WINDOW
+    req = REQUESTS_COUNTER
+    lat = LATENCY_HISTOGRAM
+    panels = [
+        _panel(1, "Request Rate", "stat", (6, 6, 0, 0),
+               [_target(f"sum(job:{req}:rate{w})", "Requests/sec")], unit="reqps"),
+        _panel(2, "Error Rate", "stat", (6, 6, 6, 0),
+               [_target(f"job:{req}_errors:ratio_rate{w}", "Error ratio")], unit="percentunit",
+               thresholds=[("green", None), ("yellow", 0.01), ("red", 0.05)]),
+        _panel(3, "Response Time (95th Percentile)", "stat", (6, 6, 12, 0),
+               [_target(f"job:{lat}:p95_{w}", "p95")], unit="s",
+               thresholds=[("green", None), ("yellow", 0.5), ("red", 1)]),
+        _panel(4, "Active Requests", "stat", (6, 6, 18, 0),
+               [_target("sum(http_requests_active)", "Active")]),
+        _panel(5, "Request Rate by Endpoint", "timeseries", (8, 12, 0, 6),
+               [_target(f"job_method_endpoint:{req}:rate{w}", "{{method}} {{endpoint}}")], unit="reqps"),
+        _panel(6, "Response Time Percentiles", "timeseries", (8, 12, 12, 6),
+               [_target(f"job:{lat}:{_quantile_suffix(q)}_{w}", f"{_quantile_suffix(q)}") for q in QUANTILES],
+               unit="s"),
+        _panel(7, "HTTP Status Codes", "piechart", (8, 12, 0, 14),
+               [_target(f"sum by (status_code) (job_status_code:{req}:rate{w})", "{{status_code}}")]),
+        _panel(8, "System Metrics", "timeseries", (8, 12, 12, 14), [
+            _target("process_resident_memory_bytes / 1024 / 1024", "Memory (MB)"),
+            _target(f"job:process_cpu_seconds:rate{w} * 100", "CPU %"),
+            _target("fastapi_thread_count", "Threads"),
+        ]),
+    ]
+    if not full:
+        return panels
+
+    panels += [
+        _panel(9, "Response Time p95 by Endpoint", "timeseries", (8, 12, 0, 22),
+               [_target(f"job_endpoint:{lat}:p95_{w}", "{{endpoint}}")], unit="s"),
+        _panel(10, "SLO Burn Rate (1h)", "timeseries", (8, 12, 12, 22),
+               [_target('slo_burn_rate{window="1h"}', "{{slo}} {{objective}}")],
+               thresholds=[("green", None), ("yellow", 6), ("red", 14.4)]),
+        _panel(11, "Mean Request/Response Size", "timeseries", (8, 12, 0, 30), [
+            _target(f"job:http_request_size_bytes:mean{w}", "Request"),
+            _target(f"job:http_response_size_bytes:mean{w}", "Response"),
+        ], unit="bytes"),
+        _panel(12, "FastAPI Process Metrics", "timeseries", (8, 12, 12, 30), [
+            _target("fastapi_uptime_seconds / 3600", "Uptime (hours)"),
+            _target("fastapi_cpu_usage_percent", "CPU %"),
+            _target("process_open_fds", "Open FDs"),
+        ]),
+    ]
+    return panels
+
+def render_dashboard(uid: str, title: str, full: bool) -> str:
+    dashboard = {
+        "dashboard": {
+            "id": None,
+            "uid": uid,
+            "title": title,
+            "description": "Generated by generate_monitoring.py; queries recorded series from prometheus-rules.yml",
+            "tags": ["fastapi", "metrics", "monitoring"],
+            "timezone": "browser",
+            "refresh": "30s",
+            "time": {"from": "now-1h", "to": "now"},
+            "panels": dashboard_panels(full),
+        }
+    }
+    return json.dumps(dashboard, indent=2) + "\n"
+
+def validate(exprs: List[str], known: Set[str]) -> List[str]:
+    """Return the metric names in ``exprs`` that nothing exports or records."""
+    unknown = set()
+    for expr in exprs:
+        unknown.update(referenced_series(expr) - known)
+    return sorted(unknown)
+
+def generate(registry=REGISTRY) -> Dict[str, str]:
+    """Render every generated file as ``{path: content}``.
+
+    Raises ValueError if a rule or panel references an unknown series.
+    """
+    app, builtin = build_catalog(registry)
+    recording = recording_rules(app)
+    alerting = alerting_rules()
+    panels = dashboard_panels(full=True)
+
+    known = series_names({**builtin, **app}) | {rule["record"] for rule in recording}
+    exprs = [rule["expr"] for rule in recording] + [rule["expr"] for rule in alerting]
+    exprs += [target["expr"] for panel in panels for target in panel["targets"]]
+    unknown = validate(exprs, known)
+    if unknown:
+        raise ValueError(f"Unknown series referenced: {', '.join(unknown)}")
+
+    return {
+        RULES_PATH: render_rules(recording, alerting),
+        DASHBOARD_PATH: render_dashboard("fastapi-metrics", "FastAPI Metrics Monitoring Dashboard", full=True),
+        SIMPLE_DASHBOARD_PATH: render_dashboard("fastapi-metrics-simple", "FastAPI Metrics - Complete", full=False),
+    }
+
+def stale_files(outputs: Dict[str, str], root: str = ".") -> List[str]:
+    """Paths whose content on disk differs from ``outputs``."""
+    stale = []
+    for path, content in outputs.items():
+        full_path = os.path.join(root, path)
+        if not os.path.exists(full_path):
+            stale.append(path)
+            continue
+        with open(full_path) as f:
+            if f.read() != content:
+                stale.append(path)
+    return stale
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="Fail if generated files are out of date")
+    args = parser.parse_args()
+
+    # Importing the app registers every collector in REGISTRY
+    import app.main  # noqa: F401
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    outputs = generate()
+
+    if args.check:
+        stale = stale_files(outputs, root)
+        if stale:
+            print("Out of date (run `python generate_monitoring.py`):")
+            for path in stale:
+                print(f"  {path}")
+            sys.exit(1)
+        print("Monitoring files are up to date")
+        return
+
+    for path, content in outputs.items():
+        with open(os.path.join(root, path), "w") as f:
+            f.write(content)
+        print(f"Wrote {path}")
+
+if __name__ == "__main__":
+    main()
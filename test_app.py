@@ -63,6 +63,946 @@ def test_application_startup():
         print(f"✗ Application startup error: {e}")
         return False
 
+def test_sharded_store():
+    """Test that the sharded data store stays consistent under concurrent writers."""
+    print("Testing sharded data store...")
+    import threading
+    from app.storage.sharded_store import ShardedStore
+
+    store = ShardedStore(shards=8)
+
+    def writer(offset):
+        for i in range(1000):
+            store[f"key:{offset}:{i}"] = i
+        for i in range(0, 1000, 2):
+            del store[f"key:{offset}:{i}"]
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(store) == 8 * 500
+    assert store.get("key:3:1") == 1
+    assert "key:3:2" not in store
+    assert store.pop("missing", None) is None
+    assert set(store.snapshot()) == set(store)
+    print("✓ Sharded store consistent under concurrent writes")
+    return True
+
+def test_data_endpoints():
+    """Test the data routes in-process and check the response shape."""
+    print("Testing data endpoints...")
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    response = client.post("/data", json={"key": "fast", "value": {"n": 1}})
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+
+    response = client.get("/data/fast")
+    assert response.status_code == 200
+    assert response.json()["data"]["value"] == {"n": 1}
+    etag = response.headers["etag"]
+
+    # Conditional GET answers 304 until the key is rewritten
+    response = client.get("/data/fast", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    client.post("/data", json={"key": "fast", "value": {"n": 2}})
+    response = client.get("/data/fast", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["data"]["value"] == {"n": 2}
+    assert client.get("/data/fast").content == response.content
+
+    # Versions restart per process; the ETag nonce keeps them distinct
+    from app.storage.response_cache import ResponseCache
+    first, second = ResponseCache(), ResponseCache()
+    assert first.etag(first.bump("k")) != second.etag(second.bump("k"))
+    assert 'http_response_cache_lookups_total{result="hit"}' in client.get("/metrics").text
+
+    # Values orjson or strict json.dumps reject still serialise
+    client.post("/data", json={"key": "big", "value": {"n": 2 ** 70, "ratio": float("nan")}})
+    response = client.get("/data/big")
+    assert response.status_code == 200
+    assert response.json()["data"]["value"] == {"n": 2 ** 70, "ratio": None}
+    assert client.delete("/data/big").status_code == 200
+
+    response = client.get("/data")
+    assert response.status_code == 200
+    assert "fast" in response.json()["data"]["items"]
+
+    # Ordered prefix and range scans
+    for key in ("user:1:b", "user:1:a", "user:2:a"):
+        client.post("/data", json={"key": key, "value": key})
+    response = client.get("/data", params={"prefix": "user:1:"})
+    assert list(response.json()["data"]["items"]) == ["user:1:a", "user:1:b"]
+    response = client.get("/data", params={"start": "user:1:b", "end": "user:3", "limit": 1})
+    assert list(response.json()["data"]["items"]) == ["user:1:b"]
+    assert response.json()["data"]["next_start"] == "user:2:a"
+    # A prefix scan continues from its own cursor
+    response = client.get("/data", params={"prefix": "user:1:", "limit": 1})
+    cursor = response.json()["data"]["next_start"]
+    assert list(response.json()["data"]["items"]) == ["user:1:a"] and cursor == "user:1:b"
+    response = client.get("/data", params={"prefix": "user:1:", "start": cursor, "limit": 1})
+    assert list(response.json()["data"]["items"]) == ["user:1:b"]
+    assert response.json()["data"]["next_start"] is None
+    for key in ("user:1:b", "user:1:a", "user:2:a"):
+        client.delete(f"/data/{key}")
+    assert client.get("/data", params={"prefix": "user:"}).json()["data"]["count"] == 0
+
+    assert client.delete("/data/fast").status_code == 200
+    assert client.get("/data/fast").status_code == 404
+    print("✓ Data endpoints working")
+    return True
+
+def test_raw_endpoints():
+    """Test raw binary upload, ranged download and the size limit."""
+    print("Testing raw data endpoints...")
+    from fastapi.testclient import TestClient
+    from app.config import config
+    from app.main import app
+
+    client = TestClient(app)
+    payload = bytes(range(256)) * 1024
+    response = client.put("/data/blob/raw", content=payload,
+                          headers={"Content-Type": "application/octet-stream"})
+    assert response.status_code == 200
+    assert response.json()["data"]["size"] == len(payload)
+
+    response = client.get("/data/blob/raw")
+    assert response.status_code == 200
+    assert response.content == payload
+
+    response = client.get("/data/blob/raw", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == payload[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(payload)}"
+    assert client.get("/data/blob/raw", headers={"Range": "bytes=-5"}).content == payload[-5:]
+    assert client.get("/data/blob/raw", headers={"Range": f"bytes={len(payload)}-"}).status_code == 416
+
+    # Chunked upload without Content-Length is limited while streaming
+    original_limit = config.RAW_MAX_BODY_BYTES
+    config.RAW_MAX_BODY_BYTES = 1000
+    try:
+        response = client.put("/data/big/raw", content=iter([b"x" * 600, b"x" * 600]))
+        assert response.status_code == 413
+    finally:
+        config.RAW_MAX_BODY_BYTES = original_limit
+
+    assert client.delete("/data/blob/raw").status_code == 200
+    assert client.get("/data/blob/raw").status_code == 404
+    print("✓ Raw data endpoints working")
+    return True
+
+def test_latency_summary():
+    """Test sketch accuracy, window rotation and the /metrics/summary endpoint."""
+    print("Testing latency summary...")
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.metrics.latency_summary import DDSketch, LatencySummary
+
+    sketch = DDSketch(relative_accuracy=0.01)
+    values = [i / 1000.0 for i in range(1, 10001)]
+    for value in values:
+        sketch.add(value)
+    for q in (0.5, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= exact * 0.011
+
+    summary = LatencySummary(slice_seconds=10)
+    summary.observe("GET", "/x", 0.5, now=1000.0)
+    summary.observe("GET", "/x", 0.1, now=1290.0)
+    windows = summary.summary(now=1295.0)["series"][0]["windows"]
+    assert windows["1m"]["count"] == 1
+    assert windows["5m"]["count"] == 2
+    # The first observation has aged out of the 5m window
+    windows = summary.summary(now=1305.0)["series"][0]["windows"]
+    assert windows["5m"]["count"] == 1 and windows["15m"]["count"] == 2
+
+    client = TestClient(app)
+    client.get("/health/live")
+    series = client.get("/metrics/summary").json()["series"]
+    live = [s for s in series if s["endpoint"] == "/health/live"][0]
+    assert live["windows"]["1m"]["count"] >= 1 and live["windows"]["1m"]["p99"] is not None
+    print("✓ Latency summary working")
+    return True
+
+def test_slo_burn_rates():
+    """Test multi-window SLO burn rate computation."""
+    print("Testing SLO burn rates...")
+    from app.metrics.slo import SLO, SLOTracker
+
+    tracker = SLOTracker([SLO("data", endpoint="/data*", availability=0.99,
+                              latency_threshold=0.1, latency_target=0.9)])
+    now = 100000.0
+    for i in range(100):
+        tracker.record("/data", 500 if i < 2 else 200, 0.2 if i < 20 else 0.01, now=now)
+    tracker.record("/health", 500, 5.0, now=now)
+    # An old failure outside the 5m window but inside 1h
+    tracker.record("/data/key", 500, 0.01, now=now - 600)
+
+    rates = {(objective, window): rate for _, objective, window, rate in tracker.burn_rates(now=now)}
+    assert abs(rates[("availability", "5m")] - 2.0) < 1e-9   # 2% bad / 1% budget
+    assert abs(rates[("latency", "5m")] - 2.0) < 1e-9        # 20% slow / 10% budget
+    assert rates[("availability", "1h")] > rates[("availability", "5m")]
+    print("✓ SLO burn rates working")
+    return True
+
+def test_heavy_hitters():
+    """Test Space-Saving error bounds, decay and the debug endpoint."""
+    print("Testing heavy hitters...")
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.metrics.heavy_hitters import SpaceSaving
+
+    summary = SpaceSaving(capacity=4, decay=0.5, decay_seconds=60)
+    for i in range(1000):
+        summary.add("hot" if i % 2 == 0 else f"cold-{i}", now=0.0)
+    item, count, error = summary.top(1)[0]
+    assert item == "hot"
+    assert count - error <= 500 <= count
+    assert summary.top(1, now=60.0)[0][1] == count / 2
+
+    client = TestClient(app)
+    client.get("/health/live", headers={"User-Agent": "hammer/1.0"})
+    top = client.get("/debug/heavy-hitters", params={"k": 3}).json()
+    assert any(i["value"] == "hammer/1.0" for i in top["user_agent"]["items"])
+    assert 'heavy_hitter_count{dimension="path",rank="1"}' in client.get("/metrics").text
+    print("✓ Heavy hitters working")
+    return True
+
+def test_cardinality_guard():
+    """Test that label sets beyond the family budget fold into __overflow__."""
+    print("Testing cardinality guard...")
+    from prometheus_client import CollectorRegistry
+    from app.main import app
+    from app.metrics.cardinality import CardinalityGuard
+    from app.metrics.http_metrics import HTTPMetricsCollector
+
+    registry = CollectorRegistry()
+    guard = CardinalityGuard(registry=registry, default_budget=3,
+                             budgets={"http_requests_total": 2})
+    collector = HTTPMetricsCollector(registry=registry, cardinality=guard)
+    for i in range(10):
+        collector.record_request("GET", f"/data/key-{i}", 200, 0.01)
+    collector.record_request("GET", "/data/key-0", 200, 0.01)
+    collector.record_request("GET", "/data/key-9", 200, 0.01)
+
+    assert guard.series_count("http_requests_total") == 2
+    assert guard.series_count("http_request_duration_seconds") == 3
+    overflow = {"method": "__overflow__", "endpoint": "__overflow__", "status_code": "__overflow__"}
+    assert registry.get_sample_value("http_requests_total", overflow) == 9
+    assert registry.get_sample_value("http_requests_total",
+                                     {"method": "GET", "endpoint": "/data/key-0", "status_code": "200"}) == 2
+    # Each distinct rejected label set is counted once
+    assert registry.get_sample_value("metrics_series_overflow_total",
+                                     {"family": "http_requests_total"}) == 8
+
+    # Route templates replace string path parameters
+    collector.set_routes(app.routes)
+    assert collector._normalize_endpoint("/data/key-0?x=1") == "/data/{key}"
+    assert collector._normalize_endpoint("/data/key-0/raw") == "/data/{key}/raw"
+    assert collector._normalize_endpoint("/unknown/42") == "/unknown/{id}"
+    print("✓ Cardinality guard working")
+    return True
+
+def test_exemplars():
+    """Test trace ID exemplars in the OpenMetrics exposition."""
+    print("Testing exemplars...")
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.metrics.exemplars import ExemplarSampler
+
+    sampler = ExemplarSampler(interval=10)
+    child = object()
+    assert sampler.for_counter(child, {"request_id": "a"}, now=0.0) == {"request_id": "a"}
+    assert sampler.for_counter(child, {"request_id": "b"}, now=5.0) is None
+    assert sampler.for_counter(child, {"request_id": "c"}, now=10.0) == {"request_id": "c"}
+
+    client = TestClient(app)
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    client.get("/health/ready", headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"})
+    assert "x-request-id" in client.get("/health/ready").headers
+
+    text = client.get("/metrics", headers={"Accept": "application/openmetrics-text"}).text
+    assert f'# {{trace_id="{trace_id}"}}' in text
+    assert "# {" not in client.get("/metrics").text
+    print("✓ Exemplars working")
+    return True
+
+def test_request_traces():
+    """Test span trees, tail-based retention and the /debug/traces endpoint."""
+    print("Testing request traces...")
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.tracing import Trace, TraceBuffer, Span, STATUS_ERROR, SPAN_KIND_SERVER
+
+    buffer = TraceBuffer(capacity=2, priority_capacity=1, slow_seconds=1.0)
+    failed = Trace("f" * 32, "/fail", 8)
+    failed.spans.append(Span(failed, "root", None, SPAN_KIND_SERVER, {}))
+    failed.root.end()
+    failed.root.status = STATUS_ERROR
+    buffer.add(failed)
+    for i in range(5):
+        ok = Trace(f"{i:032x}", "/ok", 8)
+        ok.spans.append(Span(ok, "root", None, SPAN_KIND_SERVER, {}))
+        ok.root.end()
+        buffer.add(ok)
+    # Normal traffic overwrote itself but not the error trace
+    assert len(buffer.query()) == 3
+    assert buffer.query(errors_only=True)[0] is failed
+
+    client = TestClient(app)
+    trace_id = "0af7651916cd43dd8448eb211c80319c"
+    client.post("/data", json={"key": "traced", "value": 1},
+                headers={"traceparent": f"00-{trace_id}-b7ad6b7169203331-01"})
+    otlp = client.get("/debug/traces", params={"endpoint": "/data", "min_duration_ms": 5}).json()
+    spans = [s for s in otlp["resourceSpans"][0]["scopeSpans"][0]["spans"] if s["traceId"] == trace_id]
+    names = {s["name"] for s in spans}
+    assert {"POST /data", "handler", "simulate_processing", "data_store.set"} <= names
+    root = [s for s in spans if "parentSpanId" not in s][0]
+    assert all(s.get("parentSpanId") for s in spans if s is not root)
+    client.delete("/data/traced")
+    print("✓ Request traces working")
+    return True
+
+def test_access_log():
+    """Test batched JSON-lines writing, rotation and load shedding."""
+    print("Testing access log...")
+    import json
+    import tempfile
+    from prometheus_client import CollectorRegistry
+    from app.access_log import AccessLogWriter
+
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = CollectorRegistry()
+        path = os.path.join(tmp, "access.log")
+        writer = AccessLogWriter(path, max_queue=100, batch_size=10, flush_interval=0.05,
+                                 max_bytes=500, backup_count=2, sample_every=5,
+                                 registry=registry)
+        assert writer.log({"path": "/"}) is False  # not started
+
+        writer.start()
+        for i in range(40):
+            assert writer.log({"path": f"/item/{i}", "status": 200})
+        writer.stop()
+
+        lines = []
+        for name in (path + ".2", path + ".1", path):
+            if os.path.exists(name):
+                with open(name) as f:
+                    lines.extend(json.loads(line) for line in f)
+        assert os.path.exists(path + ".1")
+        assert [line["path"] for line in lines] == [f"/item/{i}" for i in range(40)][-len(lines):]
+        assert registry.get_sample_value("access_log_written_total") == 40
+
+        # A rotation that fails (log already removed) leaves the writer usable
+        registry = CollectorRegistry()
+        removed = AccessLogWriter(path, max_bytes=10, backup_count=0, registry=registry)
+        removed._file = open(path, 'ab')
+        os.remove(path)
+        for _ in range(2):
+            removed._queue.append({"path": "/"})
+            removed._write_batch()
+        removed._file.close()
+        assert registry.get_sample_value("access_log_written_total") == 2
+        assert registry.get_sample_value("access_log_dropped_total", {"reason": "write_error"}) == 0
+
+        # Without a running writer thread the queue fills and sheds records
+        shedding = AccessLogWriter(path, max_queue=10, sample_every=5, registry=CollectorRegistry())
+        shedding._running = True
+        results = [shedding.log({"n": i}) for i in range(30)]
+        assert len(shedding._queue) == 10 and results.count(False) == 20
+
+    print("✓ Access log working")
+    return True
+
+def test_instrumentation_control():
+    """Test runtime instrumentation levels, sampling and the admin endpoint."""
+    print("Testing instrumentation control...")
+    import json
+    import tempfile
+    from fastapi.testclient import TestClient
+    from prometheus_client import CollectorRegistry
+    from app.config import config
+    from app.instrumentation import InstrumentationControl, InstrumentationSettings, instrumentation
+    from app.main import app
+    from app.tracing import tracer
+
+    minimal = InstrumentationSettings("minimal", 0.0)
+    assert not (minimal.record_sizes or minimal.tracing or minimal.sampled())
+    assert InstrumentationSettings("full").sampled()
+    for bad in ({"level": "verbose"}, {"sample_rate": 1.5}):
+        try:
+            InstrumentationSettings(**bad)
+            assert False, f"{bad} should be rejected"
+        except ValueError:
+            pass
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "instrumentation.json")
+        with open(path, "w") as f:
+            json.dump({"level": "standard", "sample_rate": 0.25}, f)
+        registry = CollectorRegistry()
+        control = InstrumentationControl(InstrumentationSettings(), config_path=path, registry=registry)
+        settings = control.reload()
+        assert control.current is settings and settings.level == "standard"
+        assert registry.get_sample_value("instrumentation_sample_rate") == 0.25
+        assert registry.get_sample_value("instrumentation_level") == 1
+
+        # Numeric strings are coerced; anything else is a ValueError
+        for content, expected in (({"sample_rate": "0.5"}, 0.5), ([], None), ({"sample_rate": [1]}, None),
+                                  ({"sample_rate": "half"}, None), ({"level": 2}, None)):
+            with open(path, "w") as f:
+                json.dump(content, f)
+            try:
+                assert control.reload().sample_rate == expected
+            except ValueError:
+                assert expected is None, f"{content} should load"
+            else:
+                assert expected is not None, f"{content} should be rejected"
+
+    original_token, original_settings = config.ADMIN_TOKEN, instrumentation.current
+    client = TestClient(app)
+    try:
+        config.ADMIN_TOKEN = None
+        assert client.get("/admin/instrumentation").status_code == 404
+
+        config.ADMIN_TOKEN = "s3cret"
+        assert client.get("/admin/instrumentation").status_code == 401
+        assert client.get("/admin/instrumentation", headers={"X-Admin-Token": "nope"}).status_code == 401
+
+        auth = {"Authorization": "Bearer s3cret"}
+        assert client.get("/admin/instrumentation", headers=auth).json()["level"] == original_settings.level
+        assert client.put("/admin/instrumentation", json={"level": "bogus"}, headers=auth).status_code == 400
+
+        response = client.put("/admin/instrumentation", json={"level": "minimal"}, headers=auth)
+        assert response.status_code == 200 and response.json()["tracing"] is False
+        assert instrumentation.current.level == "minimal"
+
+        # Minimal level records no traces
+        before = len(tracer.buffer.query(endpoint="/health/live", limit=1000))
+        client.get("/health/live")
+        assert len(tracer.buffer.query(endpoint="/health/live", limit=1000)) == before
+    finally:
+        config.ADMIN_TOKEN = original_token
+        instrumentation.current = original_settings
+
+    print("✓ Instrumentation control working")
+    return True
+
+def test_bucket_calibration():
+    """Test per-endpoint bucket proposals and layouts loaded by the collector."""
+    print("Testing bucket calibration...")
+    import tempfile
+    from prometheus_client import CollectorRegistry
+    from app.metrics.bucket_calibration import BucketCalibrator
+    from app.config import config
+    from app.metrics.bucket_layouts import load_bucket_layouts, shared_bounds
+    from app.metrics.http_metrics import HTTPMetricsCollector
+    import app.main  # noqa: F401 - registers the route templates
+
+    calibrator = BucketCalibrator(warmup_seconds=60, max_buckets=10, min_samples=50)
+    calibrator.observe("/health/live", 0.0001)  # inactive: ignored
+    calibrator.start(now=0)
+    for i in range(1, 201):
+        calibrator.observe("/health/live", 0.00005 + i * 1e-6, response_size=40)
+        calibrator.observe(f"/data/key-{i}", 0.2 + i * 0.001, request_size=1000 + i)
+    assert not calibrator.done(now=30) and calibrator.done(now=60)
+
+    layouts = calibrator.propose()
+    live = layouts["http_request_duration_seconds"]["/health/live"]
+    data = layouts["http_request_duration_seconds"]["/data/{key}"]
+    assert list(live) == sorted(set(live))
+    # Calibrated boundaries are added to the defaults, never replace them
+    for layout in (live, data):
+        assert set(config.REQUEST_DURATION_BUCKETS) <= set(layout)
+    assert len(set(live) - set(config.REQUEST_DURATION_BUCKETS)) <= 10
+    assert min(live) < 0.001
+    assert any(b > 0.2 and b not in config.REQUEST_DURATION_BUCKETS for b in data)
+    assert "*" in layouts["http_request_duration_seconds"]
+    assert all(b == int(b) for b in layouts["http_request_size_bytes"]["/data/{key}"])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "layouts.json")
+        calibrator.write(path)
+        loaded = load_bucket_layouts(path)
+        assert loaded["http_request_duration_seconds"]["/health/live"] == live
+        assert load_bucket_layouts(os.path.join(tmp, "missing.json")) == {}
+
+    registry = CollectorRegistry()
+    duration_layouts = {"/health/live": (0.0001, 0.0005), "*": (0.3,)}
+    collector = HTTPMetricsCollector(registry=registry, bucket_layouts={
+        "http_request_duration_seconds": duration_layouts
+    })
+    for duration in (0.0002, 0.0004, 0.002, 0.28):
+        collector.record_request("GET", "/health/live", 200, duration)
+        collector.record_request("GET", "/data/1", 200, duration)
+    labels = {"method": "GET", "endpoint": "/health/live"}
+    assert registry.get_sample_value("http_request_duration_seconds_bucket", dict(labels, le="0.0005")) == 2
+    assert registry.get_sample_value("http_request_duration_seconds_bucket", dict(labels, le="0.001")) == 2
+    assert registry.get_sample_value(
+        "http_request_duration_seconds_bucket", {"method": "GET", "endpoint": "/data/{id}", "le": "0.3"}
+    ) == 4
+
+    # Summing both endpoints on their shared le values stays monotonic
+    buckets = {}
+    for metric in registry.collect():
+        for sample in metric.samples:
+            if sample.name == "http_request_duration_seconds_bucket":
+                buckets.setdefault(sample.labels["endpoint"], {})[float(sample.labels["le"])] = sample.value
+    shared = sorted(set(buckets["/health/live"]) & set(buckets["/data/{id}"]))
+    assert set(shared_bounds(duration_layouts, config.REQUEST_DURATION_BUCKETS)) == set(shared) - {float("inf")}
+    merged = [buckets["/health/live"][le] + buckets["/data/{id}"][le] for le in shared]
+    assert merged == sorted(merged) and merged[-1] == 8
+
+    print("✓ Bucket calibration working")
+    return True
+
+def test_generated_monitoring():
+    """Test that generated rules and dashboards are current and reference real series."""
+    print("Testing generated monitoring files...")
+    import generate_monitoring
+    import app.main  # noqa: F401 - registers every collector
+
+    outputs = generate_monitoring.generate()
+    stale = generate_monitoring.stale_files(outputs, os.path.dirname(os.path.abspath(__file__)))
+    assert not stale, f"Run `python generate_monitoring.py`; stale: {stale}"
+
+    rules = outputs[generate_monitoring.RULES_PATH]
+    assert "record: job:http_request_duration_seconds:p95_5m" in rules
+    assert "histogram_quantile" not in outputs[generate_monitoring.DASHBOARD_PATH]
+
+    assert generate_monitoring.referenced_series(
+        'sum by (job, le) (rate(foo_bucket{status_code=~"5.."}[5m])) / bar'
+    ) == {"foo_bucket", "bar"}
+    assert generate_monitoring.validate(["rate(fastapi_memory_usage_bytes[5m])"], {"up"}) == [
+        "fastapi_memory_usage_bytes"
+    ]
+
+    # Calibrated layouts only add le values, so job-level bucket sums keep to
+    # the default le set whatever layouts file the generator sees
+    import re
+    from prometheus_client.utils import floatToGoString
+    from app.config import config
+    name = generate_monitoring.LATENCY_HISTOGRAM
+    catalog, _ = generate_monitoring.build_catalog()
+    exprs = {rule["record"]: rule["expr"] for rule in generate_monitoring.recording_rules(catalog)}
+    job_expr = exprs[f"job_le:{name}_bucket:rate5m"]
+    pattern = re.search(r'le=~"([^"]*)"', job_expr).group(1).replace("\\\\", "\\")
+    assert re.fullmatch(pattern, "0.25") and re.fullmatch(pattern, "+Inf")
+    assert not re.fullmatch(pattern, "0.3") and not re.fullmatch(pattern, "0.0003")
+    assert all(re.fullmatch(pattern, floatToGoString(b)) for b in config.REQUEST_DURATION_BUCKETS)
+    assert "le=~" not in exprs[f"job_endpoint_le:{name}_bucket:rate5m"]
+
+    print("✓ Generated monitoring files up to date")
+    return True
+
+def test_admission_control():
+    """Test the gradient concurrency limit, priority classes and 503 shedding."""
+    print("Testing admission control...")
+    from fastapi.testclient import TestClient
+    from prometheus_client import CollectorRegistry
+    from app.admission import AdmissionController, GradientLimiter, admission
+    from app.main import app
+
+    limiter = GradientLimiter(initial_limit=50, min_limit=5, max_limit=200)
+    for _ in range(200):
+        limiter.update(0.01, in_flight=limiter.limit)
+    grown = limiter.limit
+    assert grown > 50
+    for _ in range(50):
+        limiter.update(0.5, in_flight=limiter.limit)
+    assert limiter.limit < grown / 2
+
+    idle = GradientLimiter(initial_limit=50)
+    for _ in range(200):
+        idle.update(0.01, in_flight=1)
+    assert idle.limit == 50  # app-limited: no growth
+
+    registry = CollectorRegistry()
+    controller = AdmissionController(
+        GradientLimiter(initial_limit=10, min_limit=10, max_limit=10),
+        priorities={"/health": "critical", "/debug": "low"},
+        low_priority_share=0.5, registry=registry
+    )
+    assert controller.priority("/health/live") == "critical"
+    assert controller.priority("/healthz") == "normal"
+    assert controller.priority("/debug/traces") == "low"
+    assert all(controller.try_acquire("normal") for _ in range(5))
+    assert not controller.try_acquire("low")
+    assert all(controller.try_acquire("normal") for _ in range(5))
+    assert not controller.try_acquire("normal") and controller.try_acquire("critical")
+    assert registry.get_sample_value("admission_shed_total", {"priority": "normal"}) == 1
+    assert registry.get_sample_value("admission_concurrency_limit") == 10
+    controller.release("normal", 0.01)
+    assert controller.in_flight == 9
+
+    client = TestClient(app)
+    saved = admission.in_flight
+    try:
+        admission.in_flight = admission.limiter.limit
+        response = client.get("/data")
+        assert response.status_code == 503 and response.headers["retry-after"] == str(admission.retry_after)
+        assert client.get("/health/live").status_code == 200
+    finally:
+        admission.in_flight = saved
+    assert client.get("/data").status_code == 200
+
+    print("✓ Admission control working")
+    return True
+
+def test_rate_limiting():
+    """Test token buckets, bounded eviction, per-route rules and 429 responses."""
+    print("Testing rate limiting...")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from prometheus_client import REGISTRY
+    from app.middleware import rate_limit_middleware
+    from app.middleware.rate_limit_middleware import RateLimitMiddleware
+    from app.rate_limit import RateLimiter, TokenBucketTable
+
+    table = TokenBucketTable(capacity=3)
+    assert [table.take("a", rate=1, burst=2, now=0)[0] for _ in range(3)] == [True, True, False]
+    allowed, retry_after = table.take("a", rate=1, burst=2, now=0.5)
+    assert not allowed and 0 < retry_after <= 0.5
+    assert table.take("a", rate=1, burst=2, now=1.0)[0]
+
+    for i in range(10):
+        table.take(f"client-{i}", rate=1, burst=2, now=2.0 + i)
+    assert len(table) == 3 and "client-9" in table
+
+    limiter = RateLimiter({"/data": {"rate": 1, "burst": 2}, "/data/bulk": {"rate": 5, "burst": 5}, "*": {"rate": 10}},
+                          api_keys=["k1"])
+    assert limiter.rule("/data/x").route == "/data"
+    assert limiter.rule("/data/bulk/1").route == "/data/bulk"
+    assert limiter.rule("/health").route == "*"
+    assert limiter.client_key({"x-api-key": "k1"}, "1.2.3.4") != limiter.client_key({}, "1.2.3.4")
+    assert limiter.client_key({"x-api-key": "forged"}, "1.2.3.4") == limiter.client_key({}, "1.2.3.4")
+
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware)
+
+    @app.get("/data/{key}")
+    async def read(key: str):
+        return {"key": key}
+
+    @app.get("/other")
+    async def other():
+        return {}
+
+    saved = rate_limit_middleware.rate_limiter
+    rate_limit_middleware.rate_limiter = RateLimiter({"/data": {"rate": 0.01, "burst": 2}}, api_keys=["other"])
+    before = REGISTRY.get_sample_value("http_requests_rate_limited_total", {"route": "/data"}) or 0
+    try:
+        client = TestClient(app)
+        codes = [client.get("/data/a").status_code for _ in range(3)]
+        assert codes == [200, 200, 429]
+        assert int(client.get("/data/a").headers["retry-after"]) >= 1
+        assert client.get("/data/a", headers={"X-API-Key": "other"}).status_code == 200
+        # Rotating unknown keys from the same address stays on its bucket
+        assert [client.get("/data/a", headers={"X-API-Key": f"rotated-{i}"}).status_code
+                for i in range(3)] == [429, 429, 429]
+        assert all(client.get("/other").status_code == 200 for _ in range(5))
+    finally:
+        rate_limit_middleware.rate_limiter = saved
+    assert REGISTRY.get_sample_value("http_requests_rate_limited_total", {"route": "/data"}) == before + 5
+    assert REGISTRY.get_sample_value("http_rate_limit_clients") == 2
+
+    print("✓ Rate limiting working")
+    return True
+
+def test_threadpool_metrics():
+    """Test threadpool sizing and wait/run timing of sync dependencies."""
+    print("Testing threadpool metrics...")
+    import anyio.to_thread
+    from fastapi.testclient import TestClient
+    from prometheus_client import REGISTRY
+    from app.config import config
+    from app.main import app
+    from app.metrics.threadpool_metrics import threadpool_metrics
+
+    original_run_sync = anyio.to_thread.run_sync
+    labels = {"endpoint": "/admin/instrumentation"}
+    before = REGISTRY.get_sample_value("threadpool_run_seconds_count", labels) or 0
+    original_token = config.ADMIN_TOKEN
+    try:
+        config.ADMIN_TOKEN = "s3cret"
+        with TestClient(app) as client:
+            assert threadpool_metrics.installed
+            assert REGISTRY.get_sample_value("threadpool_tokens_total") == config.THREADPOOL_SIZE
+            # require_admin is a sync dependency, so it runs in the threadpool
+            response = client.get("/admin/instrumentation", headers={"X-Admin-Token": "s3cret"})
+            assert response.status_code == 200
+            assert REGISTRY.get_sample_value("threadpool_run_seconds_count", labels) == before + 1
+            assert REGISTRY.get_sample_value("threadpool_wait_seconds_count", labels) == before + 1
+            assert REGISTRY.get_sample_value("threadpool_tokens_borrowed") == 0
+    finally:
+        config.ADMIN_TOKEN = original_token
+    assert not threadpool_metrics.installed and anyio.to_thread.run_sync is original_run_sync
+
+    print("✓ Threadpool metrics working")
+    return True
+
+def test_state_snapshot():
+    """Test metric state surviving a restart via the snapshot file."""
+    print("Testing state snapshots...")
+    import os
+    import tempfile
+    from prometheus_client import CollectorRegistry, Counter, Histogram
+    from app.metrics.slo import SLO, SLOTracker
+    from app.metrics.state_snapshot import FILE_HEADER, SLOT_HEADER, StateSnapshotter
+
+    def build():
+        registry = CollectorRegistry()
+        requests_total = Counter('requests', 'Requests', ['route'], registry=registry)
+        latency = Histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0), registry=registry)
+        tracker = SLOTracker([SLO("api")], bucket_seconds=10.0)
+        return registry, requests_total, latency, tracker
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.bin")
+        registry, requests_total, latency, tracker = build()
+        snapshotter = StateSnapshotter(path, registry=registry, slo=tracker, slot_size=4096)
+        assert snapshotter.restore() == 0 and snapshotter.generation == 1
+        requests_total.labels(route="/a").inc(3)
+        requests_total.labels(route="/" + "x" * 70000).inc()
+        latency.observe(0.05)
+        latency.observe(0.5)
+        tracker.record("/a", 500, 0.01)
+        assert snapshotter.write()
+        requests_total.labels(route="/a").inc(2)
+        assert snapshotter.write()
+        snapshotter.close()
+
+        # A torn write of the newest slot falls back to the previous one
+        registry, requests_total, latency, tracker = build()
+        restored = StateSnapshotter(path, registry=registry, slo=tracker, slot_size=4096)
+        seq = restored.read()[0]
+        with open(path, "r+b") as f:
+            f.seek(FILE_HEADER.size + (seq % 2) * 4096 + SLOT_HEADER.size)
+            f.write(b"\xff")
+        assert restored.read()[0] == seq - 1
+        assert restored.restore() == 6
+        assert restored.generation == 2
+        assert registry.get_sample_value('requests_total', {'route': '/a'}) == 3
+        assert registry.get_sample_value('latency_seconds_bucket', {'le': '0.1'}) == 1
+        assert registry.get_sample_value('latency_seconds_count') == 2
+        assert registry.get_sample_value('metrics_process_generation_info', {'generation': '2'}) == 1
+        burn = {(objective, window): rate for _, objective, window, rate in tracker.burn_rates()}
+        assert burn[("availability", "5m")] > 0
+
+        # Outgrowing the slot rebuilds the file with larger slots
+        for route in range(200):
+            requests_total.labels(route=f"/r{route}").inc()
+        assert restored.write()
+        assert restored.slot_size > 4096 and restored.read()[0] == seq
+        restored.close()
+
+    print("✓ State snapshots working")
+    return True
+
+def test_metrics_stream():
+    """Test the live metrics stream snapshot, deltas and slow-consumer policy."""
+    print("Testing metrics stream...")
+    import json
+    from fastapi.testclient import TestClient
+    from prometheus_client import CollectorRegistry, Counter
+    from app.main import app
+    from app.metrics.stream import MetricsStream, metrics_stream
+
+    original_interval = metrics_stream.interval
+    metrics_stream.interval = 0.05
+    try:
+        with TestClient(app) as client:
+            with client.websocket_connect("/metrics/ws?families=http_requests_total") as ws:
+                snapshot = ws.receive_json()
+                assert snapshot["type"] == "snapshot"
+                assert all(name.startswith("http_requests_") for _, name, _, _ in snapshot["series"])
+                client.get("/health")
+                delta = ws.receive_json()
+                assert delta["type"] == "delta" and delta["tick"] > snapshot["tick"]
+                series = {series_id: labels for series_id, _, labels, _ in snapshot["series"]}
+                series.update({series_id: labels for series_id, _, labels in delta["series"]})
+                changed = [series[series_id] for series_id, _ in delta["values"]]
+                assert any(labels.get("endpoint") == "/health" for labels in changed)
+    finally:
+        metrics_stream.interval = original_interval
+
+    # A full queue is replaced by a snapshot, or the subscriber is dropped
+    registry = CollectorRegistry()
+    hits = Counter('hits', 'Hits', registry=registry)
+    stream = MetricsStream(registry=registry, queue_size=1)
+    subscription = stream.subscribe(["hits_total"])
+    stream.publish(stream.advance(stream.collect()))
+    hits.inc()
+    stream.publish(stream.advance(stream.collect()))
+    message = json.loads(subscription.queue.get_nowait())
+    assert message["type"] == "snapshot" and message["series"][0][3] == 1.0
+    assert registry.get_sample_value('metrics_stream_slow_consumers_total', {'action': 'resync'}) == 1
+
+    stream.slow_consumer = "disconnect"
+    hits.inc()
+    stream.publish(stream.advance(stream.collect()))
+    hits.inc()
+    stream.publish(stream.advance(stream.collect()))
+    assert subscription.queue.get_nowait() is None
+    assert registry.get_sample_value('metrics_stream_subscribers') == 0
+
+    print("✓ Metrics stream working")
+    return True
+
+def test_metrics_delta():
+    """Test cursor polling of changed series at /metrics/delta."""
+    print("Testing metrics delta endpoint...")
+    from fastapi.testclient import TestClient
+    from prometheus_client import CollectorRegistry, Gauge
+    from app.config import config
+    from app.main import app
+    from app.metrics.stream import MetricsStream
+
+    original_interval = config.METRICS_DELTA_MIN_INTERVAL
+    config.METRICS_DELTA_MIN_INTERVAL = 0
+    try:
+        with TestClient(app) as client:
+            snapshot = client.get("/metrics/delta?families=http_requests_total").json()
+            assert snapshot["type"] == "snapshot" and snapshot["cursor"] > 0
+            client.get("/health/live")
+            delta = client.get(f"/metrics/delta?cursor={snapshot['cursor']}&families=http_requests_total").json()
+            assert delta["type"] == "delta" and delta["cursor"] > snapshot["cursor"]
+            labels = {series_id: labels for series_id, _, labels, _ in snapshot["series"]}
+            labels.update({series_id: labels for series_id, _, labels in delta["series"]})
+            changed = [labels[series_id] for series_id, _ in delta["values"]]
+            assert any(series.get("endpoint") == "/health/live" for series in changed)
+    finally:
+        config.METRICS_DELTA_MIN_INTERVAL = original_interval
+
+    # Unchanged series are skipped; removals survive until history runs out
+    registry = CollectorRegistry()
+    queue_depth = Gauge('queue_depth', 'Depth', ['queue'], registry=registry)
+    queue_depth.labels(queue="a").set(1)
+    queue_depth.labels(queue="b").set(1)
+    stream = MetricsStream(registry=registry, history=1)
+    stream.advance(stream.collect())
+    cursor = stream.tick
+    assert stream.changes_since(cursor)["values"] == []
+    queue_depth.labels(queue="a").set(2)
+    queue_depth.remove("b")
+    stream.advance(stream.collect())
+    delta = stream.changes_since(cursor, frozenset(["queue_depth"]))
+    assert [value for _, value in delta["values"]] == [2.0] and len(delta["removed"]) == 1
+    assert stream.changes_since(0)["type"] == "snapshot"
+
+    queue_depth.remove("a")
+    stream.advance(stream.collect())
+    assert stream.changes_since(cursor)["type"] == "snapshot"
+
+    print("✓ Metrics delta endpoint working")
+    return True
+
+def test_metrics_server():
+    """Test the dedicated metrics listener on its own port and thread."""
+    print("Testing metrics listener...")
+    import urllib.error
+    import urllib.request
+    from prometheus_client import CollectorRegistry, Counter
+    from app.metrics_server import MetricsServer
+
+    registry = CollectorRegistry()
+    Counter('scrapes_seen', 'Scrapes', registry=registry).inc()
+    server = MetricsServer("127.0.0.1", 0, registry=registry)
+    server.start()
+    try:
+        base_url = f"http://127.0.0.1:{server.port}"
+        with urllib.request.urlopen(f"{base_url}/metrics", timeout=5) as response:
+            assert response.status == 200
+            assert "scrapes_seen_total 1.0" in response.read().decode()
+        with urllib.request.urlopen(f"{base_url}/health/live", timeout=5) as response:
+            assert response.status == 200 and b'"alive"' in response.read()
+        try:
+            urllib.request.urlopen(f"{base_url}/data", timeout=5)
+            assert False, "expected 404"
+        except urllib.error.HTTPError as e:
+            assert e.code == 404
+    finally:
+        server.stop()
+    assert not server.running
+
+    print("✓ Metrics listener working")
+    return True
+
+def test_remote_write():
+    """Test remote-write encoding, retries and queue bounds against a stand-in receiver."""
+    print("Testing remote write...")
+    import os
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from prometheus_client import CollectorRegistry, Counter
+    from app.remote_write import RemoteWriter, decode_write_request, snappy_compress, snappy_decompress
+
+    for data in (b"", b"a", os.urandom(1000), b"label=value," * 20000):
+        assert snappy_decompress(snappy_compress(data)) == data
+    assert len(snappy_compress(b"label=value," * 20000)) < 20000
+
+    received = []
+    responses = [503]
+
+    class Receiver(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            assert self.headers["Content-Encoding"] == "snappy"
+            status = responses.pop(0) if responses else 204
+            if status == 204:
+                received.extend(decode_write_request(snappy_decompress(body)))
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    receiver = ThreadingHTTPServer(("127.0.0.1", 0), Receiver)
+    threading.Thread(target=receiver.serve_forever, daemon=True).start()
+    try:
+        registry = CollectorRegistry()
+        jobs = Counter('jobs', 'Jobs', ['queue'], registry=registry)
+        for queue_name in ("a", "b", "c"):
+            jobs.labels(queue=queue_name).inc()
+        writer = RemoteWriter(f"http://127.0.0.1:{receiver.server_port}/api/v1/write", registry=registry,
+                              interval=3600, shards=2, batch_size=2, backoff=0.01,
+                              external_labels={"job": "batch", "queue": "ignored"})
+        writer.start()
+        assert writer.push() > 3
+        writer.stop()
+
+        series = {labels["queue"]: (labels, samples) for labels, samples in received
+                  if labels["__name__"] == "jobs_total"}
+        assert sorted(series) == ["a", "b", "c"]
+        labels, samples = series["a"]
+        assert labels["job"] == "batch" and samples[0][0] == 1.0 and samples[0][1] > 0
+        assert list(labels) == sorted(labels)
+        assert registry.get_sample_value('remote_write_retries_total') >= 1
+        assert registry.get_sample_value('remote_write_samples_total', {'result': 'sent'}) > 3
+        assert registry.get_sample_value('remote_write_samples_total', {'result': 'failed'}) == 0
+    finally:
+        receiver.shutdown()
+        receiver.server_close()
+
+    # Without a sender the queue keeps only the newest batches
+    registry = CollectorRegistry()
+    Counter('jobs', 'Jobs', registry=registry).inc()
+    writer = RemoteWriter("http://127.0.0.1:9/", registry=registry, shards=1, queue_size=1)
+    writer.push()
+    writer.push()
+    assert registry.get_sample_value('remote_write_queue_batches', {'shard': '0'}) == 1
+    assert registry.get_sample_value('remote_write_samples_total', {'result': 'dropped'}) > 0
+
+    print("✓ Remote write working")
+    return True
+
 def run_server_test():
     """Run the server and test basic endpoints."""
     print("Starting server test...")
@@ -146,6 +1086,27 @@ def main():
         ("Dependencies", test_dependencies),
         ("Imports", test_imports),
         ("Application Startup", test_application_startup),
+        ("Sharded Store", test_sharded_store),
+        ("Data Endpoints", test_data_endpoints),
+        ("Raw Data Endpoints", test_raw_endpoints),
+        ("Latency Summary", test_latency_summary),
+        ("SLO Burn Rates", test_slo_burn_rates),
+        ("Heavy Hitters", test_heavy_hitters),
+        ("Cardinality Guard", test_cardinality_guard),
+        ("Exemplars", test_exemplars),
+        ("Request Traces", test_request_traces),
+        ("Access Log", test_access_log),
+        ("Instrumentation Control", test_instrumentation_control),
+        ("Bucket Calibration", test_bucket_calibration),
+        ("Generated Monitoring", test_generated_monitoring),
+        ("Admission Control", test_admission_control),
+        ("Rate Limiting", test_rate_limiting),
+        ("Threadpool Metrics", test_threadpool_metrics),
+        ("State Snapshot", test_state_snapshot),
+        ("Metrics Stream", test_metrics_stream),
+        ("Metrics Delta", test_metrics_delta),
+        ("Metrics Listener", test_metrics_server),
+        ("Remote Write", test_remote_write),
     ]
 
     for test_name, test_func in tests: